@@ -0,0 +1,235 @@
+# analytics_engine.py
+
+import datetime as dt
+
+import numpy as np
+
+from constants import MEALS, meal_category
+from day_ordinals import to_iso
+
+VALUE_COLUMNS = ("carbs", "glicemia", "lispro", "bolus")
+GLICEMIA_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _group_stats(codes: np.ndarray, values: np.ndarray, n_groups: int) -> dict:
+    """Soma, contagem, média e desvio padrão (populacional) de values agrupados por codes, ignorando NaN."""
+    valid = ~np.isnan(values)
+    codes = codes[valid]
+    values = values[valid]
+    count = np.bincount(codes, minlength=n_groups)
+    # astype: com entrada vazia o bincount devolve inteiros mesmo com weights
+    total = np.bincount(codes, weights=values, minlength=n_groups).astype(np.float64)
+    sq_total = np.bincount(codes, weights=values * values, minlength=n_groups).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        var = np.maximum(sq_total / count - mean * mean, 0.0)
+    return {"sum": total, "count": count, "mean": mean, "std": np.sqrt(var)}
+
+
+class AnalyticsEngine:
+    """
+    Carrega um período em arrays NumPy (datas como ordinais de dia, refeições
+    como códigos de categoria e NaN para valores ausentes) e calcula os
+    agregados por dia, semana e refeição de forma vetorizada.
+    """
+
+    def __init__(self, rows, glargina_rows, start_day: int | None = None, end_day: int | None = None):
+        """
+        rows e glargina_rows com o dia como ordinal (Database.iter_days e
+        iter_glargina_days); sem start_day/end_day, o período vai do primeiro
+        ao último dia com dados.
+        """
+        self.meal_names = list(MEALS)
+        meal_codes_by_name = {name: code for code, name in enumerate(self.meal_names)}
+
+        days, meal_codes = [], []
+        columns = {key: [] for key in VALUE_COLUMNS}
+        for day, meal, carbs, glicemia, lispro, bolus, _observations in rows:
+            days.append(day)
+            category = meal_category(meal)
+            code = meal_codes_by_name.get(category)
+            if code is None:
+                code = meal_codes_by_name[category] = len(self.meal_names)
+                self.meal_names.append(category)
+            meal_codes.append(code)
+            for key, value in zip(VALUE_COLUMNS, (carbs, glicemia, lispro, bolus)):
+                columns[key].append(value)
+
+        self.day = np.array(days, dtype=np.int64)
+        self.meal_code = np.array(meal_codes, dtype=np.int64)
+        # dtype float converte None em NaN
+        self.values = {key: np.array(col, dtype=np.float64) for key, col in columns.items()}
+
+        glargina_rows = list(glargina_rows)
+        self.glargina_day = np.array([day for day, _ in glargina_rows], dtype=np.int64)
+        self.glargina_dose = np.array([dose for _, dose in glargina_rows], dtype=np.float64)
+
+        if start_day is not None:
+            self.start_ordinal = start_day
+        else:
+            known = np.concatenate([self.day, self.glargina_day])
+            self.start_ordinal = int(known.min()) if known.size else dt.date.today().toordinal()
+        if end_day is not None:
+            self.end_ordinal = end_day
+        else:
+            known = np.concatenate([self.day, self.glargina_day])
+            self.end_ordinal = int(known.max()) if known.size else self.start_ordinal
+
+    @classmethod
+    def from_database(cls, db, start_day: int, end_day: int) -> "AnalyticsEngine":
+        return cls(db.iter_days(start_day, end_day), db.iter_glargina_days(start_day, end_day), start_day, end_day)
+
+    @classmethod
+    def from_day_records(cls, days) -> "AnalyticsEngine":
+        """Monta o motor a partir de DayRecord em ordem de dia (como CarbTrackerService.iter_report_days)."""
+        return cls(
+            ((record.day, entry.meal, *entry.values()) for record in days for entry in record.meals.values()),
+            [(record.day, record.glargina) for record in days if record.glargina is not None],
+        )
+
+    def subrange(self, start_day: int, end_day: int) -> "AnalyticsEngine":
+        """
+        Motor restrito a [start_day, end_day], contido no período deste. As
+        linhas vêm ordenadas por dia (Database.iter_days), então o recorte são
+        fatias dos arrays, sem cópia; os resultados são os mesmos de carregar
+        o período do banco.
+        """
+        sub = object.__new__(AnalyticsEngine)
+        sub.meal_names = self.meal_names
+        lo, hi = np.searchsorted(self.day, [start_day, end_day + 1])
+        sub.day = self.day[lo:hi]
+        sub.meal_code = self.meal_code[lo:hi]
+        sub.values = {key: values[lo:hi] for key, values in self.values.items()}
+        g_lo, g_hi = np.searchsorted(self.glargina_day, [start_day, end_day + 1])
+        sub.glargina_day = self.glargina_day[g_lo:g_hi]
+        sub.glargina_dose = self.glargina_dose[g_lo:g_hi]
+        sub.start_ordinal = start_day
+        sub.end_ordinal = end_day
+        return sub
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelos arrays (para o limite do cache de relatórios)."""
+        arrays = [self.day, self.meal_code, self.glargina_day, self.glargina_dose, *self.values.values()]
+        return sum(a.nbytes for a in arrays)
+
+    @property
+    def has_data(self) -> bool:
+        """Há alguma refeição ou dose de glargina no período."""
+        return bool(self.day.size or self.glargina_day.size)
+
+    @property
+    def n_days(self) -> int:
+        return max(self.end_ordinal - self.start_ordinal + 1, 0)
+
+    def day_ordinals(self) -> np.ndarray:
+        return np.arange(self.start_ordinal, self.end_ordinal + 1, dtype=np.int64)
+
+    def day_isos(self) -> list[str]:
+        return [to_iso(int(o)) for o in self.day_ordinals()]
+
+    def _in_range(self, days: np.ndarray) -> np.ndarray:
+        return (days >= self.start_ordinal) & (days <= self.end_ordinal)
+
+    def per_day(self) -> dict:
+        """
+        Arrays de tamanho n_days (um elemento por dia do calendário): somas de
+        carbs/lispro/bolus, média, desvio e contagem de glicemia e dose de glargina (NaN se ausente).
+        """
+        n = self.n_days
+        mask = self._in_range(self.day)
+        codes = self.day[mask] - self.start_ordinal
+        result = {"date_ordinal": self.day_ordinals()}
+        for key in ("carbs", "lispro", "bolus"):
+            result[key] = _group_stats(codes, self.values[key][mask], n)["sum"]
+        glicemia = _group_stats(codes, self.values["glicemia"][mask], n)
+        result["glicemia"] = glicemia["mean"]
+        result["glicemia_std"] = glicemia["std"]
+        result["glicemia_count"] = glicemia["count"]
+
+        glargina = np.full(n, np.nan)
+        g_mask = self._in_range(self.glargina_day)
+        glargina[self.glargina_day[g_mask] - self.start_ordinal] = self.glargina_dose[g_mask]
+        result["glargina"] = glargina
+        return result
+
+    def per_week(self) -> dict:
+        """Agregados por semana de calendário (segunda a domingo), indexados pelo ordinal da segunda-feira."""
+        daily = self.per_day()
+        ordinals = daily["date_ordinal"]
+        # O ordinal 1 (01/01/0001) é uma segunda-feira
+        week_start = ordinals - (ordinals - 1) % 7
+        weeks, codes = np.unique(week_start, return_inverse=True)
+        n = len(weeks)
+        result = {"week_start_ordinal": weeks}
+        for key in ("carbs", "lispro", "bolus"):
+            result[key] = np.bincount(codes, weights=daily[key], minlength=n).astype(np.float64)
+
+        mask = self._in_range(self.day)
+        entry_days = self.day[mask]
+        entry_codes = np.searchsorted(weeks, entry_days - (entry_days - 1) % 7)
+        glicemia = _group_stats(entry_codes, self.values["glicemia"][mask], n)
+        result["glicemia"] = glicemia["mean"]
+        result["glicemia_std"] = glicemia["std"]
+        result["glicemia_count"] = glicemia["count"]
+        # Como em period_totals, só doses > 0 entram na média (NaN > 0 é False)
+        has_dose = daily["glargina"] > 0
+        glargina = _group_stats(codes[has_dose], daily["glargina"][has_dose], n)
+        result["glargina"] = glargina["mean"]
+        return result
+
+    def per_meal(self) -> dict:
+        """Estatísticas por categoria de refeição (lanches extras agrupados)."""
+        n = len(self.meal_names)
+        mask = self._in_range(self.day)
+        codes = self.meal_code[mask]
+        stats = {key: _group_stats(codes, self.values[key][mask], n) for key in VALUE_COLUMNS}
+        glicemia = self.values["glicemia"][mask]
+
+        result = {}
+        for code, name in enumerate(self.meal_names):
+            if not any(stats[key]["count"][code] for key in VALUE_COLUMNS):
+                continue
+            meal_glicemia = glicemia[(codes == code) & ~np.isnan(glicemia)]
+            result[name] = {
+                "entries": int(np.count_nonzero(codes == code)),
+                "carbs": float(stats["carbs"]["sum"][code]),
+                "avg_carbs": float(stats["carbs"]["mean"][code]) if stats["carbs"]["count"][code] else None,
+                "lispro": float(stats["lispro"]["sum"][code]),
+                "bolus": float(stats["bolus"]["sum"][code]),
+                "avg_glicemia": float(stats["glicemia"]["mean"][code]) if meal_glicemia.size else None,
+                "glicemia_std": float(stats["glicemia"]["std"][code]) if meal_glicemia.size else None,
+                "glicemia_median": float(np.median(meal_glicemia)) if meal_glicemia.size else None,
+            }
+        return result
+
+    def glicemia_percentiles(self, percentiles=GLICEMIA_PERCENTILES) -> dict:
+        glicemia = self.values["glicemia"][self._in_range(self.day)]
+        glicemia = glicemia[~np.isnan(glicemia)]
+        if not glicemia.size:
+            return {p: None for p in percentiles}
+        return {p: float(v) for p, v in zip(percentiles, np.percentile(glicemia, percentiles))}
+
+    def period_totals(self) -> dict:
+        """Mesmas chaves de CarbTrackerService.calculate_period_totals, acrescidas de dispersão e percentis."""
+        mask = self._in_range(self.day)
+        totals = {}
+        for key in ("carbs", "lispro", "bolus"):
+            totals[key] = float(np.nansum(self.values[key][mask]))
+
+        glicemia = self.values["glicemia"][mask]
+        glicemia = glicemia[~np.isnan(glicemia)]
+        totals["glicemia_sum"] = float(glicemia.sum())
+        totals["glicemia_count"] = int(glicemia.size)
+        totals["avg_glicemia"] = float(glicemia.mean()) if glicemia.size else 0.0
+        totals["glicemia_std"] = float(glicemia.std()) if glicemia.size else 0.0
+        totals["glicemia_min"] = float(glicemia.min()) if glicemia.size else None
+        totals["glicemia_max"] = float(glicemia.max()) if glicemia.size else None
+        totals["glicemia_percentiles"] = self.glicemia_percentiles()
+
+        doses = self.glargina_dose[self._in_range(self.glargina_day)]
+        doses = doses[doses > 0]  # NaN > 0 é False
+        totals["glargina_sum"] = float(doses.sum())
+        totals["glargina_count"] = int(doses.size)
+        totals["avg_glargina"] = float(doses.mean()) if doses.size else 0.0
+        return totals
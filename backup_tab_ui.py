@@ -36,6 +36,18 @@ class BackupTabUI(ttk.Frame):
 
         ttk.Button(backup_frame, text="Criar Backup", command=self.create_backup, style="TButton").grid(row=1, column=0, padx=5, pady=10, sticky="ew")
         ttk.Button(backup_frame, text="Restaurar Backup", command=self.restore_backup, style="TButton").grid(row=1, column=1, padx=5, pady=10, sticky="ew")
+        compact_button = ttk.Button(backup_frame, text="Compactar Banco de Dados", command=self.compact_storage, style="TButton")
+        compact_button.grid(row=2, column=0, columnspan=2, padx=5, pady=10, sticky="ew")
+        ToolTip(compact_button, "Guarda as refeições por código e os valores como inteiros (uma casa decimal), reduzindo o arquivo.")
+
+        ttk.Label(backup_frame, text="Sincronização com outra cópia do banco (ex.: casa e clínica):",
+                  style="LabelField.TLabel", wraplength=400).grid(row=3, column=0, columnspan=2, pady=(15, 5), sticky="ew")
+        export_button = ttk.Button(backup_frame, text="Exportar Alterações", command=self.export_sync_changes, style="TButton")
+        export_button.grid(row=4, column=0, padx=5, pady=10, sticky="ew")
+        ToolTip(export_button, "Gera um arquivo só com os registros alterados desde a última troca, para importar na outra cópia.")
+        import_button = ttk.Button(backup_frame, text="Importar Alterações", command=self.import_sync_changes, style="TButton")
+        import_button.grid(row=4, column=1, padx=5, pady=10, sticky="ew")
+        ToolTip(import_button, "Mescla um arquivo de alterações da outra cópia; em conflitos, vence a edição mais recente.")
 
         # CORREÇÃO AQUI: Usando "text_dark" em vez de "text_primary"
         self.backup_status_label = ttk.Label(self, text="", style="LabelField.TLabel", foreground=self.app_instance.colors["text_dark"])
@@ -99,4 +111,68 @@ class BackupTabUI(ttk.Frame):
                     self.backup_status_label.config(text="Restauração de backup cancelada.", foreground=self.app_instance.colors["text_secondary"])
             except Exception as e:
                 messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado ao restaurar o backup: {e}")
-                self.backup_status_label.config(text=f"Erro inesperado: {e}", foreground=self.app_instance.colors["error_color"])
\ No newline at end of file
+                self.backup_status_label.config(text=f"Erro inesperado: {e}", foreground=self.app_instance.colors["error_color"])
+
+    def compact_storage(self):
+        if not self.app_instance.confirm_save_all_modified_data_before_action():
+            self.backup_status_label.config(text="Compactação cancelada. Há dados não salvos.", foreground=self.app_instance.colors["warning_color"])
+            return
+        if self.service.db.compact:
+            self.backup_status_label.config(text="O banco de dados já está no formato compacto.", foreground=self.app_instance.colors["text_secondary"])
+            return
+        response = messagebox.askyesno(
+            "Confirmar Compactação",
+            "Converter o banco de dados para o formato compacto? Os valores passam a ser guardados com uma casa decimal "
+            "e a conversão não pode ser desfeita. Recomenda-se fazer um backup antes."
+        )
+        if not response:
+            return
+        success, message = self.service.compact_storage()
+        if success:
+            messagebox.showinfo("Banco de Dados Compactado", message)
+            self.backup_status_label.config(text=message, foreground=self.app_instance.colors["success_color"])
+        else:
+            messagebox.showerror("Erro na Compactação", message)
+            self.backup_status_label.config(text=f"Erro: {message}", foreground=self.app_instance.colors["error_color"])
+
+    def export_sync_changes(self):
+        if not self.app_instance.confirm_save_all_modified_data_before_action():
+            self.backup_status_label.config(text="Exportação cancelada. Há dados não salvos.", foreground=self.app_instance.colors["warning_color"])
+            return
+        destination_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Arquivos de alterações", "*.json"), ("All files", "*.*")],
+            initialfile=f"carb_tracker_alteracoes_{dt.date.today().isoformat()}.json",
+            title="Salvar arquivo de alterações como"
+        )
+        if not destination_path:
+            self.backup_status_label.config(text="Exportação cancelada.", foreground=self.app_instance.colors["text_secondary"])
+            return
+        success, message = self.service.export_sync_changes(destination_path)
+        if success:
+            messagebox.showinfo("Alterações Exportadas", message)
+            self.backup_status_label.config(text=message, foreground=self.app_instance.colors["success_color"])
+        else:
+            messagebox.showerror("Erro na Exportação", message)
+            self.backup_status_label.config(text=f"Erro: {message}", foreground=self.app_instance.colors["error_color"])
+
+    def import_sync_changes(self):
+        if not self.app_instance.confirm_save_all_modified_data_before_action():
+            self.backup_status_label.config(text="Importação cancelada. Há dados não salvos.", foreground=self.app_instance.colors["warning_color"])
+            return
+        source_path = filedialog.askopenfilename(
+            filetypes=[("Arquivos de alterações", "*.json"), ("All files", "*.*")],
+            title="Selecionar arquivo de alterações para importar"
+        )
+        if not source_path:
+            self.backup_status_label.config(text="Importação cancelada.", foreground=self.app_instance.colors["text_secondary"])
+            return
+        success, message = self.service.import_sync_changes(source_path)
+        if success:
+            messagebox.showinfo("Alterações Importadas", message)
+            self.backup_status_label.config(text=message, foreground=self.app_instance.colors["success_color"])
+            current_date = self.app_instance.daily_entry_tab_instance.get_date_iso()
+            self.app_instance.daily_entry_tab_instance.load_day_data(current_date)
+        else:
+            messagebox.showerror("Erro na Importação", message)
+            self.backup_status_label.config(text=f"Erro: {message}", foreground=self.app_instance.colors["error_color"])
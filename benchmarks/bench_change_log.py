@@ -0,0 +1,124 @@
+# benchmarks/bench_change_log.py
+#
+# Log de alterações: grava muitas edições em poucos dias com
+# save_daily_changes, confere a reconstrução de cada estado intermediário
+# (get_day_at), desfazer/refazer e a compactação dos changesets antigos, e
+# mede a vazão da reconstrução e da compactação.
+#
+#   python benchmarks/bench_change_log.py [--years 3] [--edits 2000] [--days 20]
+
+import argparse
+import copy
+import datetime as dt
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from constants import FIELDS, FIXED_MEALS
+from day_ordinals import to_day
+from synthetic_data import START_DATE, populate
+
+NUMERIC_KEYS = [key for _, key in FIELDS if key != "observations"]
+
+
+def random_edit(rng: random.Random) -> tuple[float | None, dict]:
+    """Uma gravação com alguns campos alterados (às vezes também a glargina ou um campo limpo)."""
+    glargina = round(rng.uniform(10, 30), 1) if rng.random() < 0.2 else None
+    changed = {}
+    for _ in range(rng.randint(1, 4)):
+        meal = rng.choice(FIXED_MEALS)
+        key = rng.choice(NUMERIC_KEYS + ["observations"])
+        if rng.random() < 0.15:
+            value = None
+        elif key == "observations":
+            value = f"nota {rng.randrange(1000)}"
+        else:
+            value = round(rng.uniform(0, 150), 1)
+        changed.setdefault(meal, {})[key] = value
+    return glargina, changed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = CarbTrackerService(str(Path(tmp_dir) / "log.db"), str(Path(tmp_dir) / "config.json"))
+        populate(service.db, args.years)
+        dates = [(START_DATE + dt.timedelta(days=rng.randrange(365 * args.years))).isoformat() for _ in range(args.days)]
+
+        # Estado esperado após cada changeset; 0 = antes de qualquer edição
+        expected = {(date_iso, 0): copy.deepcopy(service.get_daily_data(date_iso)) for date_iso in dates}
+        t0 = time.perf_counter()
+        for _ in range(args.edits):
+            date_iso = rng.choice(dates)
+            service.save_daily_changes(date_iso, *random_edit(rng))
+            history = service.get_day_changesets(date_iso, limit=1)
+            if history:
+                expected[(date_iso, history[0]["id"])] = copy.deepcopy(service.get_daily_data(date_iso))
+        save_ms = (time.perf_counter() - t0) * 1000 / args.edits
+        n_changesets, n_rows = service.db.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM changesets), (SELECT COUNT(*) FROM change_log)"
+        ).fetchone()
+
+        # Reconstrução de todos os estados intermediários
+        t0 = time.perf_counter()
+        for (date_iso, changeset_id), state in expected.items():
+            assert service.get_day_at(date_iso, changeset_id) == state, (date_iso, changeset_id)
+        replay_s = time.perf_counter() - t0
+        replayed_rows = sum(
+            service.db.conn.execute(
+                "SELECT COUNT(*) FROM changesets AS c JOIN change_log AS l ON l.changeset_id = c.id WHERE c.day = ? AND c.id > ?",
+                (to_day(date_iso), changeset_id),
+            ).fetchone()[0]
+            for date_iso, changeset_id in expected
+        )
+
+        # Desfazer e refazer voltam exatamente aos estados gravados
+        date_iso = dates[0]
+        current = copy.deepcopy(service.get_daily_data(date_iso))
+        ok, _ = service.undo_day_changes(date_iso)
+        assert ok and service.get_undo_state(date_iso)[1]
+        ok, _ = service.redo_day_changes(date_iso)
+        assert ok and service.get_daily_data(date_iso) == current
+        # Desfazer + refazer se anulam: sem eles, o log volta a ter só as gravações conferidas acima
+        service.db.conn.execute("DELETE FROM change_log WHERE changeset_id IN (SELECT id FROM changesets WHERE kind != 'save')")
+        service.db.conn.execute("DELETE FROM changesets WHERE kind != 'save'")
+        service.db.conn.commit()
+
+        # Datas sintéticas crescentes (1 minuto por changeset) e compactação até a metade
+        service.db.conn.execute("UPDATE changesets SET created_at = strftime('%Y-%m-%dT%H:%M:%S', '2024-01-01', '+' || id || ' minutes')")
+        service.db.conn.commit()
+        midpoint_id = max(cid for _, cid in expected) // 2
+        before = service.db.conn.execute("SELECT created_at FROM changesets WHERE id > ? ORDER BY id LIMIT 1", (midpoint_id,)).fetchone()[0]
+        t0 = time.perf_counter()
+        removed_changesets, removed_rows = service.db.compact_change_log(before)
+        compact_s = time.perf_counter() - t0
+
+        for (date_iso, changeset_id), state in expected.items():
+            if changeset_id == 0 or changeset_id > midpoint_id:
+                assert service.get_day_at(date_iso, changeset_id) == state, ("após compactar", date_iso, changeset_id)
+            assert service.get_daily_data(date_iso) == expected[max(
+                (key for key in expected if key[0] == date_iso), key=lambda key: key[1])]
+        assert service.db.compact_change_log(before) == (0, 0)  # Compactar de novo não muda nada
+
+        print(f"{args.edits} gravações em {args.days} dias ({args.years} anos de dados): {save_ms:.2f} ms por gravação")
+        print(f"log: {n_changesets} changesets, {n_rows} linhas")
+        print(f"reconstrução: {len(expected)} estados em {replay_s * 1000:.0f} ms "
+              f"({len(expected) / replay_s:.0f} estados/s, {replayed_rows / replay_s:.0f} alterações desfeitas/s)")
+        print(f"compactação: -{removed_changesets} changesets, -{removed_rows} linhas em {compact_s * 1000:.1f} ms "
+              f"({n_rows / compact_s:.0f} linhas/s)")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_chart_decimation.py
+#
+# Mede a redução das séries diárias para os gráficos (charts.ChartData) sobre
+# um banco sintético de vários anos: custo da primeira redução para cada
+# largura de tela e método, custo do redesenho com a série já em cache e
+# número de pontos desenhados. Confere que o mínimo/máximo preserva os
+# extremos de cada série e mede também os gráficos do relatório PDF.
+#
+#   python benchmarks/bench_chart_decimation.py [--years 10] [--repeat 20]
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from charts import CHART_METHODS, CHART_SERIES, bucket_count_for_width, to_pixels
+from synthetic_data import populate
+
+WIDTHS = (600, 900, 1400, 1920)
+
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def draw_points(chart_data, width: int, method: str) -> int:
+    """Equivalente ao trabalho de ChartsTabUI._draw_panel sem o Canvas: reduzir e converter para pixels."""
+    n_points = 0
+    x_range = chart_data.x_range()
+    for key, _, _ in CHART_SERIES:
+        y_range = chart_data.y_range(key)
+        for seg_x, seg_y in chart_data.plot_segments(key, width, method):
+            n_points += len(to_pixels(seg_x, seg_y, x_range, y_range, (0, 0, width, 200))) // 2
+    return n_points
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = CarbTrackerService(str(Path(tmp_dir) / "bench.db"), str(Path(tmp_dir) / "config.json"))
+        populate(service.db, args.years)
+        first_iso, last_iso = service.get_data_date_bounds()
+
+        t0 = time.perf_counter()
+        chart_data = service.get_chart_data(first_iso, last_iso)
+        print(f"{chart_data.n_days} dias; carga das séries: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        for key, _, _ in CHART_SERIES:
+            y = chart_data.series[key]
+            _, reduced = chart_data.decimated(key, bucket_count_for_width(WIDTHS[0]), "minmax")
+            assert np.nanmin(reduced) == np.nanmin(y) and np.nanmax(reduced) == np.nanmax(y), f"extremos perdidos em {key}"
+
+        print(f"sem redução: {draw_points(chart_data, 10 ** 9, 'minmax')} pontos")
+        print(f"{'método':<8}{'largura':>8}{'pontos':>8}{'1º desenho (ms)':>17}{'redesenho (ms)':>16}")
+        for method in CHART_METHODS:
+            for width in WIDTHS:
+                def cold():
+                    chart_data._decimated.clear()
+                    draw_points(chart_data, width, method)
+
+                cold_ms = median_ms(cold, args.repeat)
+                n_points = draw_points(chart_data, width, method)
+                warm_ms = median_ms(lambda: draw_points(chart_data, width, method), args.repeat)
+                print(f"{method:<8}{width:>8}{n_points:>8}{cold_ms:>17.3f}{warm_ms:>16.3f}")
+
+        from pdf_report_generator import PdfReportGenerator
+
+        def pdf_charts():
+            chart_data._decimated.clear()
+            for key, title, color in CHART_SERIES:
+                PdfReportGenerator._chart_drawing(chart_data, key, title, color)
+
+        print(f"gráficos do PDF (3 séries, {chart_data.n_days} dias): {median_ms(pdf_charts, args.repeat):.3f} ms")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
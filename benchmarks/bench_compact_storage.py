@@ -0,0 +1,153 @@
+# benchmarks/bench_compact_storage.py
+#
+# Compara o armazenamento original de entries (refeição como TEXT, medidas
+# REAL) com o compacto (tabela meals + décimos INTEGER, ver
+# Database.migrate_to_compact) sobre o mesmo banco sintético: tamanho do
+# arquivo e das páginas de entries, tempo de varredura por período e taxa de
+# acerto do cache de páginas do SQLite com um cache pequeno.
+#
+#   python benchmarks/bench_compact_storage.py [--years 10] [--cache-kib 512]
+
+import argparse
+import ctypes
+import datetime as dt
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Database
+from synthetic_data import START_DATE, populate
+
+SQLITE_DBSTATUS_CACHE_HIT = 7
+SQLITE_DBSTATUS_CACHE_MISS = 8
+ENTRY_OBJECTS = {
+    "original": ("entry_rows", "idx_entry_rows_meal_day", "sqlite_autoindex_entry_rows_1"),
+    "compacto": ("entry_values", "meals", "idx_entry_values_meal_day",
+                 "sqlite_autoindex_entry_values_1", "sqlite_autoindex_meals_1"),
+}
+
+
+def _db_status_function():
+    """sqlite3_db_status via ctypes (o módulo sqlite3 não expõe os contadores de cache)."""
+    import _sqlite3
+    function = ctypes.CDLL(_sqlite3.__file__).sqlite3_db_status
+    function.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(ctypes.c_int),
+                         ctypes.POINTER(ctypes.c_int), ctypes.c_int]
+    return function
+
+
+def cache_counters(conn: sqlite3.Connection) -> tuple[int, int] | None:
+    try:
+        db_status = _db_status_function()
+    except (OSError, AttributeError):
+        return None
+    # Em CPython, o ponteiro sqlite3* é o primeiro campo depois do cabeçalho do objeto
+    handle = ctypes.c_void_p.from_address(id(conn) + object.__basicsize__).value
+    values = []
+    for op in (SQLITE_DBSTATUS_CACHE_HIT, SQLITE_DBSTATUS_CACHE_MISS):
+        current, highwater = ctypes.c_int(), ctypes.c_int()
+        if db_status(handle, op, ctypes.byref(current), ctypes.byref(highwater), 0) != 0:
+            return None
+        values.append(current.value)
+    return values[0], values[1]
+
+
+def entry_pages(db: Database, layout: str) -> int | None:
+    names = ENTRY_OBJECTS[layout]
+    try:
+        return db.conn.execute(
+            f"SELECT COUNT(*) FROM dbstat WHERE name IN ({', '.join('?' * len(names))})", names
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None  # SQLite sem a tabela virtual dbstat
+
+
+def random_windows(n_days: int, days: int, count: int, seed: int = 7) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    windows = []
+    for _ in range(count):
+        start = START_DATE + dt.timedelta(days=rng.randrange(max(n_days - days, 1)))
+        windows.append((start.isoformat(), (start + dt.timedelta(days=days - 1)).isoformat()))
+    return windows
+
+
+def measure(path: str, layout: str, n_days: int, cache_kib: int, repeat: int) -> dict:
+    db = Database(path)
+    assert db.compact == (layout == "compacto")
+    pages = entry_pages(db, layout)
+    db.conn.execute(f"PRAGMA cache_size = -{cache_kib}")
+
+    before = cache_counters(db.conn)
+    windows = random_windows(n_days, 90, 50)
+    scan_90d = []
+    for start, end in windows:
+        t0 = time.perf_counter()
+        db.fetch_range(start, end)
+        scan_90d.append((time.perf_counter() - t0) * 1000)
+    scan_all = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = db.fetch_range("0001-01-01", "9999-12-31")
+        scan_all.append((time.perf_counter() - t0) * 1000)
+    after = cache_counters(db.conn)
+    db.close()
+
+    hit_rate = None
+    if before is not None and after is not None:
+        hits, misses = after[0] - before[0], after[1] - before[1]
+        hit_rate = hits / (hits + misses) if hits + misses else None
+    return {
+        "file_kib": os.path.getsize(path) / 1024,
+        "entry_pages": pages,
+        "range_90d_ms": statistics.median(scan_90d),
+        "range_all_ms": statistics.median(scan_all),
+        "cache_hit_rate": hit_rate,
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--cache-kib", type=int, default=512, help="Cache de páginas do SQLite durante as medições")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_path = str(Path(tmp_dir) / "original.db")
+        compact_path = str(Path(tmp_dir) / "compacto.db")
+        db = Database(original_path)
+        n_rows = populate(db, args.years)
+        db.conn.execute("VACUUM")
+        db.close()
+        shutil.copy(original_path, compact_path)
+
+        db = Database(compact_path)
+        t0 = time.perf_counter()
+        db.migrate_to_compact()
+        migration_ms = (time.perf_counter() - t0) * 1000
+        db.close()
+
+        results = {layout: measure(path, layout, 365 * args.years, args.cache_kib, args.repeat)
+                   for layout, path in (("original", original_path), ("compacto", compact_path))}
+        # Os dados sintéticos têm uma casa decimal: a conversão para décimos não perde nada
+        assert results["original"].pop("rows") == results["compacto"].pop("rows"), "leituras divergem entre os formatos"
+
+    print(f"{n_rows} linhas ({args.years} anos); migração: {migration_ms:.0f} ms; cache de {args.cache_kib} KiB")
+    print(f"{'formato':<10}{'arquivo (KiB)':>14}{'páginas':>9}{'90 dias (ms)':>14}{'tudo (ms)':>11}{'acerto cache':>14}")
+    for layout, r in results.items():
+        pages = "—" if r["entry_pages"] is None else str(r["entry_pages"])
+        hit_rate = "—" if r["cache_hit_rate"] is None else f"{100 * r['cache_hit_rate']:.1f}%"
+        print(f"{layout:<10}{r['file_kib']:>14.0f}{pages:>9}{r['range_90d_ms']:>14.3f}{r['range_all_ms']:>11.1f}{hit_rate:>14}")
+
+
+if __name__ == "__main__":
+    main()
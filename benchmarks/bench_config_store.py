@@ -0,0 +1,89 @@
+# benchmarks/bench_config_store.py
+#
+# Compara a gravação da configuração a cada alteração (o comportamento
+# antigo de save_config) com o ConfigStore, que agrupa alterações seguidas em
+# uma escrita atômica. Confere também que uma falha no meio da escrita deixa
+# o arquivo anterior intacto.
+#
+#   python benchmarks/bench_config_store.py [--changes 200]
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config_store
+import instrumentation
+from config_store import ConfigStore
+
+THEMES = ("clam", "alt", "default")
+
+
+def write_every_change(path: Path, changes: int) -> float:
+    config = ConfigStore(str(path)).as_dict()
+    t0 = time.perf_counter()
+    for i in range(changes):
+        config["app_theme"] = THEMES[i % len(THEMES)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=4)
+    return time.perf_counter() - t0
+
+
+def debounced(path: Path, changes: int) -> tuple[float, int]:
+    store = ConfigStore(str(path), save_delay=0.2)
+    instrumentation.enable()
+    instrumentation.clear()
+    t0 = time.perf_counter()
+    for i in range(changes):
+        store.set("app_theme", THEMES[i % len(THEMES)])
+    elapsed = time.perf_counter() - t0
+    time.sleep(store.save_delay * 2)
+    writes = sum(1 for rec in instrumentation.records() if rec["name"] == "ConfigStore.flush")
+    instrumentation.disable()
+    assert json.loads(path.read_text(encoding="utf-8"))["app_theme"] == THEMES[(changes - 1) % len(THEMES)]
+    return elapsed, writes
+
+
+def check_crash_during_write(path: Path):
+    store = ConfigStore(str(path))
+    store.update({"report_date_format": "%Y-%m-%d"}, persist="now")
+    before = path.read_text(encoding="utf-8")
+
+    def failing_dump(data, f, **kwargs):
+        f.write('{"report_date_format": "%d')  # gravação interrompida no meio
+        raise OSError("disco cheio")
+
+    with mock.patch.object(config_store.json, "dump", failing_dump):
+        try:
+            store.update({"report_date_format": "%d/%m/%Y"}, persist="now")
+        except OSError:
+            pass
+    assert path.read_text(encoding="utf-8") == before, "arquivo de configuração corrompido pela falha"
+    assert not list(path.parent.glob(".config-*.tmp")), "arquivo temporário não removido"
+    assert ConfigStore(str(path)).load_error is None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--changes", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        eager_time = write_every_change(tmp / "eager.json", args.changes)
+        store_time, writes = debounced(tmp / "store.json", args.changes)
+        check_crash_during_write(tmp / "crash.json")
+
+    print(f"{args.changes} alterações seguidas do tema")
+    print(f"  gravando a cada alteração: {1000 * eager_time:.2f} ms, {args.changes} escritas")
+    print(f"  ConfigStore (com atraso):  {1000 * store_time:.2f} ms, {writes} escrita(s)")
+    print("  falha no meio da escrita: arquivo anterior preservado")
+
+
+if __name__ == "__main__":
+    main()
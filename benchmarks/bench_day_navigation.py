@@ -0,0 +1,111 @@
+# benchmarks/bench_day_navigation.py
+#
+# Mede a latência de troca de dia na aba de registro diário (load_day_data
+# seguido do processamento de layout pendente), alternando entre dias com
+# muitos lanches extras e dias sem nenhum, e conta os passos de layout por
+# troca de dia. Requer display; o aplicativo roda
+# com um diretório temporário como cwd, então carb_tracker.db não é tocado.
+#
+#   python benchmarks/bench_day_navigation.py [--extras 12] [--rounds 30] [--output nav.json]
+
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import instrumentation
+from carb_tracker_service import CarbTrackerService
+from constants import CONFIG_FILE, DB_FILE
+from synthetic_data import START_DATE, generate_day
+
+
+def prepare_days(tmp_dir: str, extras: int, n_days: int) -> list[str]:
+    """Grava n_days dias alternando entre `extras` lanches extras e nenhum; devolve as datas."""
+    rng = random.Random(42)
+    service = CarbTrackerService(str(Path(tmp_dir) / DB_FILE), str(Path(tmp_dir) / CONFIG_FILE))
+    days = []
+    for i in range(n_days):
+        date_iso = (START_DATE + dt.timedelta(days=i)).isoformat()
+        glargina, meals = generate_day(rng, extra_snacks=extras if i % 2 == 0 else 0)
+        service.save_daily_data(date_iso, glargina, meals)
+        days.append(date_iso)
+    service.close_db()
+    return days
+
+
+def measure(days: list[str], rounds: int) -> dict:
+    import carb_tracker_app
+
+    app = carb_tracker_app.CarbTrackerApp()
+    tab = app.daily_entry_tab_instance
+    app.update()
+    samples = {"many_extras": [], "no_extras": []}
+    for r in range(rounds):
+        for i, date_iso in enumerate(days):
+            t0 = time.perf_counter()
+            tab.load_day_data(date_iso)
+            app.update_idletasks()
+            elapsed = (time.perf_counter() - t0) * 1000
+            if r > 0:  # a primeira rodada cria as linhas e serve de aquecimento
+                samples["many_extras" if i % 2 == 0 else "no_extras"].append(elapsed)
+
+    # Passos de layout por troca de dia, contados pela instrumentação (fora das medições de tempo)
+    instrumentation.enable()
+    layout_passes = []
+    for date_iso in days:
+        instrumentation.clear()
+        tab.load_day_data(date_iso)
+        app.update_idletasks()
+        layout_passes.append(sum(1 for rec in instrumentation.records() if rec["name"] == "DailyEntryTabUI.layout_pass"))
+    instrumentation.disable()
+
+    app.service.close_db()
+    app.destroy()
+    result = {
+        kind: {"median_ms": statistics.median(values), "max_ms": max(values), "samples": len(values)}
+        for kind, values in samples.items()
+    }
+    result["layout_passes_per_load"] = max(layout_passes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extras", type=int, default=12)
+    parser.add_argument("--days", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--output", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("Sem display disponível: benchmark de navegação ignorado.", file=sys.stderr)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        days = prepare_days(tmp_dir, args.extras, args.days)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            result = {"extras": args.extras, "rounds": args.rounds, "load_day_data": measure(days, args.rounds + 1)}
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# benchmarks/bench_day_ordinals.py
+#
+# Compara o formato antigo (datas TEXT ISO em entries e glargina_doses) com o
+# atual (ordinais de dia INTEGER, ver Database._migrate_text_dates) sobre os
+# mesmos dados: varredura de períodos, montagem do motor colunar e junção das
+# somas diárias com a glargina. Também mede a migração na abertura do banco.
+#
+#   python benchmarks/bench_day_ordinals.py [--years 10] [--repeat 5]
+
+import argparse
+import datetime as dt
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics_engine import AnalyticsEngine
+from constants import FIELDS
+from database import Database
+from day_ordinals import to_day
+from synthetic_data import START_DATE, generate_days
+
+# Esquema anterior aos ordinais, só com o necessário para a comparação
+TEXT_SCHEMA = """
+CREATE TABLE entries (
+  date TEXT NOT NULL, meal TEXT NOT NULL,
+  carbs REAL, glicemia REAL, lispro REAL, bolus REAL, observations TEXT,
+  PRIMARY KEY (date, meal)
+);
+CREATE INDEX idx_date ON entries (date);
+CREATE INDEX idx_entries_meal_date ON entries (meal, date);
+CREATE TABLE glargina_doses (date TEXT PRIMARY KEY NOT NULL, dose REAL);
+"""
+TEXT_RANGE_SQL = """
+SELECT date, meal, carbs, glicemia, lispro, bolus, observations
+FROM entries WHERE date BETWEEN ? AND ? ORDER BY date, meal
+"""
+TEXT_GLARGINA_SQL = "SELECT date, dose FROM glargina_doses WHERE date BETWEEN ? AND ? ORDER BY date"
+JOIN_SQL = """
+SELECT e.{key}, e.carbs, g.dose
+FROM (SELECT {key}, SUM(carbs) AS carbs FROM {entries} WHERE {key} BETWEEN ? AND ? GROUP BY {key}) AS e
+LEFT JOIN {glargina} AS g ON g.{key} = e.{key}
+ORDER BY e.{key}
+"""
+
+
+def create_text_database(path: str, years: int) -> int:
+    conn = sqlite3.connect(path)
+    conn.executescript(TEXT_SCHEMA)
+    entries, glargina = [], []
+    for date_iso, dose, meals in generate_days(years):
+        glargina.append((date_iso, dose))
+        for meal, values in meals.items():
+            entries.append((date_iso, meal, *(values[key] for _, key in FIELDS)))
+    conn.executemany(
+        f"INSERT INTO entries (date, meal, {', '.join(key for _, key in FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", entries
+    )
+    conn.executemany("INSERT INTO glargina_doses VALUES (?, ?)", glargina)
+    conn.commit()
+    conn.close()
+    return len(entries)
+
+
+def text_analytics(conn: sqlite3.Connection, start_iso: str, end_iso: str) -> AnalyticsEngine:
+    """Caminho antigo: linhas com data ISO convertidas para ordinal em Python (com cache por data)."""
+    cache = {}
+
+    def day_of(date_iso):
+        day = cache.get(date_iso)
+        if day is None:
+            day = cache[date_iso] = dt.date.fromisoformat(date_iso).toordinal()
+        return day
+
+    rows = ((day_of(row[0]), *row[1:]) for row in conn.execute(TEXT_RANGE_SQL, (start_iso, end_iso)))
+    glargina = [(day_of(d), dose) for d, dose in conn.execute(TEXT_GLARGINA_SQL, (start_iso, end_iso))]
+    return AnalyticsEngine(rows, glargina, day_of(start_iso), day_of(end_iso))
+
+
+def median_ms(function, windows, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for window in windows:
+            function(*window)
+        times.append((time.perf_counter() - t0) * 1000 / len(windows))
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    n_days = 365 * args.years
+    windows = []
+    for _ in range(20):
+        start = START_DATE + dt.timedelta(days=rng.randrange(max(1, n_days - 364)))
+        windows.append((start.isoformat(), (start + dt.timedelta(days=364)).isoformat()))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        text_path = str(Path(tmp_dir) / "texto.db")
+        day_path = str(Path(tmp_dir) / "ordinais.db")
+        n_rows = create_text_database(text_path, args.years)
+        shutil.copy(text_path, day_path)
+
+        t0 = time.perf_counter()
+        db = Database(day_path)  # Migra na abertura
+        migration_ms = (time.perf_counter() - t0) * 1000
+        text_conn = sqlite3.connect(text_path)
+
+        # Os dois formatos devem devolver exatamente os mesmos dados
+        for start_iso, end_iso in windows[:3]:
+            assert text_conn.execute(TEXT_RANGE_SQL, (start_iso, end_iso)).fetchall() == db.fetch_range(start_iso, end_iso)
+            old, new = text_analytics(text_conn, start_iso, end_iso), AnalyticsEngine.from_database(db, to_day(start_iso), to_day(end_iso))
+            for key, values in old.per_day().items():
+                assert ((values == new.per_day()[key]) | ((values != values) & (new.per_day()[key] != new.per_day()[key]))).all(), key
+            old_join = text_conn.execute(JOIN_SQL.format(key="date", entries="entries", glargina="glargina_doses"),
+                                         (start_iso, end_iso)).fetchall()
+            new_join = db.conn.execute(JOIN_SQL.format(key="day", entries="entry_rows", glargina="glargina_days"),
+                                       (to_day(start_iso), to_day(end_iso))).fetchall()
+            # A ordem da soma dentro do dia muda com o índice usado: compara com tolerância
+            assert len(old_join) == len(new_join)
+            for (d, c, g), (day, carbs, dose) in zip(old_join, new_join):
+                assert to_day(d) == day and dose == g and abs((c or 0) - (carbs or 0)) < 1e-9, (d, day)
+
+        day_windows = [(to_day(s), to_day(e)) for s, e in windows]
+        cases = {
+            "varredura 365 dias": (
+                lambda s, e: text_conn.execute(TEXT_RANGE_SQL, (s, e)).fetchall(), windows,
+                lambda s, e: db.fetch_days(s, e), day_windows),
+            "motor colunar 365 dias": (
+                lambda s, e: text_analytics(text_conn, s, e), windows,
+                lambda s, e: AnalyticsEngine.from_database(db, s, e), day_windows),
+            "somas diárias + glargina": (
+                lambda s, e: text_conn.execute(JOIN_SQL.format(key="date", entries="entries", glargina="glargina_doses"), (s, e)).fetchall(), windows,
+                lambda s, e: db.conn.execute(JOIN_SQL.format(key="day", entries="entry_rows", glargina="glargina_days"), (s, e)).fetchall(), day_windows),
+        }
+
+        print(f"{n_rows} linhas ({args.years} anos); migração na abertura: {migration_ms:.0f} ms")
+        print(f"{'operação':<28}{'TEXT (ms)':>11}{'ordinal (ms)':>14}")
+        for label, (text_fn, text_args, day_fn, day_args) in cases.items():
+            print(f"{label:<28}{median_ms(text_fn, text_args, args.repeat):>11.2f}{median_ms(day_fn, day_args, args.repeat):>14.2f}")
+        text_conn.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_domain_models.py
+#
+# Memória e tempo para montar um período longo nos tipos de domain_models
+# (DayRecord/MealEntry e DailyAggregate, com __slots__) contra as estruturas
+# anteriores: um dicionário por refeição ({refeição: {campo: valor}} por dia)
+# e um dicionário por dia nos agregados diários. Confere que os dois formatos
+# têm os mesmos valores.
+#
+#   python benchmarks/bench_domain_models.py [--years 10] [--repeat 3]
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from constants import FIELDS
+from day_ordinals import MAX_DAY, MIN_DAY, to_iso
+from synthetic_data import populate
+
+
+def legacy_day_dicts(service: CarbTrackerService, start_day: int, end_day: int) -> dict:
+    """Formato anterior: {data ISO: (glargina, {refeição: {campo: valor}})}."""
+    db = service.report_db()
+    days = {}
+    for day, meal, *values in db.iter_days(start_day, end_day):
+        date_iso = to_iso(day)
+        if date_iso not in days:
+            days[date_iso] = (None, {})
+        days[date_iso][1][meal] = {key: value for (_, key), value in zip(FIELDS, values)}
+    for day, dose in db.iter_glargina_days(start_day, end_day):
+        date_iso = to_iso(day)
+        days[date_iso] = (dose, days[date_iso][1] if date_iso in days else {})
+    return days
+
+
+def legacy_aggregates(service: CarbTrackerService, start_iso: str, end_iso: str) -> dict:
+    """Formato anterior de get_daily_aggregated_data: {data ISO: {"carbs", "glicemia", "glargina"}}."""
+    daily = service.get_range_analytics(start_iso, end_iso).per_day()
+    return {
+        to_iso(ordinal): {
+            "carbs": carbs,
+            "glicemia": None if glicemia != glicemia else glicemia,
+            "glargina": None if glargina != glargina else glargina,
+        }
+        for ordinal, carbs, glicemia, glargina in zip(
+            daily["date_ordinal"].tolist(), daily["carbs"].tolist(),
+            daily["glicemia"].tolist(), daily["glargina"].tolist(),
+        )
+    }
+
+
+def measure(build, repeat: int) -> tuple[float, float, object]:
+    """(mediana em ms, MiB retidos pelo resultado, resultado)."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return statistics.median(samples), retained / 2**20, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        service = CarbTrackerService(str(tmp / "bench.db"), str(tmp / "config.json"))
+        n_rows = populate(service.db, args.years)
+        first_iso, last_iso = service.get_data_date_bounds()
+        service.report_db()
+
+        results = {}
+        legacy_ms, legacy_mib, legacy = measure(lambda: legacy_day_dicts(service, MIN_DAY, MAX_DAY), args.repeat)
+        new_ms, new_mib, records = measure(lambda: list(service.iter_report_days(first_iso, last_iso)), args.repeat)
+        results["dias (refeições)"] = (legacy_ms, legacy_mib, new_ms, new_mib)
+        assert [record.date_iso for record in records] == list(legacy)
+        for record in records:
+            dose, meals = legacy[record.date_iso]
+            assert record.glargina == dose
+            assert {meal: dict(zip((key for _, key in FIELDS), entry.values()))
+                    for meal, entry in record.meals.items()} == meals
+
+        # Agregados sem o cache de relatórios (o motor colunar fica fora da medição)
+        service.get_range_analytics(first_iso, last_iso)
+        legacy_ms, legacy_mib, legacy = measure(lambda: legacy_aggregates(service, first_iso, last_iso), args.repeat)
+        new_ms, new_mib, aggregates = measure(lambda: service._daily_aggregated_data(first_iso, last_iso), args.repeat)
+        results["agregados diários"] = (legacy_ms, legacy_mib, new_ms, new_mib)
+        assert [a.date_iso for a in aggregates] == list(legacy)
+        assert all(legacy[a.date_iso] == {"carbs": a.carbs, "glicemia": a.glicemia, "glargina": a.glargina}
+                   for a in aggregates)
+
+        print(f"{args.years} anos de dados ({n_rows} refeições, {len(records)} dias)")
+        print(f"{'estrutura':<20}{'antes (ms)':>12}{'antes (MiB)':>13}{'agora (ms)':>12}{'agora (MiB)':>13}")
+        for label, (legacy_ms, legacy_mib, new_ms, new_mib) in results.items():
+            print(f"{label:<20}{legacy_ms:>12.1f}{legacy_mib:>13.2f}{new_ms:>12.1f}{new_mib:>13.2f}")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_export.py
+#
+# Compara tempo de exportação e tamanho do arquivo entre os formatos
+# suportados por DataExporter para um conjunto sintético de 10 anos.
+#
+#   python benchmarks/bench_export.py [--years 10]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_exporter import DataExporter
+from database import Database
+from synthetic_data import populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        db = Database(str(tmp / "bench.db"))
+        n_rows = populate(db, args.years)
+        print(f"{n_rows} linhas ({args.years} anos)")
+        print(f"{'formato':<10}{'tempo (s)':>12}{'tamanho (KiB)':>16}")
+
+        for fmt in DataExporter.available_formats():
+            out = tmp / f"export.{fmt}"
+            t0 = time.perf_counter()
+            DataExporter.export(fmt, str(out), db.iter_range("0001-01-01", "9999-12-31"),
+                                db.iter_glargina_range("0001-01-01", "9999-12-31"))
+            elapsed = time.perf_counter() - t0
+            size = sum(p.stat().st_size for p in tmp.glob("export*"))
+            for p in tmp.glob("export*"):
+                p.unlink()
+            print(f"{fmt:<10}{elapsed:>12.3f}{size / 1024:>16.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
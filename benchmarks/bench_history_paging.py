@@ -0,0 +1,65 @@
+# benchmarks/bench_history_paging.py
+#
+# Confere a paginação por chave do histórico (Database.fetch_history_page)
+# contra a ordenação completa em Python e compara o custo de ler páginas
+# profundas por chave e por OFFSET, para cada coluna ordenável.
+#
+#   python benchmarks/bench_history_paging.py [--years 10] [--page 125]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import HISTORY_SORT_KEYS, Database
+from synthetic_data import populate
+
+
+def walk_keyset(db: Database, sort_column: str, descending: bool, page: int) -> list:
+    rows, after = [], None
+    while True:
+        chunk = db.fetch_history_page(None, sort_column, descending, after=after, limit=page)
+        if not chunk:
+            return rows
+        rows.extend(chunk)
+        after = Database.history_sort_key(chunk[-1], sort_column)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--page", type=int, default=125)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(str(Path(tmp_dir) / "bench.db"))
+        n_rows = populate(db, args.years)
+        all_rows = db.conn.execute("SELECT date, meal, carbs, glicemia, lispro, bolus, observations FROM entries").fetchall()
+        print(f"{n_rows} linhas ({args.years} anos), páginas de {args.page}")
+        print(f"{'ordenação':<16}{'chave (ms/pág)':>16}{'OFFSET (ms/pág)':>18}")
+
+        for sort_column in HISTORY_SORT_KEYS:
+            for descending in (False, True):
+                expected = sorted(all_rows, key=lambda r: Database.history_sort_key(r, sort_column), reverse=descending)
+
+                t0 = time.perf_counter()
+                rows = walk_keyset(db, sort_column, descending, args.page)
+                keyset_time = time.perf_counter() - t0
+                assert rows == expected, f"paginação por chave diverge da ordenação completa ({sort_column})"
+
+                t0 = time.perf_counter()
+                for offset in range(0, n_rows, args.page):
+                    db.fetch_history_page(None, sort_column, descending, offset=offset, limit=args.page)
+                offset_time = time.perf_counter() - t0
+
+                pages = -(-n_rows // args.page)
+                label = f"{sort_column} {'desc' if descending else 'asc'}"
+                print(f"{label:<16}{1000 * keyset_time / pages:>16.3f}{1000 * offset_time / pages:>18.3f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
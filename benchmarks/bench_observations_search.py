@@ -0,0 +1,55 @@
+# benchmarks/bench_observations_search.py
+#
+# Compara a busca nas observações pelo índice FTS5 (Database.search_observations)
+# com a varredura por LIKE sobre um banco sintético de vários anos, e confere
+# que as duas encontram as mesmas refeições.
+#
+#   python benchmarks/bench_observations_search.py [--years 10] [--repeat 20]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Database
+from synthetic_data import populate
+
+QUERIES = ("caminhada", "casa", "hipoglicemia leve", "medir", "inexistente")
+
+
+def timed_search(search, text: str, repeat: int) -> tuple[float, list]:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        rows = search(text, limit=1_000_000)
+    return (time.perf_counter() - t0) / repeat, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(str(Path(tmp_dir) / "bench.db"))
+        if not db.has_fts:
+            print("SQLite sem FTS5: nada a comparar.")
+            return
+        n_rows = populate(db, args.years)
+        print(f"{n_rows} linhas ({args.years} anos)")
+        print(f"{'consulta':<20}{'achados':>9}{'FTS5 (ms)':>12}{'LIKE (ms)':>12}")
+
+        for text in QUERIES:
+            fts_time, fts_rows = timed_search(db.search_observations, text, args.repeat)
+            like_time, like_rows = timed_search(db.search_observations_like, text, args.repeat)
+            # Os termos usados não têm acentos nem aparecem no meio de outras palavras
+            assert [r[:2] for r in fts_rows] == [r[:2] for r in like_rows], f"resultados divergem para '{text}'"
+            print(f"{text:<20}{len(fts_rows):>9}{1000 * fts_time:>12.3f}{1000 * like_time:>12.3f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# benchmarks/bench_report_cache.py
+#
+# Cache de relatórios (report_cache.ReportCache): totais e agregados diários
+# repetidos, períodos contidos em outro já carregado (meses dentro de um
+# trimestre, recortados do motor colunar) e PDFs repetidos. Confere que os
+# resultados do cache são iguais aos calculados do zero, que gravações e a
+# restauração de backup invalidam o cache e que os limites LRU são respeitados.
+#
+#   python benchmarks/bench_report_cache.py [--years 10] [--repeat 5]
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics_engine import AnalyticsEngine
+from carb_tracker_service import CarbTrackerService
+from day_ordinals import to_day
+from report_cache import ReportCache
+from synthetic_data import generate_day, populate
+
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def same_totals(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(
+        a[k] == b[k] or (isinstance(a[k], float) and abs(a[k] - b[k]) < 1e-9) for k in a
+    )
+
+
+def same_per_day(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(np.array_equal(a[k], b[k], equal_nan=True) for k in a)
+
+
+def fresh_engine(service: CarbTrackerService, start_iso: str, end_iso: str) -> AnalyticsEngine:
+    return AnalyticsEngine.from_database(service.db, to_day(start_iso), to_day(end_iso))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        db_path = str(tmp / "bench.db")
+        service = CarbTrackerService(db_path, str(tmp / "config.json"))
+        populate(service.db, args.years)
+        _, last_iso = service.get_data_date_bounds()
+        last = dt.date.fromisoformat(last_iso)
+        year_start = (last - dt.timedelta(days=364)).isoformat()
+        quarter_start = last - dt.timedelta(days=89)
+        months = [((quarter_start + dt.timedelta(days=30 * i)).isoformat(),
+                   (quarter_start + dt.timedelta(days=30 * i + 29)).isoformat()) for i in range(3)]
+
+        def cold(func):
+            """Mede func sem cache (cache esvaziado a cada execução)."""
+            def run():
+                service._report_cache.clear()
+                func()
+            return median_ms(run, args.repeat)
+
+        results = {}
+        totals = lambda: service.calculate_period_totals(year_start, last_iso)
+        results["totals 365 dias"] = (cold(totals), median_ms(totals, args.repeat))
+        daily = lambda: service.get_daily_aggregated_data(year_start, last_iso)
+        results["agregados diários 365 dias"] = (cold(daily), median_ms(daily, args.repeat))
+
+        # Meses dentro de um trimestre já carregado: recorte do motor, sem ler o banco
+        def months_from_quarter():
+            service.get_range_analytics(quarter_start.isoformat(), last_iso)
+            for start_iso, end_iso in months:
+                service.calculate_period_totals(start_iso, end_iso)
+        results["trimestre + 3 meses"] = (cold(months_from_quarter), median_ms(months_from_quarter, args.repeat))
+        service._report_cache.clear()
+        service.get_range_analytics(quarter_start.isoformat(), last_iso)
+        for start_iso, end_iso in months:
+            engine = service.get_range_analytics(start_iso, end_iso)
+            reference = fresh_engine(service, start_iso, end_iso)
+            assert same_totals(service.calculate_period_totals(start_iso, end_iso), reference.period_totals())
+            assert same_per_day(engine.per_day(), reference.per_day())
+            assert engine.per_meal() == reference.per_meal()
+        assert same_totals(totals(), fresh_engine(service, year_start, last_iso).period_totals())
+
+        # PDF repetido: os bytes guardados são gravados direto
+        from pdf_report_generator import PdfReportGenerator
+        pdf_path = str(tmp / "report.pdf")
+        start_iso = months[0][0]
+
+        def render_pdf():
+            version = service.data_version
+            days = service.iter_report_days(start_iso, last_iso)
+            PdfReportGenerator.generate_report(pdf_path, start_iso, last_iso, days,
+                                               analytics=service.get_range_analytics(start_iso, last_iso),
+                                               glycemic_metrics=service.get_glycemic_metrics(start_iso, last_iso))
+            service.cache_pdf(start_iso, last_iso, "%d/%m/%Y", version, pdf_path)
+
+        def cached_pdf():
+            data = service.get_cached_pdf(start_iso, last_iso, "%d/%m/%Y")
+            Path(pdf_path).write_bytes(data)
+
+        render_ms = cold(render_pdf)
+        render_pdf()
+        assert service.get_cached_pdf(start_iso, last_iso, "%d/%m/%Y") == Path(pdf_path).read_bytes()
+        results["PDF 90 dias"] = (render_ms, median_ms(cached_pdf, args.repeat))
+
+        # Gravações e restauração de backup mudam a versão e invalidam tudo
+        version = service.data_version
+        service.save_daily_data(months[1][0], *generate_day(rng))
+        assert service.data_version != version
+        assert service.get_cached_pdf(start_iso, last_iso, "%d/%m/%Y") is None
+        assert same_totals(service.calculate_period_totals(*months[1]), fresh_engine(service, *months[1]).period_totals())
+        ok, msg = service.create_backup(db_path, str(tmp / "backup.db"))
+        assert ok, msg
+        render_pdf()
+        assert service.get_cached_pdf(start_iso, last_iso, "%d/%m/%Y") is not None
+        n_cached, cached_kib = len(service._report_cache), service._report_cache.size_bytes / 1024
+        ok, msg = service.restore_backup(str(tmp / "backup.db"), db_path)
+        assert ok, msg
+        assert service.get_cached_pdf(start_iso, last_iso, "%d/%m/%Y") is None
+
+        # Limites LRU
+        cache = ReportCache(max_entries=4, max_bytes=1000)
+        for i in range(10):
+            cache.put(("x", i, i), 1, b"." * 100, 100)
+        assert len(cache) == 4 and cache.get(("x", 9, 9), 1) is not None and cache.get(("x", 0, 0), 1) is None
+        for i in range(3):
+            cache.put(("pdf", i, i), 1, b"." * 400, 400)
+        assert cache.size_bytes <= 1000
+
+        print(f"{args.years} anos de dados; cache com {n_cached} itens, {cached_kib:.0f} KiB")
+        print(f"{'operação':<28}{'sem cache (ms)':>16}{'com cache (ms)':>16}")
+        for label, (cold_ms, warm_ms) in results.items():
+            print(f"{label:<28}{cold_ms:>16.3f}{warm_ms:>16.3f}")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
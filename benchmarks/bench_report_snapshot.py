@@ -0,0 +1,108 @@
+# benchmarks/bench_report_snapshot.py
+#
+# Cópia em memória para os relatórios (CarbTrackerService.report_db): custo
+# de refazer a cópia, leituras iguais às do banco em disco, isolamento (a
+# cópia não vê gravações feitas depois dela) e gravações do registro diário
+# durante a montagem de um PDF em segundo plano, como em ReportsTabUI.
+#
+#   python benchmarks/bench_report_snapshot.py [--years 10] [--saves 50]
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from day_ordinals import MAX_DAY, MIN_DAY
+from synthetic_data import generate_day, populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--saves", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        service = CarbTrackerService(str(tmp / "bench.db"), str(tmp / "config.json"))
+        populate(service.db, args.years)
+        first_iso, last_iso = service.get_data_date_bounds()
+        start_iso = (dt.date.fromisoformat(last_iso) - dt.timedelta(days=364)).isoformat()
+        dates = [(dt.date.fromisoformat(first_iso) + dt.timedelta(days=i)).isoformat() for i in range(365 * args.years)]
+
+        # A cópia devolve o mesmo que o banco em disco e só é refeita depois de gravações
+        snapshot = service.report_db()
+        assert service.report_db() is snapshot
+        assert snapshot.fetch_days(MIN_DAY, MAX_DAY) == service.db.fetch_days(MIN_DAY, MAX_DAY)
+        assert [(record.date_iso, *entry.values()) for record in service.iter_report_days(first_iso, last_iso)
+                for entry in record.meals.values()] == [(date_iso, *values) for date_iso, _meal, *values
+                                                        in service.db.fetch_range(first_iso, last_iso)]
+
+        refresh_ms = []
+        for _ in range(10):
+            service.save_daily_data(rng.choice(dates), *generate_day(rng))
+            t0 = time.perf_counter()
+            service.report_db()
+            refresh_ms.append((time.perf_counter() - t0) * 1000)
+
+        # Isolamento: quem guarda a cópia continua vendo o instante em que ela foi feita
+        snapshot = service.report_db()
+        before = snapshot.fetch_range(last_iso, last_iso)
+        service.save_daily_changes(last_iso, 99.0, {"Almoço": {"carbs": 123.4}})
+        assert snapshot.fetch_range(last_iso, last_iso) == before
+        assert service.report_db() is not snapshot
+        assert service.report_db().fetch_range(last_iso, last_iso) == service.db.fetch_range(last_iso, last_iso)
+
+        from pdf_report_generator import PdfReportGenerator
+
+        def report_args():
+            days = service.iter_report_days(start_iso, last_iso)
+            return ((str(tmp / "report.pdf"), start_iso, last_iso, days),
+                    {"analytics": service.get_range_analytics(start_iso, last_iso),
+                     "glycemic_metrics": service.get_glycemic_metrics(start_iso, last_iso)})
+
+        def timed_saves() -> list[float]:
+            samples = []
+            for _ in range(args.saves):
+                t0 = time.perf_counter()
+                service.save_daily_data(rng.choice(dates), *generate_day(rng))
+                samples.append((time.perf_counter() - t0) * 1000)
+            return samples
+
+        positional, keywords = report_args()
+        t0 = time.perf_counter()
+        PdfReportGenerator.generate_report(*positional, **keywords)
+        pdf_ms = (time.perf_counter() - t0) * 1000
+        idle_saves = timed_saves()
+
+        # PDF em segundo plano enquanto o registro diário grava
+        positional, keywords = report_args()
+        worker = threading.Thread(target=PdfReportGenerator.generate_report, args=positional, kwargs=keywords)
+        t0 = time.perf_counter()
+        worker.start()
+        concurrent_saves = []
+        while worker.is_alive():
+            concurrent_saves += timed_saves()
+        worker.join()
+        concurrent_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"{args.years} anos de dados; PDF de 365 dias: {pdf_ms:.0f} ms")
+        print(f"refazer a cópia em memória: mediana {statistics.median(refresh_ms):.2f} ms")
+        print(f"gravação sem relatório:       mediana {statistics.median(idle_saves):.2f} ms")
+        print(f"gravação durante o PDF:       mediana {statistics.median(concurrent_saves):.2f} ms, "
+              f"máx {max(concurrent_saves):.1f} ms ({len(concurrent_saves)} gravações em {concurrent_ms:.0f} ms)")
+        print(f"antes, a primeira gravação esperava o PDF inteiro: ~{pdf_ms:.0f} ms")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_startup.py
+#
+# Mede o custo de abertura do aplicativo:
+#   * tempo de import (python -X importtime) de carb_tracker_app e os módulos mais pesados;
+#   * tempo até a primeira pintura da janela (requer display).
+# Cada medição roda em um processo novo, com um diretório temporário como cwd
+# para que carb_tracker.db e o arquivo de configuração não sejam tocados.
+#
+#   python benchmarks/bench_startup.py [--runs 5] [--output startup.json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Módulos que não devem ser carregados antes da janela aparecer
+DEFERRED_MODULES = ("reportlab", "numpy", "pdf_report_generator", "reports_tab_ui")
+
+FIRST_PAINT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import carb_tracker_app
+t_import = time.perf_counter()
+app = carb_tracker_app.CarbTrackerApp()
+while not app.winfo_ismapped():
+    app.update()
+app.update_idletasks()
+t_paint = time.perf_counter()
+app.destroy()
+print(f"{t_import - t0:.6f} {t_paint - t0:.6f}")
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(REPO_ROOT), env.get("PYTHONPATH", "")])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_import_time(cwd: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import carb_tracker_app"],
+        cwd=cwd, env=_env(), capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    top_level = {name: us for name, us in cumulative.items() if "." not in name}
+    heaviest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "total_ms": cumulative.get("carb_tracker_app", 0) / 1000,
+        "heaviest_ms": {name: us / 1000 for name, us in heaviest},
+        "deferred_modules_loaded": [m for m in DEFERRED_MODULES if m in cumulative],
+    }
+
+
+def measure_first_paint(cwd: str, runs: int) -> dict | None:
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", FIRST_PAINT_SNIPPET], cwd=cwd, env=_env(),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            # Sem display (ex.: CI headless) não há como abrir a janela
+            return None
+        import_s, paint_s = map(float, proc.stdout.split())
+        samples.append((import_s, paint_s))
+    return {
+        "import_ms": statistics.median(s[0] for s in samples) * 1000,
+        "first_paint_ms": statistics.median(s[1] for s in samples) * 1000,
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = {
+            "importtime": measure_import_time(tmp_dir),
+            "first_paint": measure_first_paint(tmp_dir, args.runs),
+        }
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/bench_statement_cache.py
+#
+# Custo por chamada de fetch_entry e upsert_entry em laços apertados, nos dois
+# formatos de armazenamento: o registro de comandos (database.prepared_queries,
+# texto montado uma vez e parâmetros posicionais) contra a forma anterior,
+# que formatava o SQL e montava um dicionário de parâmetros a cada chamada.
+# Compara também upsert_entries (executemany), em lotes do tamanho de um dia
+# como save_daily_data grava e em um lote único, com o laço de upsert_entry,
+# e confere que as formas gravam exatamente o mesmo.
+#
+# As variantes de cada operação se alternam em rodadas (a ordem inverte a
+# cada rodada) e cada gravação roda em uma transação própria desfeita ao
+# final, para que uma não herde o estado (páginas, índice FTS pendente)
+# deixado pela outra. O resultado é o mínimo das rodadas, menos sensível a
+# ruído da máquina que a mediana.
+#
+#   python benchmarks/bench_statement_cache.py [--years 1] [--calls 20000] [--rounds 7]
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import ENTRY_VALUE_COLUMNS, MEAL_ID_SQL, TENTHS_COLUMNS, Database, tenths_sql
+from day_ordinals import MAX_DAY, MIN_DAY
+from synthetic_data import populate
+
+
+def legacy_fetch_entry(db: Database, day: int, meal: str):
+    return db.conn.execute(
+        """
+        SELECT carbs, glicemia, lispro, bolus, observations
+        FROM entries
+        WHERE day = ? AND meal = ?
+        """,
+        (day, meal),
+    ).fetchone()
+
+
+def legacy_upsert_entry(db: Database, day: int, meal: str, values: dict):
+    """Como upsert_entry gravava antes do registro: SQL formatado e parâmetros nomeados por chamada."""
+    if db.compact:
+        table, meal_column, meal_sql = "entry_values", "meal_id", MEAL_ID_SQL.format(":meal")
+        db.conn.execute("INSERT OR IGNORE INTO meals (name) VALUES (?)", (meal,))
+    else:
+        table, meal_column, meal_sql = "entry_rows", "meal", ":meal"
+    columns = list(ENTRY_VALUE_COLUMNS)
+    value_sql = [tenths_sql(f":{c}") if db.compact and c in TENTHS_COLUMNS else f":{c}" for c in columns]
+    db.conn.execute(
+        f"""
+        INSERT INTO {table} (day, {meal_column}, {', '.join(columns)})
+        VALUES (:day, {meal_sql}, {', '.join(value_sql)})
+        ON CONFLICT(day, {meal_column}) DO UPDATE SET
+          {', '.join(f"{c}=excluded.{c}" for c in columns)}
+        """,
+        {"day": day, "meal": meal, **{c: values[c] for c in columns}},
+    )
+
+
+def compare(db: Database, variants: dict, n_calls: int, rounds: int, writes: bool = False) -> dict:
+    """
+    {nome: µs por chamada (mínimo das rodadas)} de variants = {nome: função
+    sem argumentos que faz n_calls chamadas}. Com writes=True cada execução
+    roda em uma transação desfeita ao final.
+    """
+    samples = {name: [] for name in variants}
+    for i in range(rounds):
+        order = list(variants.items())
+        if i % 2:
+            order.reverse()
+        for name, func in order:
+            with db.transaction():
+                t0 = time.perf_counter()
+                func()
+                samples[name].append((time.perf_counter() - t0) / n_calls * 1e6)
+                if writes:
+                    db.conn.rollback()
+    return {name: min(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for compact in (False, True):
+            db = Database(str(Path(tmp_dir) / f"bench-{compact}.db"), compact=compact)
+            populate(db, args.years)
+            keys = [(day, meal) for day, meal, *_ in db.fetch_days(MIN_DAY, MAX_DAY)]
+            keys = [rng.choice(keys) for _ in range(args.calls)]
+            writes = [
+                (day, meal, {"carbs": round(rng.uniform(0, 120), 1), "glicemia": round(rng.uniform(60, 250), 1),
+                             "lispro": round(rng.uniform(0, 12), 1), "bolus": None, "observations": f"obs {i}"})
+                for i, (day, meal) in enumerate(keys)
+            ]
+            # Última gravação de cada (dia, refeição), agrupada por dia como em save_daily_data
+            latest = {(day, meal): values for day, meal, values in writes}
+            rows = [(day, meal, *(values[c] for c in ENTRY_VALUE_COLUMNS))
+                    for (day, meal), values in sorted(latest.items())]
+            day_batches = {}
+            for row in rows:
+                day_batches.setdefault(row[0], []).append(row)
+            label = "compacto" if compact else "original"
+
+            assert all(db.fetch_entry(*key) == legacy_fetch_entry(db, *key) for key in keys[:1000])
+            timings = compare(db, {
+                "antes": lambda: [legacy_fetch_entry(db, day, meal) for day, meal in keys],
+                "agora": lambda: [db.fetch_entry(day, meal) for day, meal in keys],
+            }, len(keys), args.rounds)
+            results.append((label, "fetch_entry", "SQL por chamada", timings["antes"], timings["agora"]))
+
+            def loop_rows():
+                for day, meal, *values in rows:
+                    db.upsert_entry(day, meal, dict(zip(ENTRY_VALUE_COLUMNS, values)))
+
+            def state_after(func):
+                with db.transaction():
+                    func()
+                    state = db.fetch_days(MIN_DAY, MAX_DAY)
+                    db.conn.rollback()
+                return state
+
+            legacy_state = state_after(lambda: [legacy_upsert_entry(db, *write) for write in writes])
+            assert state_after(lambda: [db.upsert_entry(*write) for write in writes]) == legacy_state
+            assert state_after(loop_rows) == legacy_state
+            assert state_after(lambda: [db.upsert_entries(batch) for batch in day_batches.values()]) == legacy_state
+            assert state_after(lambda: db.upsert_entries(rows)) == legacy_state
+
+            timings = compare(db, {
+                "antes": lambda: [legacy_upsert_entry(db, *write) for write in writes],
+                "agora": lambda: [db.upsert_entry(*write) for write in writes],
+            }, len(writes), args.rounds, writes=True)
+            results.append((label, "upsert_entry", "SQL por chamada", timings["antes"], timings["agora"]))
+            timings = compare(db, {
+                "laço": loop_rows,
+                "por dia": lambda: [db.upsert_entries(batch) for batch in day_batches.values()],
+                "único": lambda: db.upsert_entries(rows),
+            }, len(rows), args.rounds, writes=True)
+            results.append((label, "upsert_entries (dia)", "upsert_entry", timings["laço"], timings["por dia"]))
+            results.append((label, "upsert_entries (único)", "upsert_entry", timings["laço"], timings["único"]))
+            db.close()
+
+    print(f"µs por chamada (por linha nos lotes), mínimo de {args.rounds} rodadas alternadas")
+    print(f"{'formato':<10}{'operação':<24}{'comparado a':<17}{'antes':>9}{'agora':>9}{'ganho':>8}")
+    for label, operation, reference, before_us, after_us in results:
+        print(f"{label:<10}{operation:<24}{reference:<17}{before_us:>9.2f}{after_us:>9.2f}{before_us / after_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
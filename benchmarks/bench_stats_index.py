@@ -0,0 +1,103 @@
+# benchmarks/bench_stats_index.py
+#
+# Confere o índice de somas de prefixo (daily_stats) contra a agregação
+# ingênua sobre entries/glargina_days e compara o tempo das duas consultas
+# para as janelas móveis de TRAILING_WINDOWS.
+#
+#   python benchmarks/bench_stats_index.py [--years 10] [--edits 200]
+
+import argparse
+import datetime as dt
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from constants import TRAILING_WINDOWS
+from database import DAILY_STATS_COLUMNS
+from day_ordinals import to_day
+from synthetic_data import generate_day, populate
+
+
+def naive_window(db, start_iso: str, end_iso: str) -> dict:
+    totals = dict.fromkeys(DAILY_STATS_COLUMNS, 0.0)
+    for _, _, carbs, glicemia, lispro, bolus, _ in db.fetch_range(start_iso, end_iso):
+        totals["carbs"] += carbs or 0
+        totals["lispro"] += lispro or 0
+        totals["bolus"] += bolus or 0
+        if glicemia is not None:
+            totals["glicemia_sum"] += glicemia
+            totals["glicemia_count"] += 1
+    for _, dose in db.fetch_glargina_range(start_iso, end_iso):
+        if dose is not None and dose > 0:
+            totals["glargina_sum"] += dose
+            totals["glargina_count"] += 1
+    return totals
+
+
+def assert_same(expected: dict, actual: dict, context: str):
+    for key in DAILY_STATS_COLUMNS:
+        if abs(expected[key] - actual[key]) > 1e-6 * max(1.0, abs(expected[key])):
+            raise AssertionError(f"{context}: {key} esperado {expected[key]}, índice {actual[key]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--windows", type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = CarbTrackerService(str(Path(tmp_dir) / "bench.db"), str(Path(tmp_dir) / "config.json"))
+        populate(service.db, args.years)
+        first_day = dt.date(2015, 1, 1)
+        n_days = 365 * args.years
+
+        # Edições incrementais via save_daily_data (inclusive dias esvaziados)
+        t0 = time.perf_counter()
+        for _ in range(args.edits):
+            day = (first_day + dt.timedelta(days=rng.randrange(n_days))).isoformat()
+            glargina, meals = generate_day(rng)
+            if rng.random() < 0.1:
+                glargina, meals = 0.0, {}
+            service.save_daily_data(day, glargina, meals)
+        edit_time = time.perf_counter() - t0
+
+        windows = []
+        for _ in range(args.windows):
+            end = first_day + dt.timedelta(days=rng.randrange(-30, n_days + 30))
+            windows.append(((end - dt.timedelta(days=rng.choice(TRAILING_WINDOWS) - 1)).isoformat(), end.isoformat()))
+
+        t0 = time.perf_counter()
+        naive = [naive_window(service.db, s, e) for s, e in windows]
+        naive_time = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        indexed = [service.db.fetch_window_stats(to_day(s), to_day(e)) for s, e in windows]
+        index_time = time.perf_counter() - t0
+
+        for (s, e), expected, actual in zip(windows, naive, indexed):
+            assert_same(expected, actual, f"janela {s}..{e}")
+
+        # O índice incremental deve coincidir com uma reconstrução completa
+        incremental = service.db.conn.execute("SELECT * FROM daily_stats ORDER BY day").fetchall()
+        service.db.rebuild_daily_stats()
+        rebuilt = service.db.conn.execute("SELECT * FROM daily_stats ORDER BY day").fetchall()
+        assert len(incremental) == len(rebuilt), "número de linhas do índice diverge da reconstrução"
+        for a, b in zip(incremental, rebuilt):
+            assert a[0] == b[0] and all(abs(x - y) < 1e-6 * max(1.0, abs(y)) for x, y in zip(a[1:], b[1:])), (a, b)
+
+        print(f"{args.windows} janelas conferidas contra a agregação ingênua: OK")
+        print(f"save_daily_data + índice: {1000 * edit_time / args.edits:.2f} ms/edição")
+        print(f"agregação ingênua:        {1000 * naive_time / args.windows:.3f} ms/janela")
+        print(f"índice de prefixos:       {1000 * index_time / args.windows:.3f} ms/janela")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_streaming_days.py
+#
+# Leitura de um período em streaming, dia a dia (Database.iter_day_groups e
+# CarbTrackerService.iter_report_days): confere a junção de refeições e
+# glargina contra as duas listas completas, incluindo dias só com refeições e
+# dias só com glargina, e compara o pico de memória de percorrer o período
+# com o de materializá-lo (fetch_range + dicionário de glargina, como o PDF
+# fazia, e a lista de DayRecord).
+#
+#   python benchmarks/bench_streaming_days.py [--years 10] [--repeat 3]
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from day_ordinals import MAX_DAY, MIN_DAY
+from synthetic_data import populate
+
+
+def peak_mib(func) -> float:
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        service = CarbTrackerService(str(tmp / "bench.db"), str(tmp / "config.json"))
+        populate(service.db, args.years)
+        db = service.db
+        # Lacunas dos dois lados: dias sem glargina e dias só com glargina
+        all_days = [day for day, _ in db.iter_glargina_days(MIN_DAY, MAX_DAY)]
+        for day in rng.sample(all_days, len(all_days) // 10):
+            db.conn.execute("DELETE FROM glargina_days WHERE day = ?", (day,))
+        for day in rng.sample(all_days, len(all_days) // 10):
+            db.conn.execute(f"DELETE FROM {db._entry_table()} WHERE day = ?", (day,))
+        db.conn.commit()
+        first_iso, last_iso = service.get_data_date_bounds()
+
+        expected = {}
+        for day, *row in db.fetch_days(MIN_DAY, MAX_DAY):
+            expected.setdefault(day, [None, []])[1].append(tuple(row))
+        for day, dose in db.iter_glargina_days(MIN_DAY, MAX_DAY):
+            expected.setdefault(day, [None, []])[0] = dose
+        groups = list(db.iter_day_groups(MIN_DAY, MAX_DAY, batch_size=64))
+        assert [day for day, _, _ in groups] == sorted(expected)
+        assert all([dose, meals] == expected[day] for day, dose, meals in groups)
+        assert any(not meals for _, _, meals in groups) and any(dose is None for _, dose, _ in groups)
+        records = list(service.iter_report_days(first_iso, last_iso))
+        assert [(r.day, r.glargina, [(e.meal, *e.values()) for e in r.meals.values()]) for r in records] == \
+            [(day, dose, meals) for day, dose, meals in groups]
+
+        def materialized_rows():
+            snapshot = service.report_db()
+            rows = snapshot.fetch_range(first_iso, last_iso)
+            glargina_by_date = dict(snapshot.fetch_glargina_range(first_iso, last_iso))
+            return rows, glargina_by_date
+
+        def streamed_days():
+            n_meals = 0
+            for record in service.iter_report_days(first_iso, last_iso):
+                n_meals += len(record.meals)
+            return n_meals
+
+        service.report_db()
+        cases = {
+            "listas (fetch_range + dict)": materialized_rows,
+            "lista de DayRecord": lambda: list(service.iter_report_days(first_iso, last_iso)),
+            "streaming por dia": streamed_days,
+        }
+        print(f"{args.years} anos de dados; {len(groups)} dias, "
+              f"{sum(1 for _, _, meals in groups if not meals)} só com glargina, "
+              f"{sum(1 for _, dose, _ in groups if dose is None)} sem glargina")
+        print(f"{'leitura do período':<30}{'tempo (ms)':>12}{'pico (MiB)':>12}")
+        for label, func in cases.items():
+            print(f"{label:<30}{median_ms(func, args.repeat):>12.1f}{peak_mib(func):>12.2f}")
+        service.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# benchmarks/bench_sync.py
+#
+# Sincronização entre dois arquivos de banco (ex.: casa e clínica): parte de
+# uma cópia comum, edita os dois lados (com conflitos nas mesmas refeições e
+# remoções), troca os arquivos de alterações nos dois sentidos e confere que
+# os bancos convergem para o mesmo estado, com as regras de conflito
+# esperadas, e que reimportar não muda nada. Mede exportação e importação.
+#
+#   python benchmarks/bench_sync.py [--years 3] [--days 1000]
+
+import argparse
+import datetime as dt
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+from constants import FIELDS, FIXED_MEALS
+from day_ordinals import MAX_DAY, MIN_DAY, to_day
+from synthetic_data import START_DATE, populate
+
+NUMERIC_KEYS = [key for _, key in FIELDS if key != "observations"]
+
+
+def snapshot(service: CarbTrackerService) -> tuple:
+    db = service.db
+    return (
+        db.fetch_days(MIN_DAY, MAX_DAY),
+        list(db.iter_glargina_days(MIN_DAY, MAX_DAY)),
+        # As somas acumuladas dependem da ordem das gravações: compara arredondadas
+        [tuple(round(v, 6) for v in row) for row in db.conn.execute("SELECT * FROM daily_stats ORDER BY day")],
+    )
+
+
+def edit_days(service: CarbTrackerService, rng: random.Random, dates: list, tag: str):
+    """Edita cada dia: um campo numérico e a observação do almoço, às vezes a glargina, às vezes apaga o jantar."""
+    for date_iso in dates:
+        changed = {
+            rng.choice(FIXED_MEALS): {rng.choice(NUMERIC_KEYS): round(rng.uniform(0, 150), 1)},
+            "Almoço": {"observations": f"{tag} {date_iso}"},
+        }
+        if rng.random() < 0.2:
+            changed["Jantar"] = {key: None for _, key in FIELDS}
+        glargina = round(rng.uniform(10, 30), 1) if rng.random() < 0.3 else None
+        ok, msg = service.save_daily_changes(date_iso, glargina, changed)
+        assert ok, msg
+
+
+def exchange(path: Path, source: CarbTrackerService, target: CarbTrackerService, name: str) -> tuple[int, float, float]:
+    """Exporta de source e importa em target; retorna (linhas no arquivo, ms exportação, ms importação)."""
+    file_path = str(path / name)
+    t0 = time.perf_counter()
+    ok, msg = source.export_sync_changes(file_path)
+    export_ms = (time.perf_counter() - t0) * 1000
+    assert ok, msg
+    t0 = time.perf_counter()
+    ok, msg = target.import_sync_changes(file_path)
+    import_ms = (time.perf_counter() - t0) * 1000
+    assert ok, msg
+    with open(file_path, encoding="utf-8") as f:
+        n_rows = len(json.load(f)["rows"])
+    return n_rows, export_ms, import_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--days", type=int, default=1000, help="dias editados em cada lado")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        home = CarbTrackerService(str(path / "casa.db"), str(path / "casa.json"))
+        populate(home.db, args.years)
+        home.close_db()
+        home = CarbTrackerService(str(path / "casa.db"), str(path / "casa.json"))
+        # A clínica recebe uma cópia do banco da casa, como hoje, via restaurar backup
+        clinic = CarbTrackerService(str(path / "clinica.db"), str(path / "clinica.json"))
+        ok, msg = clinic.restore_backup(str(path / "casa.db"), str(path / "clinica.db"))
+        assert ok, msg
+        assert home.db.device_id != clinic.db.device_id
+
+        # Primeira troca: tudo sem versão ainda, os dois lados já iguais
+        results = {"inicial casa -> clínica": exchange(path, home, clinic, "inicial.json")}
+        assert snapshot(home) == snapshot(clinic)
+
+        n_days = 365 * args.years
+        all_dates = [(START_DATE + dt.timedelta(days=i)).isoformat() for i in range(n_days)]
+        home_dates = rng.sample(all_dates, min(args.days, n_days))
+        clinic_dates = rng.sample(all_dates, min(args.days, n_days))
+        edit_days(home, rng, home_dates, "casa")
+        edit_days(clinic, rng, clinic_dates, "clínica")
+
+        # Os dois exportam antes de receber o do outro: os dias editados nos dois lados conflitam
+        t0 = time.perf_counter()
+        ok, msg = home.export_sync_changes(str(path / "casa-alteracoes.json"))
+        home_export_ms = (time.perf_counter() - t0) * 1000
+        assert ok, msg
+        ok, msg = clinic.export_sync_changes(str(path / "clinica-alteracoes.json"))
+        assert ok, msg
+        t0 = time.perf_counter()
+        ok, msg = clinic.import_sync_changes(str(path / "casa-alteracoes.json"))
+        clinic_import_ms = (time.perf_counter() - t0) * 1000
+        assert ok, msg
+        ok, msg = home.import_sync_changes(str(path / "clinica-alteracoes.json"))
+        assert ok, msg
+        assert snapshot(home) == snapshot(clinic), "os bancos não convergiram"
+
+        # Regra de conflito: a observação do almoço vem de quem tem a maior (versão, dispositivo)
+        for date_iso in set(home_dates) & set(clinic_dates):
+            row = home.db.conn.execute(
+                "SELECT version, device FROM sync_rows WHERE tbl = 'entries' AND day = ? AND meal = 'Almoço'",
+                (to_day(date_iso),),
+            ).fetchone()
+            winner = "casa" if row[1] == home.db.device_id else "clínica"
+            assert home.db.fetch_entry(to_day(date_iso), "Almoço")[-1] == f"{winner} {date_iso}", date_iso
+
+        # Reimportar o mesmo arquivo não muda nada
+        before = snapshot(clinic)
+        ok, msg = clinic.import_sync_changes(str(path / "casa-alteracoes.json"))
+        assert ok and msg.startswith("0 registros"), msg
+        assert snapshot(clinic) == before
+
+        # Trocas seguintes: só o que o outro lado ainda não confirmou; depois das confirmações, nada
+        results["retorno casa -> clínica"] = exchange(path, home, clinic, "r1.json")
+        results["retorno clínica -> casa"] = exchange(path, clinic, home, "r2.json")
+        results["sem alterações"] = exchange(path, home, clinic, "r3.json")
+        assert results["sem alterações"][0] == 0
+        assert snapshot(home) == snapshot(clinic)
+
+        with open(path / "casa-alteracoes.json", encoding="utf-8") as f:
+            n_home_rows = len(json.load(f)["rows"])
+        print(f"{args.years} anos de dados; {args.days} dias editados em cada lado, "
+              f"{len(set(home_dates) & set(clinic_dates))} em conflito")
+        print(f"alterações da casa: {n_home_rows} linhas; exportação {home_export_ms:.0f} ms, "
+              f"importação na clínica {clinic_import_ms:.0f} ms ({n_home_rows / clinic_import_ms * 1000:.0f} linhas/s)")
+        print(f"{'troca':<26}{'linhas':>8}{'exportar (ms)':>15}{'importar (ms)':>15}")
+        for label, (n_rows, export_ms, import_ms) in results.items():
+            print(f"{label:<26}{n_rows:>8}{export_ms:>15.1f}{import_ms:>15.1f}")
+        home.close_db()
+        clinic.close_db()
+
+
+if __name__ == "__main__":
+    main()
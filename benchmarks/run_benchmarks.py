@@ -0,0 +1,177 @@
+# benchmarks/run_benchmarks.py
+#
+# Suíte de benchmarks dos caminhos quentes do serviço, sem interface gráfica.
+# Cada caso roda sobre um banco sintético determinístico (synthetic_data) em
+# um diretório temporário; o resultado sai em JSON e pode ser comparado com
+# uma linha de base gravada para apontar regressões.
+#
+#   python benchmarks/run_benchmarks.py [--years 5] [--repeat 5] [--output resultado.json]
+#   python benchmarks/run_benchmarks.py --save-baseline          # grava benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+#
+# Com --baseline, o código de saída é 1 se algum caso ficar mais lento que
+# baseline × (1 + threshold) na mediana.
+
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from carb_tracker_service import CarbTrackerService
+from synthetic_data import START_DATE, generate_day, populate
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+
+def _time_case(func, repeat: int, setup=None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        t0 = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "repeat": repeat,
+    }
+
+
+def run_suite(years: int, repeat: int, seed: int = 42) -> dict:
+    rng = random.Random(seed + 1)
+    n_days = 365 * years
+    last_day = START_DATE + dt.timedelta(days=n_days - 1)
+
+    def random_day() -> str:
+        return (START_DATE + dt.timedelta(days=rng.randrange(n_days))).isoformat()
+
+    def days_back(days: int) -> str:
+        return max(START_DATE, last_day - dt.timedelta(days=days - 1)).isoformat()
+
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        db_path = str(tmp / "bench.db")
+        service = CarbTrackerService(db_path, str(tmp / "config.json"))
+        t0 = time.perf_counter()
+        n_rows = populate(service.db, years, seed)
+        populate_ms = (time.perf_counter() - t0) * 1000
+
+        # Aquecimento: imports tardios (numpy, reportlab) não entram nas medições
+        service.calculate_period_totals(days_back(7), last_day.isoformat())
+        from pdf_report_generator import PdfReportGenerator
+
+        cases["save_daily_data"] = _time_case(
+            service.save_daily_data, repeat,
+            setup=lambda: (random_day(), *generate_day(rng)),
+        )
+        cases["get_daily_data"] = _time_case(service.get_daily_data, repeat, setup=lambda: (random_day(),))
+
+        end_iso = last_day.isoformat()
+        for label, days in (("30d", 30), ("365d", 365), ("all", n_days)):
+            cases[f"calculate_period_totals[{label}]"] = _time_case(
+                service.calculate_period_totals, repeat, setup=lambda d=days: (days_back(d), end_iso))
+        cases["get_daily_aggregated_data[365d]"] = _time_case(
+            service.get_daily_aggregated_data, repeat, setup=lambda: (days_back(365), end_iso))
+
+        def report(start_iso: str, pdf_path: str):
+            days = service.iter_report_days(start_iso, end_iso)
+            start_br = dt.date.fromisoformat(start_iso).strftime("%d/%m/%Y")
+            PdfReportGenerator.generate_report(pdf_path, start_br, last_day.strftime("%d/%m/%Y"),
+                                               days,
+                                               analytics=service.get_range_analytics(start_iso, end_iso),
+                                               glycemic_metrics=service.get_glycemic_metrics(start_iso, end_iso))
+
+        cases["pdf_report[90d]"] = _time_case(report, repeat, setup=lambda: (days_back(90), str(tmp / "report.pdf")))
+
+        backup_path = str(tmp / "backup.db")
+
+        def backup_round_trip():
+            ok, msg = service.create_backup(db_path, backup_path)
+            assert ok, msg
+            ok, msg = service.restore_backup(backup_path, db_path)
+            assert ok, msg
+
+        cases["create_backup+restore_backup"] = _time_case(backup_round_trip, repeat)
+        service.close_db()
+
+    return {
+        "meta": {
+            "years": years,
+            "rows": n_rows,
+            "repeat": repeat,
+            "seed": seed,
+            "populate_ms": populate_ms,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        },
+        "cases": cases,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Compara as medianas com a linha de base; devolve uma linha por caso presente nas duas."""
+    comparison = []
+    for name, case in result["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        ratio = case["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        comparison.append({
+            "case": name,
+            "baseline_ms": base["median_ms"],
+            "current_ms": case["median_ms"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="Linha de base (JSON) para comparação")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Aumento relativo da mediana tolerado antes de acusar regressão")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Grava o resultado em {DEFAULT_BASELINE.name}")
+    args = parser.parse_args()
+
+    result = run_suite(args.years, args.repeat, args.seed)
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("years") != args.years:
+            print(f"Aviso: linha de base gerada com --years {baseline.get('meta', {}).get('years')}", file=sys.stderr)
+        result["comparison"] = compare(result, baseline, args.threshold)
+        regressions = [c for c in result["comparison"] if c["regression"]]
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+    for c in regressions:
+        print(f"REGRESSÃO: {c['case']} {c['baseline_ms']:.2f} ms -> {c['current_ms']:.2f} ms ({c['ratio']:.2f}x)",
+              file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
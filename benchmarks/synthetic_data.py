@@ -0,0 +1,92 @@
+# benchmarks/synthetic_data.py
+#
+# Gerador determinístico de dados sintéticos para os benchmarks: N anos de
+# registros diários com as refeições fixas de MEALS, lanches extras dinâmicos
+# ("Lanche Extra 1", "Lanche Extra 2", ...) e distribuições plausíveis de
+# carboidratos, glicemia e insulina. A mesma semente gera sempre o mesmo banco.
+
+import datetime as dt
+import random
+
+from constants import DYNAMIC_MEAL_PREFIX, FIELDS, FIXED_MEALS
+from day_ordinals import to_day
+
+START_DATE = dt.date(2015, 1, 1)
+CARB_RATIO = 12.0
+FSI = 45.0
+GLICEMIA_ALVO = 100.0
+
+# (probabilidade de registrar a refeição, média e desvio dos carboidratos em g)
+MEAL_PROFILES = {
+    "Jejum": (0.95, 0.0, 0.0),
+    "Café da manhã": (0.90, 45.0, 12.0),
+    "Colação": (0.50, 20.0, 8.0),
+    "Almoço": (0.95, 70.0, 18.0),
+    "Café da tarde": (0.70, 30.0, 10.0),
+    "Jantar": (0.90, 60.0, 15.0),
+}
+EXTRA_SNACK_CARBS = (15.0, 8.0)
+# Probabilidade de 0, 1, 2 ou 3 lanches extras no dia
+EXTRA_SNACK_WEIGHTS = (0.55, 0.30, 0.10, 0.05)
+OBSERVATIONS = ("caminhada 30 min", "hipoglicemia leve", "refeição fora de casa", "esqueci de medir antes")
+
+
+def _meal_values(rng: random.Random, carbs_mean: float, carbs_std: float) -> dict:
+    carbs = max(0.0, round(rng.gauss(carbs_mean, carbs_std), 1)) if carbs_mean else None
+    # Glicemia com cauda à direita (lognormal centrada perto de 130 mg/dL)
+    glicemia = round(min(450.0, max(40.0, rng.lognormvariate(4.87, 0.3))), 0) if rng.random() < 0.85 else None
+    lispro = round(carbs / CARB_RATIO * rng.uniform(0.85, 1.15), 1) if carbs else None
+    bolus = None
+    if glicemia is not None and glicemia > 180:
+        bolus = round((glicemia - GLICEMIA_ALVO) / FSI, 1)
+    observations = rng.choice(OBSERVATIONS) if rng.random() < 0.05 else None
+    values = {"carbs": carbs, "glicemia": glicemia, "lispro": lispro, "bolus": bolus, "observations": observations}
+    return {key: values[key] for _, key in FIELDS}
+
+
+def generate_day(rng: random.Random, extra_snacks: int | None = None) -> tuple[float, dict]:
+    """
+    Retorna (dose de glargina, meal_entries_data) no formato de CarbTrackerService.save_daily_data.
+    extra_snacks fixa o número de lanches extras (por padrão, sorteado).
+    """
+    meals = {}
+    for meal in FIXED_MEALS:
+        probability, carbs_mean, carbs_std = MEAL_PROFILES.get(meal, (0.5, 30.0, 10.0))
+        if rng.random() < probability:
+            meals[meal] = _meal_values(rng, carbs_mean, carbs_std)
+    n_extras = extra_snacks
+    if n_extras is None:
+        n_extras = rng.choices(range(len(EXTRA_SNACK_WEIGHTS)), weights=EXTRA_SNACK_WEIGHTS)[0]
+    for i in range(1, n_extras + 1):
+        meals[f"{DYNAMIC_MEAL_PREFIX} {i}"] = _meal_values(rng, *EXTRA_SNACK_CARBS)
+    glargina = round(rng.gauss(20.0, 2.0), 1)
+    return glargina, meals
+
+
+def generate_days(years: int, seed: int = 42, start: dt.date = START_DATE):
+    """Gera (date_iso, glargina, meal_entries_data) para cada dia de `years` anos a partir de start."""
+    rng = random.Random(seed)
+    for offset in range(365 * years):
+        glargina, meals = generate_day(rng)
+        yield (start + dt.timedelta(days=offset)).isoformat(), glargina, meals
+
+
+def populate(db, years: int, seed: int = 42) -> int:
+    """
+    Insere os dados sintéticos diretamente nas tabelas (sem passar pelo
+    serviço) e reconstrói o índice diário. Retorna o número de linhas de entries.
+    """
+    entries = []
+    glargina = []
+    for date_iso, dose, meals in generate_days(years, seed):
+        glargina.append((to_day(date_iso), dose))
+        for meal, values in meals.items():
+            entries.append((date_iso, meal, *(values[key] for _, key in FIELDS)))
+    db.conn.executemany(
+        f"INSERT INTO entries (date, meal, {', '.join(key for _, key in FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        entries,
+    )
+    db.conn.executemany("INSERT INTO glargina_days (day, dose) VALUES (?, ?)", glargina)
+    db.conn.commit()
+    db.rebuild_daily_stats()
+    return len(entries)
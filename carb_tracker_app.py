@@ -7,13 +7,9 @@ import datetime as dt
 import os
 
 from daily_entry_tab_ui import DailyEntryTabUI
-from reports_tab_ui import ReportsTabUI
-from backup_tab_ui import BackupTabUI
-from settings_tab_ui import SettingsTabUI
-from insulin_calculator_tab_ui import InsulinCalculatorTabUI
-from fsi_calculator_tab_ui import FSICalculatorTabUI
 
 from carb_tracker_service import CarbTrackerService
+import instrumentation
 from constants import DB_FILE, APP_VERSION, LAST_UPDATED_DATE, CONFIG_FILE
 
 class CarbTrackerApp(tk.Tk):
@@ -28,18 +24,24 @@ class CarbTrackerApp(tk.Tk):
         # Temas disponíveis
         self.available_themes = ["clam", "alt", "default", "vista", "xpnative"] # Adicione ou remova temas conforme o ttk suporta
 
-        self._configure_styles()
+        self.style = ttk.Style(self)
+        # Carregar o tema salvo ou o padrão ao iniciar; apply_theme também configura
+        # os estilos customizados, então eles são montados uma única vez aqui.
+        self.load_theme_from_config()
         self._set_fonts()
+        # O tema passa a seguir a configuração: quem alterar "app_theme" no serviço troca o tema da janela
+        self.service.subscribe_config(lambda changes: self.apply_theme(changes["app_theme"]), keys=("app_theme",))
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both")
 
         self._create_tabs()
-
-        # Carregar o tema salvo ou o padrão ao iniciar
-        self.load_theme_from_config()
+        # Painel de diagnóstico oculto (aba Configurações): Ctrl+Shift+D alterna a exibição
+        self.bind("<Control-Shift-D>", self._toggle_diagnostics_panel)
 
         self.after(100, lambda: self.daily_entry_tab_instance.load_day_data(dt.date.today().isoformat()))
+        if self.service.config_store.load_error:
+            self.after(200, lambda: messagebox.showwarning("Configurações", self.service.config_store.load_error))
 
     def _configure_styles(self):
         self.colors = {
@@ -63,11 +65,10 @@ class CarbTrackerApp(tk.Tk):
             "exit_button_fg": "#FFFFFF",
             "result_bg": "#BBDEFB",
             "report_header_bg": "#E0F2F7",
+            "dirty_field_bg": "#FFF8E1",
         }
 
-        style = ttk.Style(self)
-        self.style = style
-        # self.style.theme_use("clam") # Removido para permitir o carregamento do tema via configuração
+        style = self.style
 
         style.configure(".", font=("Helvetica", 10), background=self.colors["bg"], foreground=self.colors["text_dark"])
         style.configure("TFrame", background=self.colors["bg"])
@@ -129,6 +130,7 @@ class CarbTrackerApp(tk.Tk):
 
         style.configure("MealFieldHeader.TLabel", background=self.colors["panel_bg"], foreground=self.colors["text_dark"], font=("Helvetica", 9, "bold"))
         style.configure("MealField.TEntry", fieldbackground=self.colors["panel_bg"])
+        style.configure("DirtyField.TEntry", fieldbackground=self.colors["dirty_field_bg"])
 
         style.configure("ReportHeader.TLabel", background=self.colors["report_header_bg"], foreground=self.colors["text_dark"], font=("Helvetica", 12, "bold"))
         style.configure("ReportTotal.TLabel", background=self.colors["panel_bg"], foreground=self.colors["text_dark"], font=("Helvetica", 10, "bold"))
@@ -166,29 +168,79 @@ class CarbTrackerApp(tk.Tk):
         self.data_font = tkFont.Font(family="Helvetica", size=10)
 
     def _create_tabs(self):
-        # 1. Registro Diário
+        # 1. Registro Diário: visível ao abrir, construído imediatamente
         self.daily_entry_tab_instance = DailyEntryTabUI(self.notebook, self.service, self)
         self.notebook.add(self.daily_entry_tab_instance, text="Registro Diário")
 
-        # 2. Calc. Insulina
-        self.insulin_calculator_tab_instance = InsulinCalculatorTabUI(self.notebook, self)
-        self.notebook.add(self.insulin_calculator_tab_instance, text="Calc. Insulina")
+        # As demais abas entram como contêineres vazios e só são construídas
+        # (e têm seus módulos importados) na primeira vez em que são selecionadas.
+        self._lazy_tabs = {}
+        self._add_lazy_tab("Calc. Insulina", "insulin_calculator_tab_instance", self._build_insulin_calculator_tab)
+        self._add_lazy_tab("Calc. FSI", "fsi_calculator_tab_instance", self._build_fsi_calculator_tab)
+        self._add_lazy_tab("Histórico", "history_tab_instance", self._build_history_tab)
+        self._add_lazy_tab("Gráficos", "charts_tab_instance", self._build_charts_tab)
+        self._add_lazy_tab("Relatórios", "reports_tab_instance", self._build_reports_tab)
+        self._add_lazy_tab("Backup/Restauração", "backup_tab_instance", self._build_backup_tab)
+        self._settings_tab_container = self._add_lazy_tab("Configurações", "settings_tab_instance",
+                                                          self._build_settings_tab)
+
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _add_lazy_tab(self, text: str, attr_name: str, factory):
+        container = ttk.Frame(self.notebook, style="Panel.TFrame")
+        self.notebook.add(container, text=text)
+        setattr(self, attr_name, None)
+        self._lazy_tabs[str(container)] = (container, attr_name, factory)
+        return container
+
+    def _on_tab_changed(self, event=None):
+        entry = self._lazy_tabs.pop(self.notebook.select(), None)
+        if entry is None:
+            return
+        container, attr_name, factory = entry
+        tab = factory(container)
+        tab.pack(expand=True, fill="both")
+        setattr(self, attr_name, tab)
+
+    def _toggle_diagnostics_panel(self, event=None):
+        """
+        Alterna o painel de diagnóstico. Vindo de outra aba, abre Configurações
+        (construindo-a, se ainda não foi) com o painel visível.
+        """
+        if self.notebook.select() != str(self._settings_tab_container):
+            self.notebook.select(self._settings_tab_container)
+            self._on_tab_changed()
+            self.settings_tab_instance.toggle_diagnostics_panel(show=True)
+        else:
+            self.settings_tab_instance.toggle_diagnostics_panel()
+
+    def _build_insulin_calculator_tab(self, parent):
+        from insulin_calculator_tab_ui import InsulinCalculatorTabUI
+        return InsulinCalculatorTabUI(parent, self)
+
+    def _build_fsi_calculator_tab(self, parent):
+        from fsi_calculator_tab_ui import FSICalculatorTabUI
+        return FSICalculatorTabUI(parent, self)
 
-        # 3. Calc. FSI
-        self.fsi_calculator_tab_instance = FSICalculatorTabUI(self.notebook, self)
-        self.notebook.add(self.fsi_calculator_tab_instance, text="Calc. FSI")
+    def _build_history_tab(self, parent):
+        from history_tab_ui import HistoryTabUI
+        return HistoryTabUI(parent, self.service, self)
 
-        # 4. Relatórios
-        self.reports_tab_instance = ReportsTabUI(self.notebook, self.service, self)
-        self.notebook.add(self.reports_tab_instance, text="Relatórios")
+    def _build_charts_tab(self, parent):
+        from charts_tab_ui import ChartsTabUI
+        return ChartsTabUI(parent, self.service, self)
 
-        # 5. Backup/Restauração
-        self.backup_tab_instance = BackupTabUI(self.notebook, self.service, self)
-        self.notebook.add(self.backup_tab_instance, text="Backup/Restauração")
+    def _build_reports_tab(self, parent):
+        from reports_tab_ui import ReportsTabUI
+        return ReportsTabUI(parent, self.service, self)
 
-        # 6. Configurações
-        self.settings_tab_instance = SettingsTabUI(self.notebook, self.service, self)
-        self.notebook.add(self.settings_tab_instance, text="Configurações")
+    def _build_backup_tab(self, parent):
+        from backup_tab_ui import BackupTabUI
+        return BackupTabUI(parent, self.service, self)
+
+    def _build_settings_tab(self, parent):
+        from settings_tab_ui import SettingsTabUI
+        return SettingsTabUI(parent, self.service, self)
 
     def load_theme_from_config(self):
         """Carrega o tema salvo no arquivo de configuração e o aplica."""
@@ -197,6 +249,8 @@ class CarbTrackerApp(tk.Tk):
 
     def apply_theme(self, theme_name: str):
         """Aplica o tema ttk especificado."""
+        if theme_name == self.style.theme_use() and hasattr(self, "colors"):
+            return # Já ativo: nada a reconfigurar
         if theme_name in self.style.theme_names():
             self.style.theme_use(theme_name)
             # Reconfigurar estilos customizados após a mudança de tema, se necessário.
@@ -205,6 +259,7 @@ class CarbTrackerApp(tk.Tk):
         else:
             messagebox.showwarning("Tema Inválido", f"O tema '{theme_name}' não é suportado pelo ttk. Usando o tema padrão.")
             self.style.theme_use("clam") # Fallback para um tema conhecido
+            self._configure_styles()
 
     def confirm_save_all_modified_data_before_action(self) -> bool:
         """
@@ -247,5 +302,8 @@ class CarbTrackerApp(tk.Tk):
             self.destroy()
 
 if __name__ == "__main__":
+    # CARB_TRACKER_PROFILE=<arquivo.prof> grava um perfil cProfile da sessão inteira
+    instrumentation.start_session_profile()
     app = CarbTrackerApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    instrumentation.stop_session_profile()
\ No newline at end of file
@@ -1,49 +1,97 @@
 # carb_tracker_service.py
 
 import datetime as dt
+import getpass
 import shutil
-import json
 from pathlib import Path
 
+from typing import TYPE_CHECKING, Iterator
+
+from config_store import ConfigError, ConfigStore
 from database import Database
-from constants import MEALS, FIELDS, DB_FILE, FIELD_NAMES_MAP, CONFIG_FILE
+from day_ordinals import MAX_DAY, MIN_DAY, to_day, to_iso
+from domain_models import DailyAggregate, DayRecord, MealEntry
+from instrumentation import timed
+from report_cache import ReportCache
+from sync_engine import SyncError, build_changeset, read_changeset, write_changeset
+from glycemic_metrics import GlycemicMetricsEngine, DEFAULT_LOW_THRESHOLD, DEFAULT_HIGH_THRESHOLD
+from constants import MEALS, FIELDS, DB_FILE, FIELD_NAMES_MAP, CONFIG_FILE, CHANGE_LOG_RETENTION_DAYS
+
+# Os módulos que dependem de NumPy (analytics_engine, charts, data_exporter,
+# insulin_calculations, dosing_profiles) são importados nos métodos que os
+# usam, para não pesar na abertura da janela.
+if TYPE_CHECKING:
+    from analytics_engine import AnalyticsEngine
+    from charts import ChartData
 
 class CarbTrackerService:
     def __init__(self, db_path: str = DB_FILE, config_path: str = CONFIG_FILE):
         self.db = Database(db_path)
         self.db_path = db_path
         self.config_path = config_path
-        self.config = self._load_config()
-
-    def _load_config(self) -> dict:
-        if Path(self.config_path).exists():
-            try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                # Se o arquivo estiver corrompido, retorna a configuração padrão
-                return self._default_config()
-        return self._default_config()
-
-    def _default_config(self) -> dict:
-        return {
-            "report_date_format": "%d/%m/%Y",
-            "glicemia_alert_threshold": 180,
-            "db_location_override": None,
-            "app_theme": "clam" # NOVO: Tema padrão do aplicativo
-        }
+        self.config_store = ConfigStore(config_path)
+        # Lambda: self.db é recriado em create_backup/restore_backup
+        self.glycemic_metrics = GlycemicMetricsEngine(
+            lambda start_day, end_day: self.db.iter_days(start_day, end_day),
+            *self._glicemia_thresholds(),
+        )
+        self._dosing_profiles = None  # cache em memória de dosing_profiles
+        # Pilhas de desfazer/refazer por dia (ids de changesets), válidas durante a sessão
+        self._undo_stacks = {}
+        self._redo_stacks = {}
+        # Cópia em memória lida pelos relatórios e a versão dos dados de onde saiu
+        self._report_snapshot = None
+        self._report_snapshot_version = None
+        self._report_cache = ReportCache()
+        try:
+            self.author = getpass.getuser()
+        except Exception:
+            self.author = "desconhecido"
+        self.config_store.subscribe(
+            lambda changes: self.glycemic_metrics.set_thresholds(*self._glicemia_thresholds()),
+            keys=("glicemia_low_threshold", "glicemia_alert_threshold"),
+        )
 
-    def save_config(self, new_config: dict):
-        self.config.update(new_config)
+    def save_config(self, new_config: dict) -> tuple[bool, str]:
+        """Valida e grava imediatamente as configurações (botão Salvar)."""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4)
+            self.config_store.update(new_config, persist="now")
             return True, "Configurações salvas com sucesso."
-        except Exception as e:
+        except ConfigError as e:
+            return False, str(e)
+        except OSError as e:
+            return False, f"Erro ao salvar configurações: {e}"
+
+    def set_config(self, key: str, value) -> tuple[bool, str]:
+        """Altera uma configuração; a gravação no arquivo é agrupada com as alterações seguintes."""
+        try:
+            self.config_store.set(key, value)
+            return True, ""
+        except ConfigError as e:
+            return False, str(e)
+
+    def reset_config(self) -> tuple[bool, str]:
+        try:
+            self.config_store.reset()
+            return True, "Configurações redefinidas para os valores padrão."
+        except OSError as e:
             return False, f"Erro ao salvar configurações: {e}"
 
     def get_config(self, key: str, default=None):
-        return self.config.get(key, default)
+        return self.config_store.get(key, default)
+
+    def subscribe_config(self, callback, keys=None):
+        """Registra callback(changes) para alterações de configuração; retorna a função que cancela o registro."""
+        return self.config_store.subscribe(callback, keys)
+
+    def _glicemia_thresholds(self) -> tuple[float, float]:
+        """Limites (baixo, alto) de glicemia configurados, com os padrões quando ausentes."""
+        low = self.get_config("glicemia_low_threshold")
+        high = self.get_config("glicemia_alert_threshold")
+        return (
+            float(low) if low is not None else DEFAULT_LOW_THRESHOLD,
+            float(high) if high is not None else DEFAULT_HIGH_THRESHOLD,
+        )
 
     def validate_numeric_input(self, value_str: str, field_key: str, meal_name: str = "") -> tuple[bool, float | None, str]:
         if not value_str:
@@ -67,11 +115,19 @@ class CarbTrackerService:
             context = f"na {meal_name}" if meal_name else ""
             return False, None, f"Valor inválido para {field_title.split(' ')[0]} {context}. Por favor, insira um número válido."
 
+    @timed("service")
     def save_daily_data(self, date_iso: str, glargina_value: float, meal_entries_data: dict) -> tuple[bool, str]:
-        self.db.upsert_glargina_dose(date_iso, glargina_value)
+        day = to_day(date_iso)
+        self._record_day_write(day, "save", lambda: self._write_daily_data(day, glargina_value, meal_entries_data))
+        self.glycemic_metrics.on_day_saved(DayRecord.from_meal_data(day, glargina_value, meal_entries_data))
+
+        return True, f"Dados do dia {dt.date.fromisoformat(date_iso).strftime('%d/%m/%Y')} salvos com sucesso."
+
+    def _write_daily_data(self, day: int, glargina_value: float, meal_entries_data: dict):
+        self.db.upsert_glargina_dose(day, glargina_value)
 
         # Primeiro, obtenha as refeições que existem para esta data
-        existing_meals = {entry[1] for entry in self.db.fetch_range(date_iso, date_iso) if entry[0] == date_iso}
+        existing_meals = {entry[1] for entry in self.db.fetch_days(day, day)}
 
         # Iterar sobre todas as refeições que podem existir (fixas e dinâmicas salvas)
         # e as que estão sendo enviadas pelo UI.
@@ -81,6 +137,8 @@ class CarbTrackerService:
         all_potential_meals.update(meal_entries_data.keys()) # Refeições (fixas + dinâmicas) com dados no UI
         all_potential_meals.update(existing_meals) # Refeições existentes no DB para essa data
 
+        # Gravações e remoções vão em lote (executemany), uma chamada de cada
+        upserts, deletes = [], []
         for meal in all_potential_meals:
             if meal in meal_entries_data:
                 values = meal_entries_data[meal]
@@ -99,146 +157,544 @@ class CarbTrackerService:
                             break
 
                 if has_valid_data:
-                    full_values = {key: values.get(key) for _, key in FIELDS}
-                    self.db.upsert_entry(date_iso, meal, full_values)
+                    upserts.append((day, meal, *(values.get(key) for _, key in FIELDS)))
                 else:
                     # Se a refeição existe no DB mas não tem dados na UI, delete-a
-                    self.db.delete_entry(date_iso, meal)
+                    deletes.append((day, meal))
             else:
                 # Se a refeição existe no DB mas não está presente no meal_entries_data do UI,
                 # ou seja, foi removida (caso de lanche extra) ou seus campos foram limpos na UI,
                 # então a removemos do DB.
-                self.db.delete_entry(date_iso, meal)
+                deletes.append((day, meal))
+        self.db.upsert_entries(upserts)
+        self.db.delete_entries(deletes)
 
+    @timed("service")
+    def save_daily_changes(self, date_iso: str, glargina_value: float | None, changed_fields: dict,
+                           removed_meals=()) -> tuple[bool, str]:
+        """
+        Grava só o que mudou em um dia: glargina_value (None = inalterada),
+        changed_fields {refeição: {campo: valor}} com apenas os campos editados
+        e removed_meals, refeições (lanches extras) retiradas da UI.
+        """
+        day = to_day(date_iso)
+
+        def write():
+            if glargina_value is not None:
+                self.db.upsert_glargina_dose(day, glargina_value)
+            for meal in removed_meals:
+                self.db.delete_entry(day, meal)
+            for meal, values in changed_fields.items():
+                self.db.update_entry_fields(day, meal, values)
+
+        self._record_day_write(day, "save", write)
+        self.glycemic_metrics.on_day_saved(self.get_daily_data(date_iso))
 
         return True, f"Dados do dia {dt.date.fromisoformat(date_iso).strftime('%d/%m/%Y')} salvos com sucesso."
 
-    def get_daily_data(self, date_iso: str) -> tuple[float | None, dict]:
-        glargina_dose = self.db.fetch_glargina_dose(date_iso)
+    def _day_state(self, day: int) -> dict:
+        """Estado gravado do dia como {(refeição, campo): valor}; a glargina fica em (None, "glargina")."""
+        state = {(None, "glargina"): self.db.fetch_glargina_dose(day)}
+        for _day, meal, *values in self.db.fetch_days(day, day):
+            for (_, key), value in zip(FIELDS, values):
+                state[(meal, key)] = value
+        return state
+
+    def _record_day_write(self, day: int, kind: str, write, clear_redo: bool = True, local: bool = True) -> int | None:
+        """
+        Executa write() e registra no log de alterações, na mesma transação,
+        a diferença entre o estado do dia antes e depois. Retorna o id do
+        changeset (None se nada mudou). local=False para alterações recebidas
+        de outro banco: não ganham versão nova, não entram em desfazer/refazer
+        e o índice daily_stats fica para quem chama (reconstruído uma vez só).
+        """
+        with self.db.transaction():
+            before = self._day_state(day)
+            write()
+            if local:
+                self.db.refresh_daily_stats(day)
+            after = self._day_state(day)
+            changes = [
+                (meal, field, before.get((meal, field)), after.get((meal, field)))
+                for meal, field in sorted(before.keys() | after.keys(), key=lambda k: (k[0] or "", k[1]))
+                if before.get((meal, field)) != after.get((meal, field))
+            ]
+            changeset_id = self.db.append_changeset(
+                day, kind, self.author, dt.datetime.now().isoformat(timespec="seconds"), changes
+            )
+            if local:
+                changed_meals = {meal for meal, *_ in changes}
+                self.db.mark_rows_changed(day, [
+                    ("glargina", "", False) if meal is None
+                    else ("entries", meal, not any((meal, key) in after for _, key in FIELDS))
+                    for meal in sorted(changed_meals, key=lambda m: m or "")
+                ])
+        if changeset_id is not None and local:
+            self._undo_stacks.setdefault(day, []).append(changeset_id)
+            if clear_redo:
+                self._redo_stacks.pop(day, None)
+        elif changeset_id is not None:
+            # Os ids guardados deixam de descrever o estado do dia
+            self._undo_stacks.pop(day, None)
+            self._redo_stacks.pop(day, None)
+        return changeset_id
+
+    def _revert_changeset(self, day: int, changeset_id: int, kind: str) -> int | None:
+        """Grava de volta os valores antigos de um changeset; o resultado é um novo changeset do tipo kind."""
+        changes = self.db.fetch_changes(changeset_id)
+
+        def write():
+            meal_values = {}
+            for meal, field, old_value, _new_value in changes:
+                if meal is None:
+                    self.db.upsert_glargina_dose(day, old_value)
+                else:
+                    meal_values.setdefault(meal, {})[field] = old_value
+            for meal, values in meal_values.items():
+                self.db.update_entry_fields(day, meal, values)
+
+        return self._record_day_write(day, kind, write, clear_redo=False)
+
+    def _finish_undo_redo(self, date_iso: str):
+        self.glycemic_metrics.on_day_saved(self.get_daily_data(date_iso))
+
+    @timed("service")
+    def undo_day_changes(self, date_iso: str) -> tuple[bool, str]:
+        """Desfaz a última gravação do dia feita nesta sessão (salvamento ou refazer)."""
+        day = to_day(date_iso)
+        stack = self._undo_stacks.get(day)
+        if not stack:
+            return False, "Não há alterações deste dia para desfazer."
+        changeset_id = stack.pop()
+        undo_id = self._revert_changeset(day, changeset_id, "undo")
+        # O changeset de desfazer sai da pilha de desfazer e vai para a de refazer
+        if undo_id is not None:
+            self._undo_stacks[day].pop()
+            self._redo_stacks.setdefault(day, []).append(undo_id)
+        self._finish_undo_redo(date_iso)
+        return True, f"Última alteração do dia {dt.date.fromisoformat(date_iso).strftime('%d/%m/%Y')} desfeita."
+
+    @timed("service")
+    def redo_day_changes(self, date_iso: str) -> tuple[bool, str]:
+        """Refaz a última alteração desfeita do dia."""
+        day = to_day(date_iso)
+        stack = self._redo_stacks.get(day)
+        if not stack:
+            return False, "Não há alterações deste dia para refazer."
+        self._revert_changeset(day, stack.pop(), "redo")
+        self._finish_undo_redo(date_iso)
+        return True, f"Alteração do dia {dt.date.fromisoformat(date_iso).strftime('%d/%m/%Y')} refeita."
+
+    def get_undo_state(self, date_iso: str) -> tuple[bool, bool]:
+        """(há o que desfazer, há o que refazer) para o dia."""
+        day = to_day(date_iso)
+        return bool(self._undo_stacks.get(day)), bool(self._redo_stacks.get(day))
+
+    @timed("service")
+    def get_day_at(self, date_iso: str, changeset_id: int) -> DayRecord:
+        """
+        Reconstrói o dia como estava logo após o changeset indicado (0 = antes
+        de qualquer alteração registrada), no mesmo formato de get_daily_data:
+        parte do estado atual e desfaz, da mais recente para a mais antiga, as
+        alterações registradas depois dele.
+        """
+        day = to_day(date_iso)
+        state = self._day_state(day)
+        for meal, field, old_value in self.db.fetch_changes_after(day, changeset_id):
+            state[(meal, field)] = old_value
+
+        record = DayRecord(day, state[(None, "glargina")]).with_fixed_meals()
+        for (meal, field), value in state.items():
+            if meal is not None:
+                if meal not in record.meals:
+                    record.add(MealEntry(meal))
+                setattr(record.meals[meal], field, value)
+        # Refeições dinâmicas que não existiam no instante pedido ficam de fora
+        record.meals = {
+            meal: entry for meal, entry in record.meals.items()
+            if meal in MEALS or not entry.is_empty()
+        }
+        return record
+
+    def get_day_as_of(self, date_iso: str, timestamp_iso: str) -> DayRecord:
+        """Como get_day_at, para o instante timestamp_iso (data e hora ISO, precisão de segundos)."""
+        return self.get_day_at(date_iso, self.db.fetch_last_changeset_id(to_day(date_iso), timestamp_iso))
+
+    def get_day_changesets(self, date_iso: str, limit: int = 100) -> list[dict]:
+        """Histórico de gravações do dia, da mais recente para a mais antiga."""
+        return [
+            {"id": id_, "kind": kind, "author": author, "created_at": created_at, "changes": n_changes}
+            for id_, kind, author, created_at, n_changes in self.db.fetch_day_changesets(to_day(date_iso), limit)
+        ]
+
+    @timed("service")
+    def export_sync_changes(self, destination_path: str, peer: str | None = None) -> tuple[bool, str]:
+        """
+        Grava em destination_path as linhas alteradas que o outro banco (peer,
+        ou todos os conhecidos se None) ainda não confirmou ter recebido.
+        """
+        try:
+            self.db.ensure_row_versions()
+            peers = self.db.fetch_sync_peers()
+            if peer is not None:
+                since = peers.get(peer, (0, 0, None))[0]
+            else:
+                since = min((acked for acked, _, _ in peers.values()), default=0)
+            rows = self.db.fetch_sync_changes(since)
+            acks = {device: received for device, (_, received, _) in peers.items()}
+            changeset = build_changeset(self.db.device_id, self.db.fetch_sync_seq(), since, acks, rows)
+            write_changeset(destination_path, changeset)
+        except Exception as e:
+            return False, f"Erro ao exportar as alterações: {e}"
+        return True, f"{len(rows)} registros alterados exportados para: {destination_path}"
 
-        meal_data = {}
+    @timed("service")
+    def import_sync_changes(self, source_path: str) -> tuple[bool, str]:
+        """
+        Mescla um arquivo de alterações de outro banco: em cada linha, vence a
+        maior (versão, dispositivo), então os dois bancos chegam ao mesmo
+        estado qualquer que seja a ordem das trocas. Tudo em uma transação.
+        """
+        try:
+            changeset = read_changeset(source_path)
+        except SyncError as e:
+            return False, str(e)
+        sender = changeset["device"]
+        if sender == self.db.device_id:
+            return False, ("O arquivo foi gerado por este mesmo banco de dados (ou por uma cópia dele). "
+                           "Restaure o backup na outra cópia para que ela ganhe uma identidade própria.")
+        try:
+            with self.db.transaction():
+                self.db.ensure_row_versions()
+                winners = self.db.select_sync_winners(changeset["rows"])
+                by_day = {}
+                for row in winners:
+                    by_day.setdefault(row[1], []).append(row)
+                for day, rows in by_day.items():
+                    self._record_day_write(day, "sync", lambda rows=rows, day=day: self._apply_sync_rows(day, rows),
+                                           local=False)
+                self.db.record_sync_rows(winners)
+                if winners:
+                    # Uma reconstrução sai mais barata que propagar os acumulados dia a dia
+                    self.db.rebuild_daily_stats()
+
+                peers = self.db.fetch_sync_peers()
+                received = peers.get(sender, (0, 0, None))[1]
+                self.db.update_sync_peer(
+                    sender,
+                    acked_seq=changeset["acks"].get(self.db.device_id),
+                    # Com lacuna (arquivo anterior não importado), a confirmação não avança e o outro lado reenvia
+                    received_seq=changeset["seq"] if changeset["since"] <= received else None,
+                    last_sync=dt.datetime.now().isoformat(timespec="seconds"),
+                )
+        except Exception as e:
+            return False, f"Erro ao importar as alterações: {e}"
+        if winners:
+            self.glycemic_metrics.invalidate()
+        ignored = len(changeset["rows"]) - len(winners)
+        return True, (f"{len(winners)} registros atualizados em {len(by_day)} dias; "
+                      f"{ignored} já estavam atualizados ou foram superados por edições mais recentes.")
+
+    def _apply_sync_rows(self, day: int, rows: list):
+        upserts, deletes = [], []
+        for tbl, _day, meal, _version, _device, deleted, *values in rows:
+            if tbl == "glargina":
+                self.db.upsert_glargina_dose(day, None if deleted else values[-1])
+            elif deleted:
+                deletes.append((day, meal))
+            else:
+                upserts.append((day, meal, *values[:len(FIELDS)]))
+        self.db.upsert_entries(upserts)
+        self.db.delete_entries(deletes)
+
+    @timed("service")
+    def compact_change_log(self, retention_days: int = CHANGE_LOG_RETENTION_DAYS) -> tuple[int, int]:
+        """Compacta os changesets com mais de retention_days dias (ver Database.compact_change_log)."""
+        before = (dt.datetime.now() - dt.timedelta(days=retention_days)).isoformat(timespec="seconds")
+        return self.db.compact_change_log(before)
+
+    @timed("service")
+    def get_daily_data(self, date_iso: str) -> DayRecord:
+        day = to_day(date_iso)
+        record = DayRecord(day, self.db.fetch_glargina_dose(day))
         # Primeiro, carregue todas as entradas existentes para o dia
-        existing_entries_for_day = self.db.fetch_range(date_iso, date_iso)
-        for date, meal, carbs, glicemia, lispro, bolus, observations in existing_entries_for_day:
-            if date == date_iso: # Garante que é para o dia correto, fetch_range pode trazer outros dias
-                meal_data[meal] = {
-                    "carbs": carbs,
-                    "glicemia": glicemia,
-                    "lispro": lispro,
-                    "bolus": bolus,
-                    "observations": observations
-                }
+        for _day, *row in self.db.fetch_days(day, day):
+            record.add(MealEntry(*row))
 
         # Garanta que todas as refeições FIXAS estejam presentes, mesmo que sem dados.
         # Isso é importante para a UI exibir os campos corretamente.
-        for meal in MEALS: # MEALS inclui FIXED_MEALS e "Lanche Extra"
-            if meal not in meal_data:
-                meal_data[meal] = {key: None for _, key in FIELDS}
-                meal_data[meal]["observations"] = None # Garante que observations também é None
+        return record.with_fixed_meals()
 
-        return glargina_dose, meal_data
 
+    @timed("service")
+    def count_history_rows(self, filters: dict | None = None) -> int:
+        return self.db.count_history_rows(filters)
 
+    @timed("service")
+    def get_history_page(self, filters: dict | None = None, sort_column: str = "date", descending: bool = False,
+                         after_row=None, before_row=None, offset: int = 0, limit: int = 200) -> list:
+        """
+        Página do histórico de entries (ver Database.fetch_history_page), logo
+        depois de after_row ou logo antes de before_row (linhas de uma página
+        anterior). Filtros e ordenação são feitos no SQL.
+        """
+        after = Database.history_sort_key(after_row, sort_column) if after_row is not None else None
+        before = Database.history_sort_key(before_row, sort_column) if before_row is not None else None
+        return self.db.fetch_history_page(filters, sort_column, descending, after, before, offset, limit)
+
+    @timed("service")
+    def search_observations(self, text: str, limit: int = 200) -> list[dict]:
+        """
+        Busca textual nas observações. Retorna dicts com date (ISO), meal e
+        snippet (trecho com os termos encontrados entre colchetes), dos dias mais recentes primeiro.
+        """
+        return [
+            {"date": date, "meal": meal, "snippet": snippet}
+            for date, meal, snippet in self.db.search_observations(text, limit)
+        ]
+
+    @property
+    def data_version(self) -> tuple[int, int]:
+        """Versão dos dados (Database.data_version): muda a cada gravação e a cada restauração de backup."""
+        return self.db.data_version
+
+    @timed("service")
+    def report_db(self) -> Database:
+        """
+        Banco usado pelas leituras dos relatórios: uma cópia em memória
+        consistente (Database.snapshot_of), refeita só quando houve gravação
+        desde a anterior. Relatórios não disputam a conexão do registro diário
+        e todas as leituras de um relatório veem o mesmo instante.
+        """
+        version = self.data_version
+        if self._report_snapshot is None or self._report_snapshot_version != version:
+            self.close_report_snapshot()
+            self._report_snapshot = Database.snapshot_of(self.db)
+            self._report_snapshot_version = version
+        return self._report_snapshot
+
+    def close_report_snapshot(self):
+        # Quem ainda guarda a cópia anterior (ex.: uma thread de PDF) continua com ela até soltá-la
+        self._report_snapshot = None
+        self._report_snapshot_version = None
+
+    @timed("service")
+    def get_range_analytics(self, start_iso: str, end_iso: str) -> "AnalyticsEngine":
+        """
+        Carrega o período no motor colunar (arrays NumPy) para estatísticas
+        vetorizadas. Motores ficam no cache de relatórios até a próxima
+        gravação; um período dentro de outro já carregado é recortado dele.
+        """
+        from analytics_engine import AnalyticsEngine
+        start_day, end_day = to_day(start_iso), to_day(end_iso)
+        return self._report_cache.analytics(
+            self.data_version, start_day, end_day,
+            lambda: AnalyticsEngine.from_database(self.report_db(), start_day, end_day),
+        )
+
+    @timed("service")
     def calculate_period_totals(self, start_iso: str, end_iso: str) -> dict:
-        rows = self.db.fetch_range(start_iso, end_iso)
-        glargina_rows = self.db.fetch_glargina_range(start_iso, end_iso)
-
-        totals = {
-            "carbs": 0.0,
-            "glicemia_sum": 0.0,
-            "glicemia_count": 0,
-            "lispro": 0.0,
-            "bolus": 0.0,
-            "glargina_sum": 0.0,
-            "glargina_count": 0
-        }
+        """Totais do período (AnalyticsEngine.period_totals), guardados no cache de relatórios; não altere o resultado."""
+        return self._report_cache.cached(
+            ("totals", to_day(start_iso), to_day(end_iso)), self.data_version,
+            lambda: self.get_range_analytics(start_iso, end_iso).period_totals(),
+        )
 
-        for (_, _, carbs, glicemia, lispro, bolus, _) in rows:
-            totals["carbs"] += carbs or 0
-            if glicemia is not None:
-                totals["glicemia_sum"] += glicemia
-                totals["glicemia_count"] += 1
-            totals["lispro"] += lispro or 0
-            totals["bolus"] += bolus or 0
-
-        for (_, dose) in glargina_rows:
-            if dose is not None and dose > 0:
-                totals["glargina_sum"] += dose
-                totals["glargina_count"] += 1
-
-        avg_glicemia = (
-            totals["glicemia_sum"] / totals["glicemia_count"]
-            if totals["glicemia_count"] > 0
-            else 0.0
+    @timed("service")
+    def get_window_totals(self, start_iso: str, end_iso: str) -> dict:
+        """
+        Totais e médias do período lidos do índice de somas de prefixo
+        (daily_stats), sem percorrer as refeições. Mesmas chaves básicas de
+        calculate_period_totals. Lê direto do banco: são duas buscas pela
+        chave primária, mais baratas que refazer a cópia de report_db().
+        """
+        return self._window_averages(self.db.fetch_window_stats(to_day(start_iso), to_day(end_iso)))
+
+    @staticmethod
+    def _window_averages(totals: dict) -> dict:
+        totals["glicemia_count"] = int(round(totals["glicemia_count"]))
+        totals["glargina_count"] = int(round(totals["glargina_count"]))
+        totals["avg_glicemia"] = (
+            totals["glicemia_sum"] / totals["glicemia_count"] if totals["glicemia_count"] > 0 else 0.0
         )
-        avg_glargina = (
-            totals["glargina_sum"] / totals["glargina_count"]
-            if totals["glargina_count"] > 0
-            else 0.0
+        totals["avg_glargina"] = (
+            totals["glargina_sum"] / totals["glargina_count"] if totals["glargina_count"] > 0 else 0.0
         )
+        return totals
 
-        totals["avg_glicemia"] = avg_glicemia
-        totals["avg_glargina"] = avg_glargina
+    def get_trailing_window_totals(self, days: int, end_iso: str | None = None) -> tuple[str, str, dict]:
+        """Totais dos últimos `days` dias terminando em end_iso (hoje por padrão)."""
+        end_day = to_day(end_iso) if end_iso else dt.date.today().toordinal()
+        start_day = end_day - days + 1
+        totals = self.db.fetch_window_stats(start_day, end_day)
+        return to_iso(start_day), to_iso(end_day), self._window_averages(totals)
 
-        return totals
+    @timed("service")
+    def get_glycemic_metrics(self, start_iso: str, end_iso: str) -> dict:
+        """
+        Variabilidade glicêmica e tempo no alvo do período (média, DP, CV,
+        % abaixo/no/acima do alvo, HbA1c estimada, GMI e quebra por refeição).
+        """
+        return self.glycemic_metrics.get_metrics(to_day(start_iso), to_day(end_iso))
+
+    @timed("service")
+    def get_dose_discrepancies(self, carb_ratio, fsi, glicemia_alvo: float,
+                               start_iso: str = "0001-01-01", end_iso: str = "9999-12-31",
+                               tolerance: float = 1.0) -> dict:
+        """
+        Recalcula a dose sugerida para todas as refeições do período (todo o
+        histórico por padrão) e compara com lispro + bolus registrados.
+        """
+        from insulin_calculations import compare_logged_doses
+        return compare_logged_doses(self.db.iter_range(start_iso, end_iso), carb_ratio, fsi, glicemia_alvo, tolerance)
+
+    def get_dosing_profiles(self) -> dict:
+        """Perfis de dose por refeição, lidos do banco uma vez e mantidos em cache."""
+        if self._dosing_profiles is None:
+            self._dosing_profiles = {
+                meal: {
+                    "carb_ratio": carb_ratio,
+                    "fsi": fsi,
+                    "glicemia_alvo": glicemia_alvo,
+                    "source": source,
+                    "samples": samples,
+                    "updated_at": updated_at,
+                }
+                for meal, carb_ratio, fsi, glicemia_alvo, source, samples, updated_at in self.db.fetch_dosing_profiles()
+            }
+        return self._dosing_profiles
 
-    def get_report_data_for_pdf(self, start_iso: str, end_iso: str) -> tuple[list, dict]:
-        rows = self.db.fetch_range(start_iso, end_iso)
-        glargina_rows = self.db.fetch_glargina_range(start_iso, end_iso)
-        glargina_by_date = {date: dose for date, dose in glargina_rows}
-        return rows, glargina_by_date
+    def get_dosing_profile(self, meal: str | None = None) -> tuple[str, dict | None]:
+        """Perfil da refeição informada ou, sem refeição, da refeição correspondente à hora atual."""
+        if meal is None:
+            from dosing_profiles import meal_for_hour
+            meal = meal_for_hour(dt.datetime.now().hour)
+        return meal, self.get_dosing_profiles().get(meal)
 
-    def get_daily_aggregated_data(self, start_iso: str, end_iso: str) -> dict:
+    def save_dosing_profile(self, meal: str, carb_ratio: float, fsi: float, glicemia_alvo: float | None = None) -> tuple[bool, str]:
+        try:
+            self.db.upsert_dosing_profile(meal, {"carb_ratio": carb_ratio, "fsi": fsi, "glicemia_alvo": glicemia_alvo})
+        except Exception as e:
+            return False, f"Erro ao salvar perfil de dose: {e}"
+        self._dosing_profiles = None
+        return True, f"Perfil de dose de '{meal}' salvo com sucesso."
+
+    @timed("service")
+    def fit_dosing_profiles_from_history(self, min_samples: int = 10) -> dict:
         """
-        Retorna dados agregados por dia para o período especificado,
-        incluindo totais diários de carboidratos, média de glicemia e dose de glargina.
+        Ajusta relação carboidrato/insulina e FSI por refeição sobre todo o
+        histórico e persiste os resultados (source='fitted'). Perfis manuais
+        não são sobrescritos.
         """
-        raw_entries = self.db.fetch_range(start_iso, end_iso)
-        glargina_doses = self.db.fetch_glargina_range(start_iso, end_iso)
+        from dosing_profiles import fit_dosing_profiles
+        glicemia_alvo = float(self.get_config("glicemia_alvo", 100) or 100)
+        fitted = fit_dosing_profiles(self.db.iter_days(MIN_DAY, MAX_DAY), glicemia_alvo, min_samples)
+        current = self.get_dosing_profiles()
+        for meal, profile in fitted.items():
+            if current.get(meal, {}).get("source") == "manual":
+                continue
+            self.db.upsert_dosing_profile(meal, {
+                "carb_ratio": profile["carb_ratio"],
+                "fsi": profile["fsi"],
+                "glicemia_alvo": profile["glicemia_alvo"],
+                "source": "fitted",
+                "samples": profile["samples"],
+            })
+        self._dosing_profiles = None
+        return fitted
+
+    def iter_report_days(self, start_iso: str, end_iso: str) -> Iterator[DayRecord]:
+        """
+        Dias do período com alguma refeição ou dose de glargina, em ordem, um
+        DayRecord por vez (Database.iter_day_groups sobre a cópia dos
+        relatórios). A cópia é escolhida já na chamada; o iterador pode ser
+        percorrido depois, em outra thread.
+        """
+        groups = self.report_db().iter_day_groups(to_day(start_iso), to_day(end_iso))
+        return (
+            DayRecord(day, dose, {row[0]: MealEntry(*row) for row in meals})
+            for day, dose, meals in groups
+        )
 
-        start_date = dt.date.fromisoformat(start_iso)
-        end_date = dt.date.fromisoformat(end_iso)
+    def _pdf_cache_key(self, start_iso: str, end_iso: str, date_format: str) -> tuple:
+        # O PDF também depende do formato de data e da faixa-alvo de glicemia
+        return ("pdf", to_day(start_iso), to_day(end_iso), date_format, self._glicemia_thresholds())
 
-        delta = end_date - start_date
-        all_dates = [start_date + dt.timedelta(days=i) for i in range(delta.days + 1)]
+    def get_cached_pdf(self, start_iso: str, end_iso: str, date_format: str) -> bytes | None:
+        """Bytes de um PDF já gerado para o período com os dados atuais, ou None."""
+        return self._report_cache.get(self._pdf_cache_key(start_iso, end_iso, date_format), self.data_version)
 
-        daily_data = {}
-        for date_obj in all_dates:
-            date_iso = date_obj.isoformat()
-            daily_data[date_iso] = {
-                "carbs": 0.0,
-                "glicemia_sum": 0.0,
-                "glicemia_count": 0,
-                "glargina": None
-            }
+    def cache_pdf(self, start_iso: str, end_iso: str, date_format: str, data_version, pdf_path: str):
+        """
+        Guarda o PDF gerado em pdf_path. data_version é a de quando os dados
+        do relatório foram lidos: se houve gravação desde então, nada é guardado.
+        """
+        try:
+            pdf_bytes = Path(pdf_path).read_bytes()
+        except OSError:
+            return
+        self._report_cache.put(self._pdf_cache_key(start_iso, end_iso, date_format), data_version,
+                               pdf_bytes, len(pdf_bytes))
+
+    @timed("service")
+    def get_chart_data(self, start_iso: str, end_iso: str) -> "ChartData":
+        """Séries diárias do período para os gráficos, com a faixa-alvo de glicemia configurada."""
+        from charts import ChartData
+        return ChartData.from_analytics(self.get_range_analytics(start_iso, end_iso), self._glicemia_thresholds())
+
+    def get_data_date_bounds(self) -> tuple[str | None, str | None]:
+        """(primeira, última) data com registros, em ISO; (None, None) com o banco vazio."""
+        first_day, last_day = self.db.fetch_day_bounds()
+        if first_day is None:
+            return None, None
+        return to_iso(first_day), to_iso(last_day)
+
+    @timed("service")
+    def get_daily_aggregated_data(self, start_iso: str, end_iso: str) -> list[DailyAggregate]:
+        """
+        Retorna dados agregados por dia para o período especificado (um item
+        por dia, em ordem), incluindo totais diários de carboidratos, média de
+        glicemia e dose de glargina. O resultado fica no cache de relatórios; não o altere.
+        """
+        return self._report_cache.cached(
+            ("daily", to_day(start_iso), to_day(end_iso)), self.data_version,
+            lambda: self._daily_aggregated_data(start_iso, end_iso),
+        )
 
-        for date_iso, _, carbs, glicemia, _, _, _ in raw_entries:
-            if date_iso in daily_data:
-                daily_data[date_iso]["carbs"] += carbs or 0
-                if glicemia is not None:
-                    daily_data[date_iso]["glicemia_sum"] += glicemia
-                    daily_data[date_iso]["glicemia_count"] += 1
-
-        for date_iso, dose in glargina_doses:
-            if date_iso in daily_data:
-                daily_data[date_iso]["glargina"] = dose
-
-        formatted_daily_data = {}
-        for date_iso, data in daily_data.items():
-            avg_glicemia = (
-                data["glicemia_sum"] / data["glicemia_count"]
-                if data["glicemia_count"] > 0
-                else None
+    def _daily_aggregated_data(self, start_iso: str, end_iso: str) -> list[DailyAggregate]:
+        daily = self.get_range_analytics(start_iso, end_iso).per_day()
+        return [
+            DailyAggregate(
+                ordinal, carbs,
+                None if glicemia != glicemia else glicemia,  # NaN -> None
+                None if glargina != glargina else glargina,
             )
-            formatted_daily_data[date_iso] = {
-                "carbs": data["carbs"],
-                "glicemia": avg_glicemia,
-                "glargina": data["glargina"]
-            }
+            for ordinal, carbs, glicemia, glargina in zip(
+                daily["date_ordinal"].tolist(), daily["carbs"].tolist(),
+                daily["glicemia"].tolist(), daily["glargina"].tolist(),
+            )
+        ]
 
-        return formatted_daily_data
 
+    @timed("service")
+    def export_data(self, fmt: str, destination_path: str, start_iso: str, end_iso: str) -> tuple[bool, str]:
+        """Exporta o período em streaming no formato pedido (csv, npz ou parquet)."""
+        from data_exporter import DataExporter
+        if fmt not in DataExporter.available_formats():
+            return False, f"Formato de exportação não disponível: {fmt}"
+        try:
+            db = self.report_db()
+            count = DataExporter.export(
+                fmt,
+                destination_path,
+                db.iter_range(start_iso, end_iso),
+                db.iter_glargina_range(start_iso, end_iso),
+            )
+            return True, f"{count} registros exportados para: {destination_path}"
+        except Exception as e:
+            return False, f"Erro ao exportar dados: {e}"
 
+    @timed("service")
     def create_backup(self, source_db_path: str, destination_backup_path: str) -> tuple[bool, str]:
         try:
             self.db.close() # Fecha a conexão com o banco de dados antes de copiar
@@ -252,11 +708,18 @@ class CarbTrackerService:
             self.db = Database(self.db_path) # Reabre a conexão em caso de erro
             return False, f"Erro ao criar backup: {e}"
 
+    @timed("service")
     def restore_backup(self, source_backup_path: str, destination_db_path: str) -> tuple[bool, str]:
         try:
             self.db.close() # Fecha a conexão com o banco de dados antes de copiar
             shutil.copy2(source_backup_path, destination_db_path)
             self.db = Database(self.db_path) # Reabre a conexão
+            self.glycemic_metrics.invalidate()
+            self._dosing_profiles = None
+            self._undo_stacks.clear()
+            self._redo_stacks.clear()
+            # O backup restaurado é uma nova cópia para a sincronização, distinta da que o gerou
+            self.db.reset_device_id()
             return True, f"Banco de dados restaurado com sucesso de: {source_backup_path}"
         except FileNotFoundError:
             self.db = Database(self.db_path) # Reabre a conexão em caso de erro
@@ -265,5 +728,22 @@ class CarbTrackerService:
             self.db = Database(self.db_path) # Reabre a conexão em caso de erro
             return False, f"Erro ao restaurar backup: {e}. Certifique-se de que o arquivo de backup é válido."
 
+    @timed("service")
+    def compact_storage(self) -> tuple[bool, str]:
+        """Migra o banco para o armazenamento compacto (ver Database.migrate_to_compact)."""
+        if self.db.compact:
+            return True, "O banco de dados já está no formato compacto."
+        try:
+            size_before = Path(self.db_path).stat().st_size
+            count = self.db.migrate_to_compact()
+            size_after = Path(self.db_path).stat().st_size
+        except Exception as e:
+            return False, f"Erro ao compactar o banco de dados: {e}"
+        return True, (f"{count} registros convertidos. Tamanho do banco: {size_before / 1024:.0f} KiB -> "
+                      f"{size_after / 1024:.0f} KiB. Os valores passam a ser guardados com uma casa decimal.")
+
     def close_db(self):
+        self.config_store.flush()
+        self.compact_change_log()
+        self.close_report_snapshot()
         self.db.close()
\ No newline at end of file
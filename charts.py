@@ -0,0 +1,216 @@
+# charts.py
+
+import datetime as dt
+import math
+
+import numpy as np
+
+from instrumentation import timed
+
+# (chave da série diária, título, cor)
+CHART_SERIES = (
+    ("glicemia", "Glicemia média (mg/dL)", "#1E88E5"),
+    ("carbs", "Carboidratos (g/dia)", "#4CAF50"),
+    ("glargina", "Glargina (UI)", "#8E24AA"),
+)
+CHART_METHODS = ("minmax", "lttb")
+# Faixa de número de baldes: a largura em pixels é arredondada para a
+# potência de 2 seguinte, então redimensionar a janela reaproveita a série já reduzida.
+MIN_BUCKETS = 32
+MAX_BUCKETS = 4096
+
+
+def bucket_count_for_width(width_px: int) -> int:
+    """Número de baldes para uma área de plotagem de width_px pixels (cerca de um balde a cada 2 px)."""
+    wanted = max(MIN_BUCKETS, int(width_px) // 2)
+    return min(MAX_BUCKETS, 1 << math.ceil(math.log2(wanted)))
+
+
+def _bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def _first_index_per_bucket(mask: np.ndarray, bucket_id: np.ndarray) -> np.ndarray:
+    candidates = np.flatnonzero(mask)
+    _, first = np.unique(bucket_id[candidates], return_index=True)
+    return candidates[first]
+
+
+def min_max_decimate(x: np.ndarray, y: np.ndarray, n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Redução mínimo/máximo: divide a série em n_buckets baldes consecutivos e
+    mantém, em cada um, o ponto de menor e o de maior valor (na ordem original).
+    Os extremos, como uma hipoglicemia isolada, sempre sobrevivem. Valores NaN
+    são lacunas; um balde sem nenhum valor vira um ponto NaN, que quebra a linha.
+    """
+    n = x.size
+    if n <= 2 * n_buckets:
+        return x, y
+    edges = _bucket_edges(n, n_buckets)
+    starts = edges[:-1]
+    bucket_id = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # fmin/fmax ignoram NaN; um balde só com NaN resulta em NaN
+    bucket_min = np.fmin.reduceat(y, starts)
+    bucket_max = np.fmax.reduceat(y, starts)
+    empty = starts[np.isnan(bucket_min)]
+    indices = np.concatenate([
+        _first_index_per_bucket(y == bucket_min[bucket_id], bucket_id),
+        _first_index_per_bucket(y == bucket_max[bucket_id], bucket_id),
+        empty,
+    ])
+    indices = np.unique(indices)
+    return x[indices], y[indices]
+
+
+def lttb_decimate(x: np.ndarray, y: np.ndarray, n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: mantém o primeiro e o último ponto e, de
+    cada balde intermediário, o ponto que forma o maior triângulo com o ponto
+    escolhido no balde anterior e a média do balde seguinte. Preserva melhor a
+    forma da curva que o mínimo/máximo, com metade dos pontos. NaN como em
+    min_max_decimate.
+    """
+    n = x.size
+    if n <= n_buckets + 2:
+        return x, y
+    # Baldes sobre os pontos internos; o primeiro e o último ficam fixos
+    edges = 1 + _bucket_edges(n - 2, n_buckets)
+    with np.errstate(invalid="ignore"):
+        sums = np.add.reduceat(np.nan_to_num(y[1:-1]), edges[:-1] - 1)
+        counts = np.add.reduceat((~np.isnan(y[1:-1])).astype(np.int64), edges[:-1] - 1)
+        x_means = np.add.reduceat(x[1:-1], edges[:-1] - 1) / np.diff(edges)
+        y_means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    # Os baldes têm poucos pontos cada: o laço em floats do Python sai mais barato que fatiar arrays
+    xs, ys = x.tolist(), y.tolist()
+    x_means, y_means, counts = x_means.tolist(), y_means.tolist(), counts.tolist()
+    selected = [0]
+    prev_x, prev_y = xs[0], ys[0]
+    for b in range(n_buckets):
+        lo, hi = int(edges[b]), int(edges[b + 1])
+        if counts[b] == 0:
+            selected.append(lo)
+            continue
+        if b + 1 < n_buckets:
+            next_x, next_y = x_means[b + 1], y_means[b + 1]
+        else:
+            next_x, next_y = xs[-1], ys[-1]
+        # Vizinho ausente (lacuna ou NaN nas pontas): usa a média do próprio balde no lugar dele
+        if prev_y != prev_y:
+            prev_x, prev_y = x_means[b], y_means[b]
+        if next_y != next_y:
+            next_x, next_y = x_means[b], y_means[b]
+        dx, dy = prev_x - next_x, next_y - prev_y
+        pick, best = lo, -1.0
+        for i in range(lo, hi):
+            area = abs(dx * (ys[i] - prev_y) - (prev_x - xs[i]) * dy)
+            if area > best:  # NaN nunca é maior
+                pick, best = i, area
+        selected.append(pick)
+        prev_x, prev_y = xs[pick], ys[pick]
+    selected.append(n - 1)
+    indices = np.asarray(selected, dtype=np.int64)
+    return x[indices], y[indices]
+
+
+DECIMATORS = {"minmax": min_max_decimate, "lttb": lttb_decimate}
+
+
+def line_segments(x: np.ndarray, y: np.ndarray):
+    """Divide a série nos trechos contínuos entre valores NaN; gera pares (x, y) de arrays."""
+    valid = ~np.isnan(y)
+    if not valid.any():
+        return
+    # Posições em que um trecho válido começa ou termina
+    change = np.flatnonzero(np.diff(np.concatenate(([False], valid, [False])).astype(np.int8)))
+    for start, stop in zip(change[::2], change[1::2]):
+        yield x[start:stop], y[start:stop]
+
+
+def nice_range(low: float, high: float) -> tuple[float, float]:
+    """Amplia [low, high] para múltiplos de um passo "redondo" (1, 2 ou 5 × 10^k)."""
+    if high <= low:
+        low, high = low - 1.0, high + 1.0
+    raw_step = (high - low) / 4
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    return math.floor(low / step) * step, math.ceil(high / step) * step
+
+
+class ChartData:
+    """
+    Séries diárias de um período prontas para os gráficos (aba Gráficos e
+    relatório PDF). As versões reduzidas são guardadas por (série, método,
+    número de baldes), então redesenhar com a mesma largura aproximada não
+    refaz a redução.
+    """
+
+    def __init__(self, daily: dict, target_range: tuple[float, float] | None = None):
+        self.x = np.asarray(daily["date_ordinal"], dtype=np.float64)
+        no_entries = (daily["glicemia_count"] == 0) & (daily["carbs"] == 0)
+        self.series = {
+            "glicemia": np.asarray(daily["glicemia"], dtype=np.float64),
+            # Dia sem nenhum registro é lacuna, não zero
+            "carbs": np.where(no_entries, np.nan, daily["carbs"]).astype(np.float64),
+            "glargina": np.asarray(daily["glargina"], dtype=np.float64),
+        }
+        self.target_range = target_range
+        self._decimated = {}
+
+    @classmethod
+    def from_analytics(cls, analytics, target_range: tuple[float, float] | None = None) -> "ChartData":
+        return cls(analytics.per_day(), target_range)
+
+    @property
+    def n_days(self) -> int:
+        return self.x.size
+
+    def x_range(self) -> tuple[float, float]:
+        if not self.x.size:
+            return 0.0, 1.0
+        return float(self.x[0]), float(max(self.x[-1], self.x[0] + 1))
+
+    def y_range(self, key: str) -> tuple[float, float] | None:
+        """Faixa "redonda" do eixo y, ou None se a série não tiver valores."""
+        y = self.series[key]
+        if np.isnan(y).all():
+            return None
+        low, high = float(np.nanmin(y)), float(np.nanmax(y))
+        if key == "glicemia" and self.target_range:
+            low, high = min(low, self.target_range[0]), max(high, self.target_range[1])
+        if key != "glicemia":
+            low = min(low, 0.0)
+        return nice_range(low, high)
+
+    @timed("ui", "ChartData.decimated")
+    def decimated(self, key: str, n_buckets: int, method: str = "minmax") -> tuple[np.ndarray, np.ndarray]:
+        cache_key = (key, method, n_buckets)
+        result = self._decimated.get(cache_key)
+        if result is None:
+            result = self._decimated[cache_key] = DECIMATORS[method](self.x, self.series[key], n_buckets)
+        return result
+
+    def plot_segments(self, key: str, width_px: float, method: str = "minmax"):
+        """Trechos (x, y) da série reduzida para uma área de width_px pixels de largura."""
+        return line_segments(*self.decimated(key, bucket_count_for_width(width_px), method))
+
+
+def to_pixels(x: np.ndarray, y: np.ndarray, x_range: tuple, y_range: tuple, box: tuple, flip_y: bool = True) -> list:
+    """
+    Converte um trecho para coordenadas de tela dentro de box = (left, top,
+    width, height) e devolve a lista plana [x0, y0, x1, y1, ...]. flip_y=False
+    para sistemas com y crescendo para cima (ReportLab).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    left, top, width, height = box
+    x0, x1 = x_range
+    y0, y1 = y_range
+    px = left + (x - x0) * (width / (x1 - x0))
+    fraction = (y - y0) / (y1 - y0)
+    py = top + (1 - fraction) * height if flip_y else top + fraction * height
+    return np.column_stack((px, py)).ravel().tolist()
+
+
+def date_label(ordinal: float, date_format: str = "%d/%m/%Y") -> str:
+    return dt.date.fromordinal(int(round(ordinal))).strftime(date_format)
@@ -0,0 +1,186 @@
+# charts_tab_ui.py
+
+import datetime as dt
+from tkinter import Canvas, StringVar, ttk, messagebox
+
+from tkcalendar import DateEntry
+
+from carb_tracker_service import CarbTrackerService
+from charts import CHART_SERIES, date_label, to_pixels
+from tooltip import ToolTip
+from instrumentation import timed
+
+CHART_WINDOWS = [30, 90, 365]
+CHART_METHOD_LABELS = {"Mín/Máx": "minmax", "LTTB": "lttb"}
+# Margens da área de plotagem de cada painel (esquerda, topo, direita, base) em pixels
+CHART_PADDING = (56, 24, 16, 22)
+TARGET_BAND_COLOR = "#E8F5E9"
+
+
+class ChartsTabUI(ttk.Frame):
+    """
+    Gráficos diários de glicemia média, carboidratos e glargina em um Canvas,
+    um painel por série. Períodos longos são reduzidos por balde de pixels
+    (mínimo/máximo ou LTTB) antes de desenhar; as séries reduzidas ficam em
+    cache no ChartData, então redimensionar a janela só reescala os pontos.
+    """
+
+    def __init__(self, master, service: CarbTrackerService, app_instance):
+        super().__init__(master, style="Panel.TFrame")
+        self.service = service
+        self.app_instance = app_instance
+
+        self.chart_data = None
+        self.range_iso = None
+        self._redraw_pending = False
+        self.method_var = StringVar(value=next(iter(CHART_METHOD_LABELS)))
+
+        self._build_ui()
+        end_date = dt.date.today()
+        self.range_iso = ((end_date - dt.timedelta(days=CHART_WINDOWS[1] - 1)).isoformat(), end_date.isoformat())
+        # Carrega ao exibir a aba e recarrega ao voltar a ela: os dados podem ter mudado no registro diário
+        self.bind("<Map>", lambda event: self.reload())
+
+    def _build_ui(self):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=0)
+        self.grid_rowconfigure(1, weight=0)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_rowconfigure(3, weight=0)
+
+        ttk.Label(self, text="Gráficos", style="Heading.TLabel").grid(row=0, column=0, pady=(15, 20), sticky="ew", padx=20)
+        self._create_controls_frame(self, 1)
+
+        self.canvas = Canvas(self, background=self.app_instance.colors["panel_bg"], highlightthickness=0)
+        self.canvas.grid(row=2, column=0, sticky="nsew", padx=20)
+        self.canvas.bind("<Configure>", lambda event: self._schedule_redraw())
+
+        self.status_label = ttk.Label(self, text="", style="TLabel")
+        self.status_label.grid(row=3, column=0, sticky="w", padx=20, pady=(5, 15))
+
+    def _create_controls_frame(self, parent, row):
+        controls_frame = ttk.Frame(parent, style="DateNav.TFrame", padding=(10, 5))
+        controls_frame.grid(row=row, column=0, sticky="ew", pady=(0, 15), padx=20)
+
+        ttk.Label(controls_frame, text="Início:").grid(row=0, column=0, padx=(0, 4), sticky="w")
+        self.start_date_entry = DateEntry(controls_frame, width=10, background="darkblue", foreground="white",
+                                          borderwidth=0, date_pattern="dd/mm/yyyy", font=self.app_instance.data_font)
+        self.start_date_entry.grid(row=0, column=1, padx=(0, 10))
+        ttk.Label(controls_frame, text="Fim:").grid(row=0, column=2, padx=(0, 4), sticky="w")
+        self.end_date_entry = DateEntry(controls_frame, width=10, background="darkblue", foreground="white",
+                                        borderwidth=0, date_pattern="dd/mm/yyyy", font=self.app_instance.data_font)
+        self.end_date_entry.grid(row=0, column=3, padx=(0, 10))
+        ttk.Button(controls_frame, text="Mostrar", command=self.apply_dates, style="ReportDateNav.TButton").grid(row=0, column=4, padx=(0, 16))
+
+        for col_idx, days in enumerate(CHART_WINDOWS, start=5):
+            ttk.Button(controls_frame, text=f"{days} dias", style="ReportDateNav.TButton",
+                       command=lambda d=days: self.show_trailing_window(d)).grid(row=0, column=col_idx, padx=2)
+        ttk.Button(controls_frame, text="Tudo", style="ReportDateNav.TButton",
+                   command=self.show_all).grid(row=0, column=5 + len(CHART_WINDOWS), padx=(2, 16))
+
+        ttk.Label(controls_frame, text="Redução:").grid(row=0, column=6 + len(CHART_WINDOWS), padx=(0, 4), sticky="w")
+        method_combo = ttk.Combobox(controls_frame, textvariable=self.method_var, values=list(CHART_METHOD_LABELS),
+                                    state="readonly", width=8)
+        method_combo.grid(row=0, column=7 + len(CHART_WINDOWS))
+        method_combo.bind("<<ComboboxSelected>>", lambda event: self._schedule_redraw())
+        ToolTip(method_combo, "Mín/Máx preserva picos e hipoglicemias isoladas; LTTB preserva a forma da curva com menos pontos.")
+
+    @timed("ui")
+    def load_range(self, start_iso: str, end_iso: str):
+        self.range_iso = (start_iso, end_iso)
+        self.start_date_entry.set_date(dt.date.fromisoformat(start_iso))
+        self.end_date_entry.set_date(dt.date.fromisoformat(end_iso))
+        self.chart_data = self.service.get_chart_data(start_iso, end_iso)
+        self._schedule_redraw()
+
+    def reload(self):
+        if self.range_iso is not None:
+            self.load_range(*self.range_iso)
+
+    def apply_dates(self):
+        start_date = self.start_date_entry.get_date()
+        end_date = self.end_date_entry.get_date()
+        if start_date > end_date:
+            messagebox.showwarning("Período inválido", "A data inicial é posterior à data final.")
+            return
+        self.load_range(start_date.isoformat(), end_date.isoformat())
+
+    def show_trailing_window(self, days: int):
+        end_date = dt.date.today()
+        self.load_range((end_date - dt.timedelta(days=days - 1)).isoformat(), end_date.isoformat())
+
+    def show_all(self):
+        first_iso, last_iso = self.service.get_data_date_bounds()
+        if first_iso is None:
+            messagebox.showinfo("Sem dados", "Ainda não há registros para exibir.")
+            return
+        self.load_range(first_iso, last_iso)
+
+    def _schedule_redraw(self):
+        """Agrupa redesenhos (eventos <Configure> seguidos durante o redimensionamento) em um só."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    @timed("ui", "ChartsTabUI.redraw")
+    def _redraw(self):
+        self._redraw_pending = False
+        canvas = self.canvas
+        canvas.delete("all")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width < 50 or height < 50 or self.chart_data is None:
+            return
+
+        panels = [(key, title, color, self.chart_data.y_range(key)) for key, title, color in CHART_SERIES]
+        panels = [panel for panel in panels if panel[3] is not None]
+        if not panels:
+            canvas.create_text(width / 2, height / 2, text="Não há registros para o período informado.",
+                               fill=self.app_instance.colors["text_secondary"])
+            self.status_label.config(text="")
+            return
+
+        method = CHART_METHOD_LABELS[self.method_var.get()]
+        panel_height = height / len(panels)
+        n_points = 0
+        for i, (key, title, color, y_range) in enumerate(panels):
+            n_points += self._draw_panel(key, title, color, y_range, i * panel_height, width, panel_height, method,
+                                         show_dates=i == len(panels) - 1)
+        self.status_label.config(
+            text=f"{self.chart_data.n_days} dias, {n_points} pontos desenhados ({self.method_var.get()})"
+        )
+
+    def _draw_panel(self, key: str, title: str, color: str, y_range: tuple, top: float, width: float,
+                    height: float, method: str, show_dates: bool) -> int:
+        """Desenha um painel e retorna o número de pontos da série desenhados."""
+        canvas = self.canvas
+        colors = self.app_instance.colors
+        pad_left, pad_top, pad_right, pad_bottom = CHART_PADDING
+        box = (pad_left, top + pad_top, width - pad_left - pad_right, height - pad_top - pad_bottom)
+        x_range = self.chart_data.x_range()
+
+        canvas.create_text(box[0], top + 4, text=title, anchor="nw", font=("Helvetica", 9, "bold"), fill=colors["text_dark"])
+        target_range = self.chart_data.target_range
+        if key == "glicemia" and target_range:
+            low, high = max(target_range[0], y_range[0]), min(target_range[1], y_range[1])
+            band = to_pixels([x_range[0], x_range[1]], [high, low], x_range, y_range, box)
+            canvas.create_rectangle(*band, fill=TARGET_BAND_COLOR, outline="")
+        canvas.create_rectangle(box[0], box[1], box[0] + box[2], box[1] + box[3], outline=colors["border"])
+        for value, y in ((y_range[1], box[1]), (y_range[0], box[1] + box[3])):
+            canvas.create_text(box[0] - 4, y, text=f"{value:g}", anchor="e", font=("Helvetica", 8),
+                               fill=colors["text_secondary"])
+        if show_dates:
+            date_y = box[1] + box[3] + 3
+            canvas.create_text(box[0], date_y, text=date_label(x_range[0]), anchor="nw", font=("Helvetica", 8),
+                               fill=colors["text_secondary"])
+            canvas.create_text(box[0] + box[2], date_y, text=date_label(x_range[1]), anchor="ne", font=("Helvetica", 8),
+                               fill=colors["text_secondary"])
+
+        n_points = 0
+        for seg_x, seg_y in self.chart_data.plot_segments(key, box[2], method):
+            points = to_pixels(seg_x, seg_y, x_range, y_range, box)
+            if len(points) == 2:
+                canvas.create_oval(points[0] - 2, points[1] - 2, points[0] + 2, points[1] + 2, fill=color, outline="")
+            else:
+                canvas.create_line(points, fill=color, width=1.5)
+            n_points += len(seg_x)
+        return n_points
@@ -0,0 +1,275 @@
+# config_store.py
+
+import datetime as dt
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from instrumentation import timed
+
+# Atraso (s) entre a última alteração e a gravação do arquivo: mudanças em
+# sequência (trocar de tema várias vezes, por exemplo) resultam em uma só escrita.
+SAVE_DELAY_SECONDS = 0.5
+
+
+class ConfigError(ValueError):
+    """Valor de configuração inválido; a mensagem é exibida ao usuário."""
+
+
+def _non_negative(label: str, value: float):
+    if value < 0:
+        raise ConfigError(f"{label} deve ser um número não negativo.")
+
+
+def _positive(label: str, value: float):
+    if value <= 0:
+        raise ConfigError(f"{label} deve ser maior que zero.")
+
+
+def _date_format(label: str, value: str):
+    if not value:
+        raise ConfigError(f"{label} não pode ficar vazio.")
+    try:
+        dt.datetime.now().strftime(value)
+    except Exception:
+        raise ConfigError("Formato de data inválido. Use um formato válido como %d/%m/%Y.")
+
+
+class ConfigField:
+    """Tipo, valor padrão e validação de uma chave de configuração; label nomeia o campo nas mensagens de erro."""
+
+    __slots__ = ("type", "default", "label", "nullable", "validator")
+
+    def __init__(self, type_: type, default, label: str, nullable: bool = False, validator=None):
+        self.type = type_
+        self.default = default
+        self.label = label
+        self.nullable = nullable
+        self.validator = validator
+
+    def coerce(self, value):
+        """Converte value para o tipo do campo (ex.: "180" ou 180 -> 180.0) e valida; levanta ConfigError."""
+        if value is None or value == "":
+            if self.nullable:
+                return None
+            raise ConfigError(f"{self.label} é obrigatório.")
+        if self.type is float:
+            if isinstance(value, bool):
+                raise ConfigError(f"{self.label} deve ser um número válido.")
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ConfigError(f"{self.label} deve ser um número válido.")
+        elif not isinstance(value, self.type):
+            raise ConfigError(f"{self.label} deve ser um texto.")
+        if self.validator is not None:
+            self.validator(self.label, value)
+        return value
+
+
+CONFIG_SCHEMA = {
+    "report_date_format": ConfigField(str, "%d/%m/%Y", "O formato de data", validator=_date_format),
+    "glicemia_alert_threshold": ConfigField(float, 180.0, "O limite de alerta de glicemia", nullable=True, validator=_non_negative),
+    "glicemia_low_threshold": ConfigField(float, 70.0, "O limite inferior de glicemia", nullable=True, validator=_non_negative),
+    "glicemia_alvo": ConfigField(float, 100.0, "A glicemia alvo", nullable=True, validator=_positive),
+    "db_location_override": ConfigField(str, None, "O local do banco de dados", nullable=True),
+    "app_theme": ConfigField(str, "clam", "O tema da interface"),
+}
+
+
+def _check_thresholds(values: dict):
+    low = values.get("glicemia_low_threshold")
+    high = values.get("glicemia_alert_threshold")
+    if low is not None and high is not None and low >= high:
+        raise ConfigError("O limite inferior de glicemia deve ser menor que o limite de alerta.")
+
+
+# Validações que envolvem mais de uma chave, aplicadas ao resultado de cada alteração
+CROSS_FIELD_CHECKS = (_check_thresholds,)
+
+
+def write_json_atomic(path: str, data: dict, indent: int | None = 4):
+    """
+    Grava data em um arquivo temporário no mesmo diretório e o troca pelo
+    destino com os.replace: quem ler o arquivo vê a versão antiga ou a nova
+    inteira, nunca uma gravação pela metade.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ConfigStore:
+    """
+    Configuração em memória validada por CONFIG_SCHEMA, gravada em JSON de
+    forma atômica e com atraso (várias alterações seguidas viram uma escrita).
+    Observadores registrados com subscribe recebem um dicionário só com as
+    chaves que de fato mudaram, na thread que fez a alteração.
+    """
+
+    def __init__(self, path: str, schema: dict = CONFIG_SCHEMA, save_delay: float = SAVE_DELAY_SECONDS):
+        self.path = path
+        self.schema = schema
+        self.save_delay = save_delay
+        self.load_error = None  # Mensagem se o arquivo existente não pôde ser lido
+        self._lock = threading.RLock()
+        self._timer = None
+        self._save_due = 0.0
+        self._dirty = False
+        self._observers = []  # (callback, conjunto de chaves ou None para todas)
+        self._values = self._load()
+
+    def defaults(self) -> dict:
+        return {key: field.default for key, field in self.schema.items()}
+
+    def _load(self) -> dict:
+        values = self.defaults()
+        path = Path(self.path)
+        if not path.exists():
+            return values
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if not isinstance(stored, dict):
+                raise ValueError("o conteúdo não é um objeto JSON")
+        except (OSError, ValueError) as e:
+            # Guarda o arquivo ilegível ao lado em vez de sobrescrevê-lo com os padrões
+            backup = path.with_name(f"{path.name}.corrompido-{dt.datetime.now():%Y%m%d%H%M%S}")
+            try:
+                os.replace(path, backup)
+                self.load_error = f"Configuração ilegível ({e}); arquivo preservado em {backup.name}."
+            except OSError:
+                self.load_error = f"Configuração ilegível ({e}); usando os valores padrão."
+            return values
+
+        for key, value in stored.items():
+            field = self.schema.get(key)
+            if field is None:
+                values[key] = value  # Chaves desconhecidas são preservadas como estão
+                continue
+            try:
+                values[key] = field.coerce(value)
+            except ConfigError:
+                pass  # Valor inválido no arquivo: fica o padrão
+        try:
+            for check in CROSS_FIELD_CHECKS:
+                check(values)
+        except ConfigError:
+            for key in ("glicemia_low_threshold", "glicemia_alert_threshold"):
+                values[key] = self.schema[key].default
+        return values
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            value = self._values.get(key)
+        return default if value is None else value
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def update(self, changes: dict, persist: str = "debounced") -> dict:
+        """
+        Valida e aplica changes. persist="debounced" agenda a gravação,
+        "now" grava antes de aplicar (erros de E/S propagam como OSError).
+        Retorna as chaves alteradas com os novos valores; levanta ConfigError
+        se algum valor for inválido. Em qualquer erro, nada é alterado.
+        """
+        with self._lock:
+            coerced = {}
+            for key, value in changes.items():
+                field = self.schema.get(key)
+                coerced[key] = field.coerce(value) if field is not None else value
+            merged = {**self._values, **coerced}
+            for check in CROSS_FIELD_CHECKS:
+                check(merged)
+            changed = {key: value for key, value in coerced.items() if self._values.get(key) != value}
+            if persist == "now":
+                # Grava antes de aplicar: se a escrita falhar, memória e observadores ficam como estavam
+                if changed or self._dirty:
+                    write_json_atomic(self.path, merged)
+                    self._cancel_timer()
+                self._values = merged
+                self._dirty = False
+            else:
+                self._values = merged
+                if changed:
+                    self._dirty = True
+                    self._schedule_save()
+            observers = list(self._observers)
+
+        if changed:
+            for callback, keys in observers:
+                relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+                if relevant:
+                    callback(relevant)
+        return changed
+
+    def set(self, key: str, value, persist: str = "debounced") -> dict:
+        return self.update({key: value}, persist)
+
+    def reset(self, persist: str = "now") -> dict:
+        """Volta todas as chaves do esquema aos padrões."""
+        return self.update(self.defaults(), persist)
+
+    def subscribe(self, callback, keys=None):
+        """
+        Registra callback(changes) para alterações nas chaves indicadas (todas,
+        se keys for None). Retorna uma função que cancela o registro.
+        """
+        entry = (callback, frozenset(keys) if keys is not None else None)
+        with self._lock:
+            self._observers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._observers:
+                    self._observers.remove(entry)
+        return unsubscribe
+
+    def _schedule_save(self):
+        # Um único timer por rajada de alterações: cada alteração só adia o prazo
+        self._save_due = time.monotonic() + self.save_delay
+        if self._timer is None:
+            self._start_timer(self.save_delay)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _start_timer(self, delay: float):
+        # Timer não-daemon: ao encerrar o processo a gravação pendente ainda acontece
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            remaining = self._save_due - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+            self._timer = None
+            self.flush()
+
+    @timed("service", "ConfigStore.flush")
+    def flush(self):
+        """Grava imediatamente as alterações pendentes, se houver."""
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty:
+                return
+            write_json_atomic(self.path, self._values)
+            self._dirty = False
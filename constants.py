@@ -30,4 +30,27 @@ LAST_UPDATED_DATE = "04/07/2025"
 
 # NOVAS CONSTANTES PARA REFEIÇÕES DINÂMICAS
 FIXED_MEALS = [m for m in MEALS if m != "Lanche Extra"]
-DYNAMIC_MEAL_PREFIX = "Lanche Extra"
\ No newline at end of file
+DYNAMIC_MEAL_PREFIX = "Lanche Extra"
+
+
+def meal_category(meal: str) -> str:
+    """Agrupa os lanches extras numerados ("Lanche Extra 3") na categoria "Lanche Extra"."""
+    if meal.startswith(DYNAMIC_MEAL_PREFIX):
+        return DYNAMIC_MEAL_PREFIX
+    return meal
+
+# Changesets do log de alterações mais antigos que isto (em dias) são compactados ao fechar
+CHANGE_LOG_RETENTION_DAYS = 90
+
+# Janelas móveis (em dias) consultadas com frequência nos relatórios
+TRAILING_WINDOWS = [7, 14, 30, 90]
+
+# Hora aproximada de início de cada refeição fixa, usada para escolher o perfil de dose
+MEAL_START_HOURS = {
+    "Jejum": 5,
+    "Café da manhã": 7,
+    "Colação": 10,
+    "Almoço": 12,
+    "Café da tarde": 15,
+    "Jantar": 19,
+}
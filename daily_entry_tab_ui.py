@@ -1,6 +1,7 @@
 # daily_entry_tab_ui.py
 
 import datetime as dt
+from contextlib import contextmanager
 from tkinter import Tk, Label, Entry, Button, StringVar, ttk, messagebox, filedialog, Toplevel, Canvas, Text, Scrollbar
 import tkinter.font as tkFont
 
@@ -9,7 +10,34 @@ from tkcalendar import DateEntry
 # Importar do seu projeto
 from carb_tracker_service import CarbTrackerService
 from constants import MEALS, FIELDS, FIELD_NAMES_MAP, DYNAMIC_MEAL_PREFIX, FIXED_MEALS
+from domain_models import MealEntry
 from tooltip import ToolTip
+from instrumentation import timed
+
+# Linhas de lanches extras ocultas guardadas para reuso; acima disso são destruídas
+MAX_SPARE_MEAL_ROWS = 20
+
+NUMERIC_FIELD_KEYS = ("carbs", "glicemia", "lispro", "bolus")
+# Identificador do campo de glargina no rastreamento de alterações (os demais são (refeição, campo))
+GLARGINA_FIELD = (None, "glargina")
+
+
+class MealEntryRow:
+    """
+    Widgets e StringVars de uma linha de refeição. As linhas de lanches extras
+    não são destruídas ao trocar de dia: voltam ocultas para um pool e são
+    reaproveitadas (com outro nome de refeição) na próxima vez que forem necessárias.
+    """
+
+    def __init__(self, frame: ttk.LabelFrame, name_label: ttk.Label, meal_vars: dict):
+        self.frame = frame
+        self.name_label = name_label
+        self.vars = meal_vars
+        self.entry_widgets = {}
+        self.meal_name = None
+        self.remove_button = None
+        self.index = None # Posição no grid; None enquanto oculta
+
 
 class DailyEntryTabUI(ttk.Frame):
     def __init__(self, master, service: CarbTrackerService, app_instance):
@@ -19,10 +47,22 @@ class DailyEntryTabUI(ttk.Frame):
 
         self.glargina_var = StringVar()
         self.entries = {}
-        self.dynamic_meal_frames = {}
+        self.meal_rows = [] # Linhas visíveis, na ordem de exibição
+        self.dynamic_meal_rows = {}
+        self._spare_meal_rows = [] # Pool de linhas de lanches extras ocultas
         self.dynamic_meal_counter = 0
 
-        self.data_modified = False
+        # Layout adiado: várias mudanças no mesmo turno do loop de eventos viram um único passo
+        self._layout_pending = False
+        self._scroll_to_end_pending = False
+
+        # Rastreamento de alterações: valores como carregados do banco e campos que diferem deles.
+        # Durante carregamentos em lote (_bulk_load) os traces das StringVars retornam de imediato.
+        self._loading = False
+        self._snapshot = {}
+        self._dirty_fields = {} # (refeição, campo) -> Entry destacado
+        self._removed_meals = set()
+        self.data_modified = False # Alterações estruturais (lanche extra removido)
 
         self._build_ui()
         self._set_trace_on_entries()
@@ -51,7 +91,7 @@ class DailyEntryTabUI(ttk.Frame):
         self._create_action_buttons_frame(self, 4)
 
     def _set_trace_on_entries(self):
-        self.glargina_var.trace_add("write", self._on_data_change)
+        self.glargina_var.trace_add("write", lambda *args: self._on_field_change(None, "glargina"))
 
     def _create_date_navigation_frame(self, parent, row):
         date_nav_frame = ttk.Frame(parent, style="DateNav.TFrame")
@@ -125,19 +165,30 @@ class DailyEntryTabUI(ttk.Frame):
         self.master.bind_all("<Button-5>", self._on_mousewheel)
 
     def _create_single_meal_entry_row(self, meal_name: str, dynamic_removable: bool = False):
-        """Cria uma única linha de entrada para uma refeição (fixa ou dinâmica)."""
-        if meal_name in self.entries and not dynamic_removable:
-             return
+        """Exibe uma linha de entrada para uma refeição (fixa ou dinâmica), reaproveitando uma linha do pool se houver."""
+        if meal_name in self.entries:
+            return
 
-        row_idx = len(self.meals_sections_container.winfo_children())
+        row = self._spare_meal_rows.pop() if dynamic_removable and self._spare_meal_rows else None
+        if row is None:
+            row = self._build_meal_row(dynamic_removable)
 
-        meal_labelframe = ttk.LabelFrame(self.meals_sections_container, style="MealSection.TLabelframe")
-        meal_labelframe.grid(row=row_idx, column=0, sticky="ew", pady=(5, 5), padx=5)
+        row.meal_name = meal_name
+        row.name_label.configure(text=meal_name + ":")
+        self.meal_rows.append(row)
 
-        bg_style = "MealRow.TFrame" if row_idx % 2 == 0 else "MealRowAlt.TFrame"
-        meal_labelframe.configure(style=bg_style)
+        self.entries[meal_name] = row.vars
+        if dynamic_removable:
+            self.dynamic_meal_rows[meal_name] = row
 
-        ttk.Label(meal_labelframe, text=meal_name + ":", style="MealName.TLabel" if row_idx % 2 == 0 else "MealNameAlt.TLabel").grid(row=0, column=0, sticky="w", padx=10, rowspan=2)
+        self._schedule_layout()
+
+    def _build_meal_row(self, dynamic_removable: bool) -> MealEntryRow:
+        """Cria os widgets e StringVars de uma linha de refeição (ainda sem nome nem posição)."""
+        meal_labelframe = ttk.LabelFrame(self.meals_sections_container, style="MealSection.TLabelframe")
+
+        name_label = ttk.Label(meal_labelframe, style="MealName.TLabel")
+        name_label.grid(row=0, column=0, sticky="w", padx=10, rowspan=2)
 
         meal_labelframe.grid_columnconfigure(0, weight=0, minsize=100)
 
@@ -152,25 +203,69 @@ class DailyEntryTabUI(ttk.Frame):
         for col_idx, (title, _) in enumerate(FIELDS):
             ttk.Label(meal_labelframe, text=title.split(" ")[0], style="MealFieldHeader.TLabel").grid(row=0, column=col_idx+1, padx=5, pady=5, sticky="ew")
 
-        meal_vars = {}
+        row = MealEntryRow(meal_labelframe, name_label, {})
         for col_idx, (_, key) in enumerate(FIELDS):
             var = StringVar()
             entry_width = 8 if key != "observations" else 30
             entry = ttk.Entry(meal_labelframe, textvariable=var, width=entry_width)
             entry.grid(row=1, column=col_idx+1, pady=3, padx=5, sticky="ew")
-            meal_vars[key] = var
-            var.trace_add("write", self._on_data_change)
-
-        self.entries[meal_name] = meal_vars
+            row.vars[key] = var
+            row.entry_widgets[key] = entry
+            var.trace_add("write", lambda *args, r=row, k=key: self._on_field_change(r, k))
 
         if dynamic_removable:
-            remove_button = ttk.Button(meal_labelframe, text="X", style="Exit.TButton",
-                                        command=lambda m=meal_name, f=meal_labelframe: self._remove_dynamic_meal(m, f))
-            remove_button.grid(row=0, column=len(FIELDS) + 1, padx=5, pady=5, sticky="ne")
-            self.dynamic_meal_frames[meal_name] = meal_labelframe
+            # O nome é lido da linha no clique, pois a mesma linha pode ser reaproveitada para outro lanche
+            row.remove_button = ttk.Button(meal_labelframe, text="X", style="Exit.TButton",
+                                           command=lambda r=row: self._remove_dynamic_meal(r.meal_name))
+            row.remove_button.grid(row=0, column=len(FIELDS) + 1, padx=5, pady=5, sticky="ne")
+
+        return row
+
+    def _place_meal_row(self, row: MealEntryRow, index: int):
+        """Posiciona a linha no grid e aplica o zebrado; linhas que não mudaram de índice não são tocadas."""
+        if row.index == index:
+            return
+        row.frame.grid(row=index, column=0, sticky="ew", pady=(5, 5), padx=5)
+        row.frame.configure(style="MealRow.TFrame" if index % 2 == 0 else "MealRowAlt.TFrame")
+        row.name_label.configure(style="MealName.TLabel" if index % 2 == 0 else "MealNameAlt.TLabel")
+        row.index = index
+
+    def _schedule_layout(self, scroll_to_end: bool = False):
+        """Agenda um único passo de layout (after_idle) para todas as mudanças feitas neste turno."""
+        self._scroll_to_end_pending = self._scroll_to_end_pending or scroll_to_end
+        if not self._layout_pending:
+            self._layout_pending = True
+            self.after_idle(self._run_layout)
+
+    @timed("ui", "DailyEntryTabUI.layout_pass")
+    def _run_layout(self):
+        self._layout_pending = False
+        for i, row in enumerate(self.meal_rows):
+            self._place_meal_row(row, i)
 
         self.meals_sections_container.update_idletasks()
         self.meals_canvas.config(scrollregion=self.meals_canvas.bbox("all"))
+        if self._scroll_to_end_pending:
+            self._scroll_to_end_pending = False
+            self.meals_canvas.yview_moveto(1.0)
+
+    def _release_dynamic_meal_row(self, meal_name: str):
+        """Oculta a linha de um lanche extra e a devolve (limpa) ao pool."""
+        row = self.dynamic_meal_rows.pop(meal_name)
+        self._clear_dirty_fields(meal_name)
+        self.entries.pop(meal_name, None)
+        self.meal_rows.remove(row)
+        row.frame.grid_remove()
+        row.meal_name = None
+        row.index = None
+        self._schedule_layout()
+
+        if len(self._spare_meal_rows) >= MAX_SPARE_MEAL_ROWS:
+            row.frame.destroy()
+            return
+        for var in row.vars.values():
+            self._set_var(var, "")
+        self._spare_meal_rows.append(row)
 
 
     def _create_add_extra_meal_button(self, parent, row):
@@ -184,60 +279,44 @@ class DailyEntryTabUI(ttk.Frame):
         self.dynamic_meal_counter += 1
         new_meal_name = f"{DYNAMIC_MEAL_PREFIX} {self.dynamic_meal_counter}"
         self._create_single_meal_entry_row(new_meal_name, dynamic_removable=True)
-        self.meals_canvas.yview_moveto(1.0)
+        self._schedule_layout(scroll_to_end=True)
 
 
-    def _remove_dynamic_meal(self, meal_name: str, meal_frame: ttk.LabelFrame):
+    def _remove_dynamic_meal(self, meal_name: str):
         response = messagebox.askyesno(
             "Remover Lanche Extra",
             f"Tem certeza que deseja remover '{meal_name}'? Isso apagará os dados associados a ele para a data atual."
         )
         if response:
-            meal_frame.destroy()
-            if meal_name in self.entries:
-                del self.entries[meal_name]
-            if meal_name in self.dynamic_meal_frames:
-                del self.dynamic_meal_frames[meal_name]
-
-            self.data_modified = True
-            self._repack_meals_sections_container()
-            self.meals_canvas.config(scrollregion=self.meals_canvas.bbox("all"))
+            if meal_name in self.dynamic_meal_rows:
+                self._release_dynamic_meal_row(meal_name)
+            self._mark_meal_removed(meal_name)
             messagebox.showinfo("Lanche Removido", f"'{meal_name}' foi removido. Salve o dia para que a remoção seja permanente.")
 
 
-    def _repack_meals_sections_container(self):
-        """Reorganiza os widgets no container de refeições após uma remoção, mantendo o zebrado."""
-        children = self.meals_sections_container.winfo_children()
-
-        for i, child in enumerate(children):
-            child.grid(row=i, column=0, sticky="ew", pady=(5, 5), padx=5)
-
-            bg_style = "MealRow.TFrame" if i % 2 == 0 else "MealRowAlt.TFrame"
-            child.configure(style=bg_style)
-
-            for sub_child in child.winfo_children():
-                if isinstance(sub_child, ttk.Label) and sub_child.cget("text").endswith(":"):
-                    sub_child.configure(style="MealName.TLabel" if i % 2 == 0 else "MealNameAlt.TLabel")
-                    break
-
-        self.meals_sections_container.update_idletasks()
-        self.meals_canvas.config(scrollregion=self.meals_canvas.bbox("all"))
-
     def _create_action_buttons_frame(self, parent, row):
         action_button_frame = ttk.Frame(parent, style="Panel.TFrame", padding=(20, 15))
         action_button_frame.grid(row=row, column=0, pady=(20, 0), sticky="ew", padx=20)
-        action_button_frame.grid_columnconfigure((0,1,2,3), weight=1)
+        action_button_frame.grid_columnconfigure((0,1,2,3,4,5), weight=1)
 
         ttk.Button(action_button_frame, text="Salvar Dia", command=self.save_day, style="TButton").grid(row=0, column=0, padx=8, sticky="ew")
-        ttk.Button(action_button_frame, text="Limpar Campos", command=self.clear_inputs, style="TButton").grid(row=0, column=1, padx=8, sticky="ew")
-        ttk.Button(action_button_frame, text="Carregar Dia", command=self.load_current_date_data, style="TButton").grid(row=0, column=2, padx=8, sticky="ew")
-        ttk.Button(action_button_frame, text="Sair", command=self.app_instance.ask_quit, style="Exit.TButton").grid(row=0, column=3, padx=8, sticky="ew")
+        self.undo_button = ttk.Button(action_button_frame, text="Desfazer", command=self.undo_day, style="TButton")
+        self.undo_button.grid(row=0, column=1, padx=8, sticky="ew")
+        ToolTip(self.undo_button, "Desfaz a última gravação deste dia feita nesta sessão")
+        self.redo_button = ttk.Button(action_button_frame, text="Refazer", command=self.redo_day, style="TButton")
+        self.redo_button.grid(row=0, column=2, padx=8, sticky="ew")
+        ToolTip(self.redo_button, "Refaz a última gravação desfeita deste dia")
+        ttk.Button(action_button_frame, text="Limpar Campos", command=self.clear_inputs, style="TButton").grid(row=0, column=3, padx=8, sticky="ew")
+        ttk.Button(action_button_frame, text="Carregar Dia", command=self.load_current_date_data, style="TButton").grid(row=0, column=4, padx=8, sticky="ew")
+        ttk.Button(action_button_frame, text="Sair", command=self.app_instance.ask_quit, style="Exit.TButton").grid(row=0, column=5, padx=8, sticky="ew")
+        self.undo_button.state(["disabled"])
+        self.redo_button.state(["disabled"])
 
 
     def _on_canvas_configure(self, event):
         canvas_width = event.width
         self.meals_canvas.itemconfig(self.meals_canvas_window, width=canvas_width)
-        self.meals_canvas.configure(scrollregion=self.meals_canvas.bbox("all"))
+        self._schedule_layout()
 
     def _on_mousewheel(self, event):
         if event.delta:
@@ -269,133 +348,197 @@ class DailyEntryTabUI(ttk.Frame):
         next_day_obj = current_date_obj + dt.timedelta(days=1)
         self.app_instance.load_day_data_with_confirmation(next_day_obj.isoformat())
 
-    def _on_data_change(self, *args):
-        self.data_modified = True
+    @staticmethod
+    def _set_var(var: StringVar, text: str):
+        # Evita a escrita (e o trace) quando o valor já é o mesmo
+        if var.get() != text:
+            var.set(text)
+
+    @contextmanager
+    def _bulk_load(self):
+        """
+        Preenche os campos sem rastrear alterações; ao final, os valores
+        exibidos passam a ser a referência (snapshot) para detectar edições.
+        """
+        self._loading = True
+        try:
+            yield
+        finally:
+            self._loading = False
+            self._take_snapshot()
+
+    def _take_snapshot(self):
+        self._snapshot = {GLARGINA_FIELD: self.glargina_var.get().strip()}
+        for meal_name, vars_ in self.entries.items():
+            for key, var in vars_.items():
+                self._snapshot[(meal_name, key)] = var.get().strip()
+        self._clear_dirty_fields()
+        self._removed_meals.clear()
+        self.data_modified = False
+
+    def _on_field_change(self, row: MealEntryRow | None, key: str):
+        if self._loading:
+            return
+        if row is None:
+            field, var, widget = GLARGINA_FIELD, self.glargina_var, self.glargina_entry
+        elif row.meal_name is None:
+            return # Linha no pool
+        else:
+            field, var, widget = (row.meal_name, key), row.vars[key], row.entry_widgets[key]
+
+        is_dirty = var.get().strip() != self._snapshot.get(field, "")
+        if is_dirty and field not in self._dirty_fields:
+            self._dirty_fields[field] = widget
+            widget.configure(style="DirtyField.TEntry")
+        elif not is_dirty and field in self._dirty_fields:
+            del self._dirty_fields[field]
+            widget.configure(style="TEntry")
+
+    def _clear_dirty_fields(self, meal_name: str | None = None):
+        """Remove o destaque dos campos alterados (de uma refeição ou de todas)."""
+        for field in [f for f in self._dirty_fields if meal_name is None or f[0] == meal_name]:
+            self._dirty_fields.pop(field).configure(style="TEntry")
 
     def get_date_iso(self):
         """Retorna a data ISO selecionada no DateEntry desta aba."""
         return self.date_entry.get_date().isoformat()
 
     def get_data_modified_status(self) -> bool:
-        return self.data_modified
+        return self.data_modified or bool(self._dirty_fields)
 
     def set_data_modified_status(self, status: bool):
+        if not status:
+            # Descartar: o que está na tela deixa de contar como alteração
+            self._take_snapshot()
         self.data_modified = status
 
+    def _fill_meal_vars(self, meal_vars: dict, entry: MealEntry):
+        for key, var in meal_vars.items():
+            value = getattr(entry, key)
+            if key in NUMERIC_FIELD_KEYS:
+                self._set_var(var, f"{value:.1f}" if value is not None else "")
+            elif key == "observations":
+                self._set_var(var, value if value is not None else "")
+
+    def _mark_meal_removed(self, meal_name: str):
+        """Registra a remoção de um lanche extra que tinha dados salvos (precisa ser apagado ao salvar)."""
+        if any(self._snapshot.get((meal_name, key)) for _, key in FIELDS):
+            self._removed_meals.add(meal_name)
+            self.data_modified = True
+
+    @timed("ui")
     def load_day_data(self, date_str_iso: str):
         """Carrega os dados para a data especificada na UI do registro diário."""
-        self._reset_daily_entry_ui()
-
         try:
-            self.date_entry.set_date(dt.date.fromisoformat(date_str_iso))
+            date_obj = dt.date.fromisoformat(date_str_iso)
         except ValueError:
             messagebox.showerror("Erro de Data", f"Não foi possível definir a data na UI: {date_str_iso}")
             return
 
-        glargina_dose, meal_data = self.service.get_daily_data(date_str_iso)
-        self.glargina_var.set(f"{glargina_dose:.1f}" if glargina_dose is not None else "")
-
-        for meal_name in FIXED_MEALS:
-            data = meal_data.get(meal_name, {})
-            if meal_name in self.entries:
-                for key, var in self.entries[meal_name].items():
-                    value = data.get(key)
-                    if key in ["carbs", "glicemia", "lispro", "bolus"]:
-                        var.set(f"{value:.1f}" if value is not None else "")
-                    elif key == "observations":
-                        var.set(value if value is not None else "")
+        record = self.service.get_daily_data(date_str_iso)
 
+        with self._bulk_load():
+            for meal_name in list(self.dynamic_meal_rows.keys()):
+                self._release_dynamic_meal_row(meal_name)
 
-        max_dynamic_counter = 0
-        for meal_name, data in meal_data.items():
-            if meal_name.startswith(DYNAMIC_MEAL_PREFIX):
-                try:
-                    num = int(meal_name.replace(DYNAMIC_MEAL_PREFIX, "").strip())
-                    if num > max_dynamic_counter:
-                        max_dynamic_counter = num
-                except ValueError:
-                    pass
-
-                self._create_single_meal_entry_row(meal_name, dynamic_removable=True)
+            self.date_entry.set_date(date_obj)
+            self._set_var(self.glargina_var, f"{record.glargina:.1f}" if record.glargina is not None else "")
 
+            for meal_name in FIXED_MEALS:
                 if meal_name in self.entries:
-                    for key, var in self.entries[meal_name].items():
-                        value = data.get(key)
-                        if key in ["carbs", "glicemia", "lispro", "bolus"]:
-                            var.set(f"{value:.1f}" if value is not None else "")
-                        elif key == "observations":
-                            var.set(value if value is not None else "")
-        self.dynamic_meal_counter = max_dynamic_counter + 1
+                    self._fill_meal_vars(self.entries[meal_name], record.meal(meal_name))
+
+            max_dynamic_counter = 0
+            for meal_name, entry in record.meals.items():
+                if meal_name.startswith(DYNAMIC_MEAL_PREFIX):
+                    try:
+                        num = int(meal_name.replace(DYNAMIC_MEAL_PREFIX, "").strip())
+                        if num > max_dynamic_counter:
+                            max_dynamic_counter = num
+                    except ValueError:
+                        pass
+
+                    self._create_single_meal_entry_row(meal_name, dynamic_removable=True)
+
+                    if meal_name in self.entries:
+                        self._fill_meal_vars(self.entries[meal_name], entry)
+            self.dynamic_meal_counter = max_dynamic_counter + 1
+        self._update_undo_buttons(date_str_iso)
+
+    def _update_undo_buttons(self, date_str_iso: str):
+        can_undo, can_redo = self.service.get_undo_state(date_str_iso)
+        self.undo_button.state(["!disabled"] if can_undo else ["disabled"])
+        self.redo_button.state(["!disabled"] if can_redo else ["disabled"])
+
+    def _apply_undo_redo(self, action):
+        """Executa action (desfazer ou refazer) no dia exibido e recarrega a tela."""
+        date_str_iso = self.get_date_iso()
+        if self.get_data_modified_status() and not messagebox.askyesno(
+            "Alterações não salvas", "As alterações não salvas deste dia serão descartadas. Deseja continuar?"
+        ):
+            return
+        success, msg = action(date_str_iso)
+        if not success:
+            messagebox.showinfo("Nada a fazer", msg)
+        self.load_day_data(date_str_iso)
 
-        self.meals_sections_container.update_idletasks()
-        self.meals_canvas.config(scrollregion=self.meals_canvas.bbox("all"))
+    def undo_day(self):
+        self._apply_undo_redo(self.service.undo_day_changes)
 
-        self.data_modified = False
+    def redo_day(self):
+        self._apply_undo_redo(self.service.redo_day_changes)
 
+    @timed("ui")
     def save_day(self):
+        """Valida e grava apenas os campos alterados desde o carregamento do dia."""
         date_str_iso = self.date_entry.get_date().isoformat()
 
-        glargina_text = self.glargina_var.get().strip()
-        is_valid_glargina, glargina_value, error_msg = self.service.validate_numeric_input(glargina_text, "glargina")
-        if not is_valid_glargina:
-            messagebox.showerror("Erro de Entrada", error_msg)
+        if not self.get_data_modified_status():
+            messagebox.showinfo("Salvo", "Nenhuma alteração para salvar.")
             return
 
-        meal_entries_data = {}
-        for meal_name, vars_ in self.entries.items():
-            meal_values = {}
-            has_data = False
-            for key, var in vars_.items():
-                text = var.get().strip()
-                if key in ["carbs", "glicemia", "lispro", "bolus"]:
+        glargina_value = None
+        if GLARGINA_FIELD in self._dirty_fields:
+            glargina_text = self.glargina_var.get().strip()
+            is_valid_glargina, glargina_value, error_msg = self.service.validate_numeric_input(glargina_text, "glargina")
+            if not is_valid_glargina:
+                messagebox.showerror("Erro de Entrada", error_msg)
+                return
+            glargina_value = glargina_value or 0.0
+
+        changed_fields = {}
+        for row in self.meal_rows:
+            meal_name = row.meal_name
+            for _, key in FIELDS:
+                if (meal_name, key) not in self._dirty_fields:
+                    continue
+                text = row.vars[key].get().strip()
+                if key in NUMERIC_FIELD_KEYS:
                     is_valid, value, error_msg = self.service.validate_numeric_input(text, key, meal_name)
                     if not is_valid:
                         messagebox.showerror("Erro de Entrada", error_msg)
                         return
-                    meal_values[key] = value
-                    if value is not None and value != "":
-                        has_data = True
-                elif key == "observations":
-                    meal_values[key] = text if text else None
-                    if text:
-                        has_data = True
-
-            if has_data:
-                meal_entries_data[meal_name] = meal_values
-
-        success, msg = self.service.save_daily_data(date_str_iso, glargina_value or 0.0, meal_entries_data)
+                else:
+                    value = text if text else None
+                changed_fields.setdefault(meal_name, {})[key] = value
+
+        success, msg = self.service.save_daily_changes(date_str_iso, glargina_value, changed_fields, sorted(self._removed_meals))
         if success:
             messagebox.showinfo("Salvo", msg)
-            self.data_modified = False
             self.load_day_data(date_str_iso)
         else:
             messagebox.showerror("Erro ao Salvar", msg)
 
     def clear_inputs(self):
-        self._reset_daily_entry_ui()
-        self.data_modified = False
-
-    def _reset_daily_entry_ui(self):
         """
-        Limpa todos os valores das entradas (fixas e dinâmicas)
-        e remove todos os frames de lanches extras dinâmicos da UI.
-        Mantém os frames das refeições fixas.
+        Limpa todos os valores das entradas e oculta as linhas de lanches extras.
+        A limpeza conta como alteração (campos destacados) até o dia ser salvo ou recarregado.
         """
-        for meal_name in FIXED_MEALS:
-            if meal_name in self.entries:
-                for var in self.entries[meal_name].values():
-                    var.set("")
-
-        for meal_name in list(self.dynamic_meal_frames.keys()):
-            if meal_name.startswith(DYNAMIC_MEAL_PREFIX):
-                frame_to_destroy = self.dynamic_meal_frames[meal_name]
-                frame_to_destroy.destroy()
-                del self.dynamic_meal_frames[meal_name]
-                if meal_name in self.entries:
-                    del self.entries[meal_name]
-
-        self.glargina_var.set("")
-        self.dynamic_meal_counter = 0
-        self._repack_meals_sections_container()
-        self.meals_canvas.config(scrollregion=self.meals_canvas.bbox("all"))
-        self.data_modified = False
\ No newline at end of file
+        for meal_name in list(self.dynamic_meal_rows.keys()):
+            self._release_dynamic_meal_row(meal_name)
+            self._mark_meal_removed(meal_name)
+
+        for vars_ in self.entries.values():
+            for var in vars_.values():
+                self._set_var(var, "")
+        self._set_var(self.glargina_var, "")
@@ -0,0 +1,212 @@
+# data_exporter.py
+
+import argparse
+import csv
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from constants import DB_FILE
+
+ENTRY_COLUMNS = ["date", "meal", "carbs", "glicemia", "lispro", "bolus", "observations"]
+NUMERIC_COLUMNS = ["carbs", "glicemia", "lispro", "bolus"]
+
+# Limites usados quando nenhum período é informado (--start/--end); viram
+# ordinais de dia (day_ordinals.to_day), iguais a MIN_DAY e MAX_DAY
+MIN_DATE_ISO = "0001-01-01"
+MAX_DATE_ISO = "9999-12-31"
+
+
+def _glargina_path(path: Path) -> Path:
+    """Arquivo irmão onde as doses de glargina são gravadas nos formatos tabulares."""
+    return path.with_name(f"{path.stem}_glargina{path.suffix}")
+
+
+class DataExporter:
+    """
+    Exporta registros em streaming: as linhas chegam por iteradores
+    (Database.iter_range / iter_glargina_range) e são gravadas sem montar
+    o período inteiro em memória.
+    """
+
+    FORMATS = ("csv", "npz", "parquet")
+
+    @staticmethod
+    def available_formats() -> list[str]:
+        formats = ["csv", "npz"]
+        try:
+            import pyarrow  # noqa: F401
+            formats.append("parquet")
+        except ImportError:
+            pass
+        return formats
+
+    @staticmethod
+    def export(fmt: str, filename: str, entries, glargina) -> int:
+        if fmt == "csv":
+            return DataExporter.export_csv(filename, entries, glargina)
+        if fmt == "npz":
+            return DataExporter.export_npz(filename, entries, glargina)
+        if fmt == "parquet":
+            return DataExporter.export_parquet(filename, entries, glargina)
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+
+    @staticmethod
+    def export_csv(filename: str, entries, glargina) -> int:
+        """Grava as refeições em CSV e as doses de glargina em <nome>_glargina.csv."""
+        path = Path(filename)
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(ENTRY_COLUMNS)
+            for row in entries:
+                writer.writerow(["" if v is None else v for v in row])
+                count += 1
+
+        with open(_glargina_path(path), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["date", "dose"])
+            for date_iso, dose in glargina:
+                writer.writerow([date_iso, "" if dose is None else dose])
+        return count
+
+    @staticmethod
+    def export_npz(filename: str, entries, glargina) -> int:
+        """
+        Grava um .npz colunar. Data e refeição são codificadas por dicionário
+        (arrays *_codes + *_dict), os campos numéricos usam NaN para ausentes
+        e as observações ficam em UTF-8 contíguo com offsets (estilo Arrow).
+
+        Cada coluna é despejada em um arquivo temporário durante a única passada
+        pelo cursor e depois copiada para o zip, mantendo a memória constante.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp = Path(tmp_dir)
+            spools = {}
+            specs = {
+                "date_codes": np.int32,
+                "meal_codes": np.int16,
+                **{key: np.float64 for key in NUMERIC_COLUMNS},
+                "observations_offsets": np.int64,
+                "observations_data": np.uint8,
+                "glargina_date_codes": np.int32,
+                "glargina_dose": np.float64,
+            }
+            for name in specs:
+                spools[name] = open(tmp / f"{name}.bin", "wb")
+
+            date_dict: dict[str, int] = {}
+            meal_dict: dict[str, int] = {}
+            count = 0
+            obs_offset = 0
+            try:
+                spools["observations_offsets"].write(np.int64(0).tobytes())
+                for date_iso, meal, carbs, glicemia, lispro, bolus, observations in entries:
+                    date_code = date_dict.setdefault(date_iso, len(date_dict))
+                    meal_code = meal_dict.setdefault(meal, len(meal_dict))
+                    spools["date_codes"].write(np.int32(date_code).tobytes())
+                    spools["meal_codes"].write(np.int16(meal_code).tobytes())
+                    for key, value in zip(NUMERIC_COLUMNS, (carbs, glicemia, lispro, bolus)):
+                        spools[key].write(np.float64(np.nan if value is None else value).tobytes())
+                    obs_bytes = observations.encode("utf-8") if observations else b""
+                    spools["observations_data"].write(obs_bytes)
+                    obs_offset += len(obs_bytes)
+                    spools["observations_offsets"].write(np.int64(obs_offset).tobytes())
+                    count += 1
+
+                glargina_count = 0
+                for date_iso, dose in glargina:
+                    date_code = date_dict.setdefault(date_iso, len(date_dict))
+                    spools["glargina_date_codes"].write(np.int32(date_code).tobytes())
+                    spools["glargina_dose"].write(np.float64(np.nan if dose is None else dose).tobytes())
+                    glargina_count += 1
+            finally:
+                for spool in spools.values():
+                    spool.close()
+
+            lengths = {name: count for name in specs}
+            lengths["observations_offsets"] = count + 1
+            lengths["observations_data"] = obs_offset
+            lengths["glargina_date_codes"] = glargina_count
+            lengths["glargina_dose"] = glargina_count
+
+            with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                for name, dtype in specs.items():
+                    with zf.open(f"{name}.npy", "w", force_zip64=True) as out, open(tmp / f"{name}.bin", "rb") as src:
+                        np.lib.format.write_array_header_1_0(out, {
+                            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                            "fortran_order": False,
+                            "shape": (lengths[name],),
+                        })
+                        shutil.copyfileobj(src, out)
+                for name, values in (("date_dict", date_dict), ("meal_dict", meal_dict)):
+                    with zf.open(f"{name}.npy", "w", force_zip64=True) as out:
+                        np.lib.format.write_array(out, np.array(list(values), dtype=str), allow_pickle=False)
+        return count
+
+    @staticmethod
+    def export_parquet(filename: str, entries, glargina, batch_size: int = 10000) -> int:
+        """Grava Parquet (requer pyarrow) em row groups de batch_size linhas."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("date", pa.string()),
+            ("meal", pa.string()),
+            *[(key, pa.float64()) for key in NUMERIC_COLUMNS],
+            ("observations", pa.string()),
+        ])
+        path = Path(filename)
+        count = 0
+        with pq.ParquetWriter(path, schema, use_dictionary=["date", "meal"], compression="zstd") as writer:
+            batch = []
+            for row in entries:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    writer.write_batch(pa.RecordBatch.from_arrays(
+                        [pa.array(col, type=field.type) for col, field in zip(zip(*batch), schema)], schema=schema))
+                    count += len(batch)
+                    batch = []
+            if batch:
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(zip(*batch), schema)], schema=schema))
+                count += len(batch)
+
+        glargina_rows = list(glargina)  # no máximo uma linha por dia
+        glargina_table = pa.table({
+            "date": pa.array([d for d, _ in glargina_rows], type=pa.string()),
+            "dose": pa.array([dose for _, dose in glargina_rows], type=pa.float64()),
+        })
+        pq.write_table(glargina_table, _glargina_path(path), use_dictionary=["date"], compression="zstd")
+        return count
+
+
+def main(argv=None):
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Exporta os registros do Carb Tracker.")
+    parser.add_argument("output", help="Arquivo de saída")
+    parser.add_argument("--format", choices=DataExporter.FORMATS, default="csv")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--start", default=MIN_DATE_ISO, help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument("--end", default=MAX_DATE_ISO, help="Data final (AAAA-MM-DD)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        count = DataExporter.export(
+            args.format,
+            args.output,
+            db.iter_range(args.start, args.end),
+            db.iter_glargina_range(args.start, args.end),
+        )
+    finally:
+        db.close()
+    print(f"{count} registros exportados para {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,126 +1,1311 @@
 # database.py
 
+import functools
+import itertools
+import re
 import sqlite3
+import uuid
+from contextlib import contextmanager
 from constants import DB_FILE
+from day_ordinals import day_to_iso_sql, iso_to_day_sql, to_day, to_iso
+from instrumentation import register_database, timed
+
+# Colunas do índice de somas de prefixo (daily_stats). Cada uma existe como valor
+# do dia e como acumulado (cum_*) desde o primeiro dia registrado.
+DAILY_STATS_COLUMNS = ("carbs", "lispro", "bolus", "glicemia_sum", "glicemia_count", "glargina_sum", "glargina_count")
+ENTRY_VALUE_COLUMNS = ("carbs", "glicemia", "lispro", "bolus", "observations")
+
+# Chave de ordenação do histórico por coluna: (expressões SQL, posições na linha de entries).
+# date e meal entram sempre como desempate, o que torna a chave única para a paginação por chave.
+# A data é ordenada pelo ordinal (coluna day da view entries), que usa o índice da tabela.
+# Valores ausentes ordenam como -1 (todos os campos numéricos são >= 0).
+HISTORY_SORT_KEYS = {
+    "date": (("day", "meal"), (0, 1)),
+    "meal": (("meal", "day"), (1, 0)),
+    "carbs": (("COALESCE(carbs, -1)", "day", "meal"), (2, 0, 1)),
+    "glicemia": (("COALESCE(glicemia, -1)", "day", "meal"), (3, 0, 1)),
+    "lispro": (("COALESCE(lispro, -1)", "day", "meal"), (4, 0, 1)),
+    "bolus": (("COALESCE(bolus, -1)", "day", "meal"), (5, 0, 1)),
+}
+
+SNIPPET_TOKENS = 12
+
+# As refeições ficam em uma tabela indexada pelo ordinal do dia (day INTEGER):
+# entry_rows no formato padrão ou entry_values no armazenamento compacto
+# (refeições pelo id da tabela meals e medidas em décimos INTEGER). Nos dois
+# casos entries é uma view com a data em ISO, então as leituras não dependem do formato.
+TENTHS_COLUMNS = ("carbs", "glicemia", "lispro", "bolus")
+MEAL_ID_SQL = "(SELECT id FROM meals WHERE name = {})"
+ENTRY_ROW_SQL = "meal, carbs, glicemia, lispro, bolus, observations"
+FTS_TRIGGERS = ("entries_fts_insert", "entries_fts_delete", "entries_fts_update")
+
+
+def tenths_sql(expression: str) -> str:
+    """Expressão SQL que codifica um valor em décimos inteiros (NULL continua NULL)."""
+    return f"CAST(round({expression} * 10) AS INTEGER)"
+
+
+def entry_storage_ddl(compact: bool) -> tuple:
+    """Comandos que criam a tabela de refeições do formato pedido e a view entries sobre ela."""
+    if compact:
+        table, meal_column, meal_type = "entry_values", "meal_id", "INTEGER NOT NULL REFERENCES meals (id)"
+        value_type, meal_value = "INTEGER", MEAL_ID_SQL.format("new.meal")
+        encoded = {c: tenths_sql(f"new.{c}") for c in TENTHS_COLUMNS}
+        decoded = {c: f"v.{c} / 10.0" for c in TENTHS_COLUMNS}
+        source, meal_name = "entry_values AS v JOIN meals AS m ON m.id = v.meal_id", "m.name"
+        register_meal = "INSERT OR IGNORE INTO meals (name) VALUES (new.meal);"
+    else:
+        table, meal_column, meal_type = "entry_rows", "meal", "TEXT NOT NULL"
+        value_type, meal_value = "REAL", "new.meal"
+        encoded = {c: f"new.{c}" for c in TENTHS_COLUMNS}
+        decoded = {c: f"v.{c}" for c in TENTHS_COLUMNS}
+        source, meal_name = "entry_rows AS v", "v.meal"
+        register_meal = ""
+
+    statements = []
+    if compact:
+        statements.append(
+            """
+            CREATE TABLE IF NOT EXISTS meals (
+              id INTEGER PRIMARY KEY,
+              name TEXT NOT NULL UNIQUE
+            )
+            """
+        )
+    statements += [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+          day INTEGER NOT NULL,
+          {meal_column} {meal_type},
+          {", ".join(f"{c} {value_type}" for c in TENTHS_COLUMNS)},
+          observations TEXT,
+          PRIMARY KEY (day, {meal_column})
+        )
+        """,
+        # Filtro e ordenação por refeição no histórico
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_meal_day ON {table} ({meal_column}, day)",
+        # day e rowid por último: INSERT INTO entries (colunas...) continua valendo, e o índice FTS usa o rowid da tabela
+        f"""
+        CREATE VIEW IF NOT EXISTS entries AS
+        SELECT {day_to_iso_sql("v.day")} AS date, {meal_name} AS meal,
+               {", ".join(f"{decoded[c]} AS {c}" for c in TENTHS_COLUMNS)},
+               v.observations AS observations, v.day AS day, v.rowid AS rowid
+        FROM {source}
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS entries_view_insert INSTEAD OF INSERT ON entries BEGIN
+          {register_meal}
+          INSERT INTO {table} (day, {meal_column}, {", ".join(TENTHS_COLUMNS)}, observations)
+          VALUES ({iso_to_day_sql("new.date")}, {meal_value},
+                  {", ".join(encoded[c] for c in TENTHS_COLUMNS)}, new.observations);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS entries_view_update INSTEAD OF UPDATE ON entries BEGIN
+          {register_meal}
+          UPDATE {table}
+          SET day = {iso_to_day_sql("new.date")}, {meal_column} = {meal_value},
+              {", ".join(f"{c} = {encoded[c]}" for c in TENTHS_COLUMNS)},
+              observations = new.observations
+          WHERE rowid = old.rowid;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS entries_view_delete INSTEAD OF DELETE ON entries BEGIN
+          DELETE FROM {table} WHERE rowid = old.rowid;
+        END
+        """,
+    ]
+    return tuple(statements)
+
+
+def fts_query(text: str) -> str | None:
+    """
+    Converte o texto digitado em uma consulta FTS5 segura: cada palavra vira
+    um termo entre aspas com busca por prefixo, e todas precisam aparecer.
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+# Comandos compilados guardados por conexão (o padrão do sqlite3 é 128): cabem
+# todos os do registro abaixo, nos dois formatos, e os montados pelos filtros do histórico.
+STATEMENT_CACHE_SIZE = 256
+DAILY_STATS_CUM_SQL = ", ".join(f"cum_{c}" for c in DAILY_STATS_COLUMNS)
+
+
+@functools.lru_cache(maxsize=None)
+def entry_upsert_sql(compact: bool, columns: tuple) -> str:
+    """
+    INSERT ... ON CONFLICT de uma refeição gravando só columns, com
+    parâmetros posicionais (day, meal, *valores). Montado uma vez por formato
+    e conjunto de colunas: o texto idêntico reaproveita o comando compilado.
+    """
+    if compact:
+        table, meal_column, meal_sql = "entry_values", "meal_id", MEAL_ID_SQL.format("?")
+        values_sql = [tenths_sql("?") if c in TENTHS_COLUMNS else "?" for c in columns]
+    else:
+        table, meal_column, meal_sql = "entry_rows", "meal", "?"
+        values_sql = ["?"] * len(columns)
+    return f"""
+        INSERT INTO {table} (day, {meal_column}, {', '.join(columns)})
+        VALUES (?, {meal_sql}, {', '.join(values_sql)})
+        ON CONFLICT(day, {meal_column}) DO UPDATE SET
+          {', '.join(f"{c}=excluded.{c}" for c in columns)}
+        """
+
+
+@functools.lru_cache(maxsize=None)
+def prepared_queries(compact: bool) -> dict[str, str]:
+    """
+    Registro dos comandos dos caminhos quentes (leitura e gravação de um dia,
+    índice de somas de prefixo, versões de sincronização), montados uma única
+    vez por formato de armazenamento e sempre com parâmetros posicionais.
+    """
+    table, meal_column = ("entry_values", "meal_id") if compact else ("entry_rows", "meal")
+    meal_sql = MEAL_ID_SQL.format("?") if compact else "?"
+    queries = {
+        "insert_meal": "INSERT OR IGNORE INTO meals (name) VALUES (?)",
+        "upsert_entry": entry_upsert_sql(compact, ENTRY_VALUE_COLUMNS),
+        "delete_entry": f"DELETE FROM {table} WHERE day = ? AND {meal_column} = {meal_sql}",
+        "delete_empty_entry": f"""
+            DELETE FROM {table}
+            WHERE day = ? AND {meal_column} = {meal_sql}
+              AND carbs IS NULL AND glicemia IS NULL AND lispro IS NULL AND bolus IS NULL
+              AND (observations IS NULL OR TRIM(observations) = '')
+            """,
+        "fetch_entry": """
+            SELECT carbs, glicemia, lispro, bolus, observations
+            FROM entries
+            WHERE day = ? AND meal = ?
+            """,
+        "upsert_glargina": """
+            INSERT INTO glargina_days (day, dose)
+            VALUES (?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+              dose=excluded.dose
+            """,
+        "fetch_glargina_dose": "SELECT dose FROM glargina_days WHERE day = ?",
+        "day_stats": """
+            SELECT COALESCE(SUM(carbs), 0), COALESCE(SUM(lispro), 0), COALESCE(SUM(bolus), 0),
+                   COALESCE(SUM(glicemia), 0), COUNT(glicemia)
+            FROM entries
+            WHERE day = ?
+            """,
+        "daily_stats_row": f"SELECT {', '.join(DAILY_STATS_COLUMNS)} FROM daily_stats WHERE day = ?",
+        "prefix_before": f"SELECT {DAILY_STATS_CUM_SQL} FROM daily_stats WHERE day < ? ORDER BY day DESC LIMIT 1",
+        "prefix_through": f"SELECT {DAILY_STATS_CUM_SQL} FROM daily_stats WHERE day <= ? ORDER BY day DESC LIMIT 1",
+        "replace_daily_stats": f"""
+            INSERT OR REPLACE INTO daily_stats
+              (day, {', '.join(DAILY_STATS_COLUMNS)}, {DAILY_STATS_CUM_SQL})
+            VALUES ({', '.join("?" * (1 + 2 * len(DAILY_STATS_COLUMNS)))})
+            """,
+        "delete_daily_stats": "DELETE FROM daily_stats WHERE day = ?",
+        "propagate_daily_stats": f"""
+            UPDATE daily_stats
+            SET {', '.join(f"cum_{c} = cum_{c} + ?" for c in DAILY_STATS_COLUMNS)}
+            WHERE day > ?
+            """,
+        "sync_meta": "SELECT value FROM sync_meta WHERE key = ?",
+        "update_sync_meta": "UPDATE sync_meta SET value = ? WHERE key = ?",
+        "upsert_sync_row": """
+            INSERT INTO sync_rows (tbl, day, meal, version, device, deleted, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(tbl, day, meal) DO UPDATE SET
+              version=excluded.version, device=excluded.device, deleted=excluded.deleted, seq=excluded.seq
+            """,
+    }
+    for day_column, day_sql in (("day", "day"), ("date", "date")):
+        queries[f"entries_by_{day_column}"] = f"""
+            SELECT {day_sql}, {ENTRY_ROW_SQL}
+            FROM entries
+            WHERE day BETWEEN ? AND ?
+            ORDER BY day, meal
+            """
+    for day_column, day_sql in (("day", "day"), ("date", day_to_iso_sql("day"))):
+        queries[f"glargina_by_{day_column}"] = f"""
+            SELECT {day_sql}, dose
+            FROM glargina_days
+            WHERE day BETWEEN ? AND ?
+            ORDER BY day
+            """
+    return queries
+
 
 class Database:
-    def __init__(self, db_path: str = DB_FILE):
-        self.conn = sqlite3.connect(db_path)
-        self.create_tables()
+    def __init__(self, db_path: str = DB_FILE, compact: bool = False):
+        """
+        compact=True cria um banco novo já no armazenamento compacto; bancos
+        existentes mantêm o formato em que estão (ver migrate_to_compact).
+        """
+        self._attach(sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE))
+        self.create_tables(compact)
+
+    _connection_ids = itertools.count(1)
+
+    def _attach(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.connection_id = next(Database._connection_ids)
+        self.has_fts = False
+        self.compact = False
+        self._transaction_depth = 0
+        register_database(self)
+
+    @property
+    def compact(self) -> bool:
+        return self._compact
+
+    @compact.setter
+    def compact(self, value: bool):
+        # O registro de comandos acompanha o formato de armazenamento
+        self._compact = value
+        self._queries = prepared_queries(value)
+
+    @classmethod
+    @timed("db", "Database.snapshot_of")
+    def snapshot_of(cls, source: "Database") -> "Database":
+        """
+        Cópia em memória de source feita com a API de backup do SQLite, para
+        leituras que não devem disputar a conexão do arquivo (relatórios). A
+        cópia não acompanha gravações posteriores; pode ser lida de outra thread.
+        """
+        conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        source.conn.backup(conn)
+        snapshot = cls.__new__(cls)
+        snapshot._attach(conn)
+        snapshot.has_fts = source.has_fts
+        snapshot.compact = source.compact
+        return snapshot
+
+    @property
+    def data_version(self) -> tuple[int, int]:
+        """
+        Muda a cada linha gravada por esta conexão e a cada reabertura do
+        banco (backup/restauração): serve para saber se uma cópia ou um
+        resultado guardado ficou desatualizado.
+        """
+        return self.connection_id, self.conn.total_changes
+
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupa várias gravações em uma única transação: dentro do bloco, os
+        commits dos métodos de gravação ficam para o final, e um erro desfaz tudo.
+        """
+        if self._transaction_depth == 0 and not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        self._transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self.conn.commit()
 
-    def create_tables(self):
+    def _commit(self):
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
+    def _table_exists(self, name: str) -> bool:
+        return self.conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?)", (name,)
+        ).fetchone()[0] == 1
+
+    def _table_columns(self, name: str) -> set:
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({name})")}
+
+    def _create_entry_storage(self, compact: bool):
+        # Um comando por vez (e não executescript, que faria COMMIT): pode rodar dentro da transação das migrações
+        for statement in entry_storage_ddl(compact):
+            self.conn.execute(statement)
+
+    def _create_glargina_table(self):
         self.conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS entries (
-              date TEXT NOT NULL,
-              meal TEXT NOT NULL,
-              carbs REAL,
-              glicemia REAL,
-              lispro REAL,
-              bolus REAL,
-              observations TEXT,
-              PRIMARY KEY (date, meal)
+            CREATE TABLE IF NOT EXISTS glargina_days (
+              day INTEGER PRIMARY KEY,
+              dose REAL
             )
             """
         )
-        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON entries (date);")
+
+    def create_tables(self, compact: bool = False):
+        self._migrate_text_dates()
+        self.compact = self._table_exists("entry_values") or (compact and not self._table_exists("entry_rows"))
+        self._create_entry_storage(self.compact)
+        self._create_glargina_table()
 
         self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS daily_stats (
+              day INTEGER PRIMARY KEY,
+              {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in DAILY_STATS_COLUMNS)},
+              {", ".join(f"cum_{c} REAL NOT NULL DEFAULT 0" for c in DAILY_STATS_COLUMNS)}
+            )
             """
-            CREATE TABLE IF NOT EXISTS glargina_doses (
-              date TEXT PRIMARY KEY NOT NULL,
-              dose REAL
+        )
+
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dosing_profiles (
+              meal TEXT PRIMARY KEY NOT NULL,
+              carb_ratio REAL,
+              fsi REAL,
+              glicemia_alvo REAL,
+              source TEXT NOT NULL DEFAULT 'manual',
+              samples INTEGER,
+              updated_at TEXT
             )
             """
         )
-        self.conn.commit()
 
-    def upsert_entry(self, date: str, meal: str, values: dict):
+        # Log de alterações (somente acréscimo): cada gravação de um dia vira um
+        # changeset com as linhas (refeição, campo, valor antigo, valor novo).
+        # meal NULL = campo do dia (glargina).
         self.conn.execute(
             """
-            INSERT INTO entries (date, meal, carbs, glicemia, lispro, bolus, observations)
-            VALUES (:date, :meal, :carbs, :glicemia, :lispro, :bolus, :observations)
-            ON CONFLICT(date, meal) DO UPDATE SET
-              carbs=excluded.carbs,
-              glicemia=excluded.glicemia,
-              lispro=excluded.lispro,
-              bolus=excluded.bolus,
-              observations=excluded.observations
-            """,
-            {"date": date, "meal": meal, **values},
+            CREATE TABLE IF NOT EXISTS changesets (
+              id INTEGER PRIMARY KEY,
+              day INTEGER NOT NULL,
+              kind TEXT NOT NULL,
+              author TEXT,
+              created_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_changesets_day ON changesets (day, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_changesets_created_at ON changesets (created_at)")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_log (
+              changeset_id INTEGER NOT NULL REFERENCES changesets (id),
+              meal TEXT,
+              field TEXT NOT NULL,
+              old_value,
+              new_value
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_changeset ON change_log (changeset_id)")
+
+        # Sincronização entre bancos (ver sync_engine): versão de cada linha
+        # (relógio de Lamport + dispositivo que a gravou), lápides das linhas
+        # apagadas e seq, a ordem local de alteração usada nas exportações.
+        # tbl é "entries" (meal = refeição) ou "glargina" (meal = '').
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value)")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_rows (
+              tbl TEXT NOT NULL,
+              day INTEGER NOT NULL,
+              meal TEXT NOT NULL,
+              version INTEGER NOT NULL,
+              device TEXT NOT NULL,
+              deleted INTEGER NOT NULL DEFAULT 0,
+              seq INTEGER NOT NULL,
+              PRIMARY KEY (tbl, day, meal)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_rows_seq ON sync_rows (seq)")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_peers (
+              device TEXT PRIMARY KEY,
+              acked_seq INTEGER NOT NULL DEFAULT 0,
+              received_seq INTEGER NOT NULL DEFAULT 0,
+              last_sync TEXT
+            )
+            """
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO sync_meta (key, value) VALUES (?, ?)",
+            [("device_id", uuid.uuid4().hex), ("clock", 0), ("seq", 0)],
         )
         self.conn.commit()
 
-    def delete_entry(self, date: str, meal: str):
+        self._create_observations_fts()
+
+        # Bancos criados antes do índice (ou restaurados de backups antigos) são indexados na abertura
+        has_index = self.conn.execute("SELECT EXISTS(SELECT 1 FROM daily_stats)").fetchone()[0]
+        has_data = self.conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM entries) OR EXISTS(SELECT 1 FROM glargina_days)"
+        ).fetchone()[0]
+        if has_data and not has_index:
+            self.rebuild_daily_stats()
+
+    @timed("db")
+    def _migrate_text_dates(self):
         """
-        Deleta uma entrada de refeição específica para uma dada data.
-        Usado para remover lanches extras que foram esvaziados/removidos da UI.
+        Bancos (e backups) anteriores aos ordinais guardam as datas como TEXT
+        ISO: entries como tabela, entry_values.date, glargina_doses e
+        daily_stats.date. Converte tudo para day INTEGER em uma única
+        transação, preservando o rowid das refeições. daily_stats é só
+        descartado: o índice é reconstruído em create_tables.
         """
+        text_entries = self._table_exists("entries")  # No formato atual, entries é uma view
+        text_compact = self._table_exists("entry_values") and "date" in self._table_columns("entry_values")
+        text_glargina = self._table_exists("glargina_doses")
+        text_stats = self._table_exists("daily_stats") and "date" in self._table_columns("daily_stats")
+        if not (text_entries or text_compact or text_glargina or text_stats):
+            return
+        try:
+            self.conn.execute("BEGIN")
+            if text_entries or text_compact:
+                self._drop_observations_fts()
+            if text_entries:
+                self._copy_entries_by_day("entries", compact=False)
+            if text_compact:
+                self.conn.execute("DROP VIEW IF EXISTS entries")
+                self._copy_entries_by_day("entry_values", compact=True)
+            if text_glargina:
+                self._create_glargina_table()
+                self.conn.execute(
+                    f"INSERT INTO glargina_days (day, dose) SELECT {iso_to_day_sql('date')}, dose FROM glargina_doses"
+                )
+                self.conn.execute("DROP TABLE glargina_doses")
+            if text_stats:
+                self.conn.execute("DROP TABLE daily_stats")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _copy_entries_by_day(self, source: str, compact: bool):
+        """Recria a tabela de refeições source (com date TEXT) no formato indexado por day."""
+        table, meal_column = ("entry_values", "meal_id") if compact else ("entry_rows", "meal")
+        self.conn.execute(f"ALTER TABLE {source} RENAME TO {source}_text")
+        self._create_entry_storage(compact)
         self.conn.execute(
+            f"""
+            INSERT INTO {table} (rowid, day, {meal_column}, {", ".join(TENTHS_COLUMNS)}, observations)
+            SELECT rowid, {iso_to_day_sql("date")}, {meal_column}, {", ".join(TENTHS_COLUMNS)}, observations
+            FROM {source}_text
             """
-            DELETE FROM entries
-            WHERE date = ? AND meal = ?
-            """,
-            (date, meal),
         )
-        self.conn.commit()
+        self.conn.execute(f"DROP TABLE {source}_text")
 
-    def upsert_glargina_dose(self, date: str, dose: float):
-        self.conn.execute(
+    def _drop_observations_fts(self):
+        for trigger in FTS_TRIGGERS:
+            self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        self.conn.execute("DROP TABLE IF EXISTS entries_fts")
+        self.has_fts = False
+
+    def _create_observations_fts(self):
+        """
+        Índice de texto completo (FTS5) sobre as observações, com conteúdo
+        externo (entry_rows ou entry_values, com o mesmo rowid exposto pela
+        view entries) mantido por triggers. Sem FTS5 no SQLite, as buscas
+        caem para LIKE.
+        """
+        content_table = self._entry_table()
+        existed = self.conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE name = 'entries_fts')"
+        ).fetchone()[0]
+        try:
+            self.conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                  observations,
+                  content='{content_table}',
+                  content_rowid='rowid',
+                  tokenize='unicode61 remove_diacritics 2'
+                )
+                """
+            )
+        except sqlite3.OperationalError:
+            return
+        self.conn.executescript(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON {content_table}
+            WHEN new.observations IS NOT NULL BEGIN
+              INSERT INTO entries_fts (rowid, observations) VALUES (new.rowid, new.observations);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON {content_table}
+            WHEN old.observations IS NOT NULL BEGIN
+              INSERT INTO entries_fts (entries_fts, rowid, observations) VALUES ('delete', old.rowid, old.observations);
+            END;
+            -- Um único trigger garante a ordem: remove o texto antigo antes de indexar o novo
+            CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE OF observations ON {content_table} BEGIN
+              INSERT INTO entries_fts (entries_fts, rowid, observations)
+                SELECT 'delete', old.rowid, old.observations WHERE old.observations IS NOT NULL;
+              INSERT INTO entries_fts (rowid, observations)
+                SELECT new.rowid, new.observations WHERE new.observations IS NOT NULL;
+            END;
             """
-            INSERT INTO glargina_doses (date, dose)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET
-              dose=excluded.dose
-            """,
-            (date, dose),
         )
+        if not existed:
+            # Bancos antigos (ou backups restaurados): indexa as observações já existentes
+            self.conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
         self.conn.commit()
+        self.has_fts = True
 
-    def fetch_entry(self, date: str, meal: str):
-        cur = self.conn.execute(
-            """
-            SELECT carbs, glicemia, lispro, bolus, observations
+    @timed("db")
+    def search_observations(self, text: str, limit: int = 200) -> list:
+        """
+        Refeições cujas observações contêm todas as palavras de text (por
+        prefixo, sem diferenciar acentos). Retorna (date, meal, trecho), com os
+        termos encontrados entre colchetes, da data mais recente para a mais antiga.
+        """
+        query = fts_query(text)
+        if query is None:
+            return []
+        if not self.has_fts:
+            return self.search_observations_like(text, limit)
+        return self.conn.execute(
+            f"""
+            SELECT e.date, e.meal, snippet(entries_fts, 0, '[', ']', '…', {SNIPPET_TOKENS})
+            FROM entries_fts
+            JOIN entries AS e ON e.rowid = entries_fts.rowid
+            WHERE entries_fts MATCH ?
+            ORDER BY e.day DESC, e.meal
+            LIMIT ?
+            """,
+            (query, limit),
+        ).fetchall()
+
+    @timed("db")
+    def search_observations_like(self, text: str, limit: int = 200) -> list:
+        """Mesma busca por varredura com LIKE (sem FTS5); o trecho é a observação inteira."""
+        terms = re.findall(r"\w+", text or "")
+        if not terms:
+            return []
+        return self.conn.execute(
+            f"""
+            SELECT date, meal, observations
             FROM entries
-            WHERE date = ? AND meal = ?
+            WHERE {" AND ".join("observations LIKE ?" for _ in terms)}
+            ORDER BY day DESC, meal
+            LIMIT ?
             """,
-            (date, meal),
+            (*(f"%{term}%" for term in terms), limit),
+        ).fetchall()
+
+    def _entry_table(self) -> str:
+        """Tabela em que as linhas de entries são gravadas: entry_rows, ou entry_values no armazenamento compacto."""
+        return "entry_values" if self.compact else "entry_rows"
+
+    @timed("db")
+    def upsert_entry(self, day: int, meal: str, values: dict):
+        if self.compact:
+            self.conn.execute(self._queries["insert_meal"], (meal,))
+        self.conn.execute(self._queries["upsert_entry"], (day, meal, *(values[c] for c in ENTRY_VALUE_COLUMNS)))
+        self._commit()
+
+    @timed("db")
+    def upsert_entries(self, rows: list):
+        """Versão em lote de upsert_entry: rows = [(day, meal, carbs, glicemia, lispro, bolus, observations)]."""
+        if not rows:
+            return
+        if self.compact:
+            # Um INSERT OR IGNORE por nome distinto, não por linha
+            self.conn.executemany(self._queries["insert_meal"], [(meal,) for meal in dict.fromkeys(row[1] for row in rows)])
+        self.conn.executemany(self._queries["upsert_entry"], rows)
+        self._commit()
+
+    @timed("db")
+    def update_entry_fields(self, day: int, meal: str, values: dict):
+        """
+        Grava apenas as colunas presentes em values (as demais ficam como estão).
+        Se a refeição ficar sem nenhum dado, a linha é removida.
+        """
+        columns = tuple(c for c in ENTRY_VALUE_COLUMNS if c in values)
+        if not columns:
+            return
+        if self.compact:
+            self.conn.execute(self._queries["insert_meal"], (meal,))
+        self.conn.execute(entry_upsert_sql(self.compact, columns), (day, meal, *(values[c] for c in columns)))
+        self.conn.execute(self._queries["delete_empty_entry"], (day, meal))
+        self._commit()
+
+    @timed("db")
+    def delete_entry(self, day: int, meal: str):
+        """
+        Deleta uma entrada de refeição específica para um dado dia.
+        Usado para remover lanches extras que foram esvaziados/removidos da UI.
+        """
+        self.conn.execute(self._queries["delete_entry"], (day, meal))
+        self._commit()
+
+    @timed("db")
+    def delete_entries(self, keys: list):
+        """Versão em lote de delete_entry: keys = [(day, meal)]."""
+        if not keys:
+            return
+        self.conn.executemany(self._queries["delete_entry"], keys)
+        self._commit()
+
+    @timed("db")
+    def migrate_to_compact(self) -> int:
+        """
+        Converte o banco para o armazenamento compacto (refeições por id e
+        medidas em décimos inteiros, arredondadas a uma casa decimal) em uma
+        única transação, refaz o índice FTS e executa VACUUM para devolver o
+        espaço ao sistema. Retorna o número de refeições convertidas (0 se o
+        banco já for compacto).
+        """
+        if self.compact:
+            return 0
+        try:
+            self.conn.execute("BEGIN")
+            self._drop_observations_fts()
+            self.conn.execute("DROP VIEW entries")
+            self._create_entry_storage(compact=True)
+            self.conn.execute("INSERT INTO meals (name) SELECT DISTINCT meal FROM entry_rows ORDER BY meal")
+            # O rowid é preservado: o índice FTS recriado aponta para as mesmas linhas
+            count = self.conn.execute(
+                f"""
+                INSERT INTO entry_values (rowid, day, meal_id, {", ".join(TENTHS_COLUMNS)}, observations)
+                SELECT e.rowid, e.day, m.id, {", ".join(tenths_sql(f"e.{c}") for c in TENTHS_COLUMNS)}, e.observations
+                FROM entry_rows AS e
+                JOIN meals AS m ON m.name = e.meal
+                """
+            ).rowcount
+            self.conn.execute("DROP TABLE entry_rows")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.compact = True
+        self._create_observations_fts()
+        self.conn.execute("VACUUM")
+        return count
+
+    @timed("db")
+    def upsert_glargina_dose(self, day: int, dose: float):
+        self.conn.execute(self._queries["upsert_glargina"], (day, dose))
+        self._commit()
+
+    @timed("db")
+    def upsert_glargina_doses(self, rows: list):
+        """Versão em lote de upsert_glargina_dose: rows = [(day, dose)]."""
+        if not rows:
+            return
+        self.conn.executemany(self._queries["upsert_glargina"], rows)
+        self._commit()
+
+    @timed("db")
+    def fetch_entry(self, day: int, meal: str):
+        return self.conn.execute(self._queries["fetch_entry"], (day, meal)).fetchone()
+
+    @timed("db")
+    def fetch_glargina_dose(self, day: int):
+        result = self.conn.execute(self._queries["fetch_glargina_dose"], (day,)).fetchone()
+        return result[0] if result else None
+
+    @staticmethod
+    def _iter_batches(cur, batch_size: int):
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+
+    def _entries_cursor(self, day_column: str, start_day: int, end_day: int):
+        """Refeições de [start_day, end_day] com o dia como ordinal (day_column="day") ou em ISO ("date")."""
+        return self.conn.execute(self._queries[f"entries_by_{day_column}"], (start_day, end_day))
+
+    def _glargina_cursor(self, day_column: str, start_day: int, end_day: int):
+        return self.conn.execute(self._queries[f"glargina_by_{day_column}"], (start_day, end_day))
+
+    @timed("db")
+    def fetch_days(self, start_day: int, end_day: int) -> list:
+        """Refeições de [start_day, end_day] com o dia como ordinal: (day, meal, carbs, glicemia, lispro, bolus, observations)."""
+        return self._entries_cursor("day", start_day, end_day).fetchall()
+
+    @timed("db")
+    def iter_days(self, start_day: int, end_day: int, batch_size: int = 500):
+        """Versão em streaming de fetch_days (lotes de fetchmany)."""
+        yield from self._iter_batches(self._entries_cursor("day", start_day, end_day), batch_size)
+
+    @timed("db")
+    def iter_glargina_days(self, start_day: int, end_day: int, batch_size: int = 500):
+        """Doses de glargina de [start_day, end_day] como (day, dose)."""
+        yield from self._iter_batches(self._glargina_cursor("day", start_day, end_day), batch_size)
+
+    @timed("db")
+    def iter_day_groups(self, start_day: int, end_day: int, batch_size: int = 500):
+        """
+        Dias de [start_day, end_day] com alguma refeição ou dose de glargina,
+        em ordem, como (day, dose, refeições) com refeições = [(meal, carbs,
+        glicemia, lispro, bolus, observations)]. Os cursores de entries e de
+        glargina_days, ambos ordenados por dia, são lidos em lotes e juntados
+        em uma única passada: só o dia corrente fica em memória.
+        """
+        entries = self._iter_batches(self._entries_cursor("day", start_day, end_day), batch_size)
+        doses = self._iter_batches(self._glargina_cursor("day", start_day, end_day), batch_size)
+        entry = next(entries, None)
+        dose_row = next(doses, None)
+        while entry is not None or dose_row is not None:
+            if dose_row is None or (entry is not None and entry[0] < dose_row[0]):
+                day = entry[0]
+            else:
+                day = dose_row[0]
+            meals = []
+            while entry is not None and entry[0] == day:
+                meals.append(entry[1:])
+                entry = next(entries, None)
+            dose = None
+            if dose_row is not None and dose_row[0] == day:
+                dose = dose_row[1]
+                dose_row = next(doses, None)
+            yield day, dose, meals
+
+    @timed("db")
+    def fetch_range(self, start: str, end: str):
+        """Como fetch_days, com as datas em ISO (relatórios e exportação)."""
+        return self._entries_cursor("date", to_day(start), to_day(end)).fetchall()
+
+    @timed("db")
+    def iter_range(self, start: str, end: str, batch_size: int = 500):
+        """
+        Versão em streaming de fetch_range: percorre o cursor em lotes de
+        fetchmany, sem materializar o período inteiro em memória.
+        """
+        yield from self._iter_batches(self._entries_cursor("date", to_day(start), to_day(end)), batch_size)
+
+    @timed("db")
+    def iter_glargina_range(self, start: str, end: str, batch_size: int = 500):
+        cur = self._glargina_cursor("date", to_day(start), to_day(end))
+        yield from self._iter_batches(cur, batch_size)
+
+    @timed("db")
+    def fetch_glargina_range(self, start: str, end: str):
+        return self._glargina_cursor("date", to_day(start), to_day(end)).fetchall()
+
+    @timed("db")
+    def fetch_day_bounds(self) -> tuple[int | None, int | None]:
+        """Primeiro e último dia (ordinais) com algum registro, de refeição ou de glargina."""
+        table = self._entry_table()
+        cur = self.conn.execute(
+            f"""
+            SELECT MIN(first_day), MAX(last_day) FROM (
+                SELECT MIN(day) AS first_day, MAX(day) AS last_day FROM {table}
+                UNION ALL
+                SELECT MIN(day), MAX(day) FROM glargina_days
+            )
+            """
         )
         return cur.fetchone()
 
-    def fetch_glargina_dose(self, date: str):
-        cur = self.conn.execute(
+    @staticmethod
+    def history_sort_key(row, sort_column: str = "date") -> tuple:
+        """
+        Valores da chave de ordenação de uma linha de entries, usados como
+        cursor de paginação. A data (posição 0) entra como ordinal, como a coluna day.
+        """
+        _, positions = HISTORY_SORT_KEYS[sort_column]
+        return tuple(to_day(row[i]) if i == 0 else (-1 if row[i] is None else row[i]) for i in positions)
+
+    def _history_where(self, filters: dict | None) -> tuple[str, list]:
+        """
+        Filtros do histórico: start/end (ISO), meal (nome exato, ou "Lanche Extra"
+        para todos os lanches extras), glicemia_min/glicemia_max e text (busca
+        nas observações, pelo índice FTS quando disponível).
+        """
+        filters = filters or {}
+        clauses, params = [], []
+        query = fts_query(filters.get("text"))
+        if query is not None and self.has_fts:
+            clauses.append("rowid IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+            params.append(query)
+        elif query is not None:
+            for term in re.findall(r"\w+", filters["text"]):
+                clauses.append("observations LIKE ?")
+                params.append(f"%{term}%")
+        if filters.get("start"):
+            clauses.append("day >= ?")
+            params.append(to_day(filters["start"]))
+        if filters.get("end"):
+            clauses.append("day <= ?")
+            params.append(to_day(filters["end"]))
+        if filters.get("meal") == "Lanche Extra":
+            clauses.append("meal LIKE 'Lanche Extra%'")
+        elif filters.get("meal"):
+            clauses.append("meal = ?")
+            params.append(filters["meal"])
+        if filters.get("glicemia_min") is not None:
+            clauses.append("glicemia >= ?")
+            params.append(filters["glicemia_min"])
+        if filters.get("glicemia_max") is not None:
+            clauses.append("glicemia <= ?")
+            params.append(filters["glicemia_max"])
+        return " AND ".join(clauses) or "1", params
+
+    @timed("db")
+    def count_history_rows(self, filters: dict | None = None) -> int:
+        where, params = self._history_where(filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM entries WHERE {where}", params).fetchone()[0]
+
+    @timed("db")
+    def fetch_history_page(self, filters: dict | None = None, sort_column: str = "date", descending: bool = False,
+                           after: tuple | None = None, before: tuple | None = None,
+                           offset: int = 0, limit: int = 200) -> list:
+        """
+        Uma página de entries na ordem pedida. Com after/before (chaves de
+        history_sort_key) a página começa logo depois/termina logo antes da
+        chave, sem OFFSET (paginação por chave). offset só é usado para saltos
+        a uma posição arbitrária, e a página seguinte volta a ser lida por chave.
+        Linhas sempre devolvidas na ordem de exibição. Com o filtro text, a
+        coluna observations traz o trecho com os termos encontrados destacados.
+        """
+        expressions, _ = HISTORY_SORT_KEYS[sort_column]
+        key_sql = f"({', '.join(expressions)})"
+        where, params = self._history_where(filters)
+
+        observations_sql, select_params = "observations", []
+        query = fts_query((filters or {}).get("text"))
+        if query is not None and self.has_fts:
+            observations_sql = f"""(
+              SELECT snippet(entries_fts, 0, '[', ']', '…', {SNIPPET_TOKENS}) FROM entries_fts
+              WHERE entries_fts MATCH ? AND entries_fts.rowid = entries.rowid
+            )"""
+            select_params.append(query)
+
+        backwards = before is not None
+        # Ler para trás = percorrer na direção oposta e inverter o resultado
+        scan_descending = descending != backwards
+        if after is not None:
+            where += f" AND {key_sql} {'<' if descending else '>'} ({', '.join('?' * len(after))})"
+            params.extend(after)
+        elif backwards:
+            where += f" AND {key_sql} {'>' if descending else '<'} ({', '.join('?' * len(before))})"
+            params.extend(before)
+
+        direction = "DESC" if scan_descending else "ASC"
+        rows = self.conn.execute(
+            f"""
+            SELECT date, meal, carbs, glicemia, lispro, bolus, {observations_sql}
+            FROM entries
+            WHERE {where}
+            ORDER BY {', '.join(f"{e} {direction}" for e in expressions)}
+            LIMIT ? OFFSET ?
+            """,
+            (*select_params, *params, limit, 0 if (after is not None or backwards) else offset),
+        ).fetchall()
+        if backwards:
+            rows.reverse()
+        return rows
+
+    @timed("db")
+    def upsert_dosing_profile(self, meal: str, values: dict):
+        self.conn.execute(
             """
-            SELECT dose FROM glargina_doses WHERE date = ?
+            INSERT INTO dosing_profiles (meal, carb_ratio, fsi, glicemia_alvo, source, samples, updated_at)
+            VALUES (:meal, :carb_ratio, :fsi, :glicemia_alvo, :source, :samples, datetime('now'))
+            ON CONFLICT(meal) DO UPDATE SET
+              carb_ratio=excluded.carb_ratio,
+              fsi=excluded.fsi,
+              glicemia_alvo=excluded.glicemia_alvo,
+              source=excluded.source,
+              samples=excluded.samples,
+              updated_at=excluded.updated_at
             """,
-            (date,),
+            {"meal": meal, "source": "manual", "samples": None, **values},
         )
-        result = cur.fetchone()
-        return result[0] if result else None
+        self._commit()
 
-    def fetch_range(self, start: str, end: str):
+    @timed("db")
+    def fetch_dosing_profiles(self):
         cur = self.conn.execute(
             """
-            SELECT date, meal, carbs, glicemia, lispro, bolus, observations
-            FROM entries
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date, meal
-            """,
-            (start, end),
+            SELECT meal, carb_ratio, fsi, glicemia_alvo, source, samples, updated_at
+            FROM dosing_profiles
+            """
         )
         return cur.fetchall()
 
-    def fetch_glargina_range(self, start: str, end: str):
-        cur = self.conn.execute(
+    def _compute_day_stats(self, day: int) -> tuple:
+        carbs, lispro, bolus, glicemia_sum, glicemia_count = self.conn.execute(self._queries["day_stats"], (day,)).fetchone()
+        dose = self.fetch_glargina_dose(day)
+        has_glargina = dose is not None and dose > 0
+        return (carbs, lispro, bolus, glicemia_sum, glicemia_count,
+                dose if has_glargina else 0.0, 1 if has_glargina else 0)
+
+    @timed("db")
+    def refresh_daily_stats(self, day: int):
+        """
+        Atualiza a linha do dia no índice de somas de prefixo e propaga a
+        diferença para os acumulados dos dias seguintes (um único UPDATE).
+        """
+        new_values = self._compute_day_stats(day)
+        old_row = self.conn.execute(self._queries["daily_stats_row"], (day,)).fetchone()
+        old_values = old_row or (0,) * len(DAILY_STATS_COLUMNS)
+        delta = [new - old for new, old in zip(new_values, old_values)]
+        if old_row is not None and not any(delta):
+            return
+
+        if any(new_values):
+            prev_cum = self._fetch_prefix(day, inclusive=False)
+            self.conn.execute(
+                self._queries["replace_daily_stats"],
+                (day, *new_values, *[p + v for p, v in zip(prev_cum, new_values)]),
+            )
+        else:
+            # Dia sem dados: a linha sai do índice (a busca usa o último prefixo <= dia)
+            self.conn.execute(self._queries["delete_daily_stats"], (day,))
+
+        self.conn.execute(self._queries["propagate_daily_stats"], (*delta, day))
+        self._commit()
+
+    @timed("db")
+    def rebuild_daily_stats(self):
+        """Recria o índice de somas de prefixo inteiro a partir de entries e glargina_days."""
+        self.conn.execute("DELETE FROM daily_stats")
+        self.conn.execute(
+            f"""
+            INSERT INTO daily_stats
+              (day, {', '.join(DAILY_STATS_COLUMNS)}, {', '.join(f"cum_{c}" for c in DAILY_STATS_COLUMNS)})
+            SELECT day, {', '.join(DAILY_STATS_COLUMNS)},
+                   {', '.join(f"SUM({c}) OVER w" for c in DAILY_STATS_COLUMNS)}
+            FROM (
+              SELECT d.day AS day,
+                     COALESCE(e.carbs, 0) AS carbs,
+                     COALESCE(e.lispro, 0) AS lispro,
+                     COALESCE(e.bolus, 0) AS bolus,
+                     COALESCE(e.glicemia_sum, 0) AS glicemia_sum,
+                     COALESCE(e.glicemia_count, 0) AS glicemia_count,
+                     CASE WHEN g.dose > 0 THEN g.dose ELSE 0 END AS glargina_sum,
+                     CASE WHEN g.dose > 0 THEN 1 ELSE 0 END AS glargina_count
+              FROM (SELECT day FROM entries UNION SELECT day FROM glargina_days) AS d
+              LEFT JOIN (
+                SELECT day, SUM(carbs) AS carbs, SUM(lispro) AS lispro, SUM(bolus) AS bolus,
+                       SUM(glicemia) AS glicemia_sum, COUNT(glicemia) AS glicemia_count
+                FROM entries
+                GROUP BY day
+              ) AS e ON e.day = d.day
+              LEFT JOIN glargina_days AS g ON g.day = d.day
+            )
+            -- Dias sem nenhum valor ficam fora do índice, como em refresh_daily_stats
+            WHERE {' OR '.join(f"{c} != 0" for c in DAILY_STATS_COLUMNS)}
+            WINDOW w AS (ORDER BY day ROWS UNBOUNDED PRECEDING)
+            """
+        )
+        self._commit()
+
+    def _fetch_prefix(self, day: int, inclusive: bool) -> tuple:
+        query = self._queries["prefix_through" if inclusive else "prefix_before"]
+        row = self.conn.execute(query, (day,)).fetchone()
+        return row or (0,) * len(DAILY_STATS_COLUMNS)
+
+    @timed("db")
+    def fetch_window_stats(self, start_day: int, end_day: int) -> dict:
+        """Totais de [start_day, end_day] pela diferença de dois prefixos: duas buscas pela chave primária."""
+        upper = self._fetch_prefix(end_day, inclusive=True)
+        lower = self._fetch_prefix(start_day, inclusive=False)
+        return {c: hi - lo for c, hi, lo in zip(DAILY_STATS_COLUMNS, upper, lower)}
+
+    @timed("db")
+    def append_changeset(self, day: int, kind: str, author: str, created_at: str, changes: list) -> int | None:
+        """
+        Acrescenta ao log um changeset do dia com as alterações (meal, field,
+        old_value, new_value). Retorna o id, ou None se changes estiver vazio.
+        """
+        if not changes:
+            return None
+        changeset_id = self.conn.execute(
+            "INSERT INTO changesets (day, kind, author, created_at) VALUES (?, ?, ?, ?)",
+            (day, kind, author, created_at),
+        ).lastrowid
+        self.conn.executemany(
+            "INSERT INTO change_log (changeset_id, meal, field, old_value, new_value) VALUES (?, ?, ?, ?, ?)",
+            [(changeset_id, *change) for change in changes],
+        )
+        self._commit()
+        return changeset_id
+
+    @timed("db")
+    def fetch_changeset(self, changeset_id: int):
+        """(id, day, kind, author, created_at) do changeset, ou None."""
+        return self.conn.execute(
+            "SELECT id, day, kind, author, created_at FROM changesets WHERE id = ?", (changeset_id,)
+        ).fetchone()
+
+    @timed("db")
+    def fetch_changes(self, changeset_id: int) -> list:
+        return self.conn.execute(
+            "SELECT meal, field, old_value, new_value FROM change_log WHERE changeset_id = ? ORDER BY rowid",
+            (changeset_id,),
+        ).fetchall()
+
+    @timed("db")
+    def fetch_day_changesets(self, day: int, limit: int = 100) -> list:
+        """Changesets do dia, do mais recente para o mais antigo: (id, kind, author, created_at, número de alterações)."""
+        return self.conn.execute(
+            """
+            SELECT c.id, c.kind, c.author, c.created_at,
+                   (SELECT COUNT(*) FROM change_log AS l WHERE l.changeset_id = c.id)
+            FROM changesets AS c
+            WHERE c.day = ?
+            ORDER BY c.id DESC
+            LIMIT ?
+            """,
+            (day, limit),
+        ).fetchall()
+
+    @timed("db")
+    def fetch_last_changeset_id(self, day: int, at: str) -> int:
+        """Id do último changeset do dia gravado até o instante at (0 se não houver)."""
+        row = self.conn.execute(
+            "SELECT MAX(id) FROM changesets WHERE day = ? AND created_at <= ?", (day, at)
+        ).fetchone()
+        return row[0] or 0
+
+    @timed("db")
+    def fetch_changes_after(self, day: int, changeset_id: int) -> list:
+        """
+        (meal, field, old_value) das alterações do dia posteriores ao
+        changeset indicado, da mais recente para a mais antiga: aplicadas nessa
+        ordem sobre o estado atual, reconstroem o dia logo após changeset_id.
+        """
+        return self.conn.execute(
+            """
+            SELECT l.meal, l.field, l.old_value
+            FROM changesets AS c
+            JOIN change_log AS l ON l.changeset_id = c.id
+            WHERE c.day = ? AND c.id > ?
+            ORDER BY c.id DESC
+            """,
+            (day, changeset_id),
+        ).fetchall()
+
+    @timed("db")
+    def compact_change_log(self, before: str) -> tuple[int, int]:
+        """
+        Compacta os changesets gravados antes do instante before: os de cada
+        dia viram um só (kind 'compacted', com o id e a data do mais recente),
+        com uma linha por (refeição, campo) do primeiro valor antigo ao último
+        valor novo; campos que voltaram ao valor inicial saem do log. A
+        reconstrução continua exata a partir do changeset compactado. Retorna
+        (changesets removidos, linhas de log removidas).
+        """
+        with self.transaction():
+            counts_before = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM changesets), (SELECT COUNT(*) FROM change_log)"
+            ).fetchone()
+            self.conn.execute("DROP TABLE IF EXISTS temp.compacted_days")
+            self.conn.execute(
+                """
+                CREATE TEMP TABLE compacted_days AS
+                SELECT day, MAX(id) AS last_id
+                FROM changesets
+                WHERE created_at < ?
+                GROUP BY day
+                HAVING COUNT(*) > 1
+                """,
+                (before,),
+            )
+            self.conn.execute("DROP TABLE IF EXISTS temp.compacted_changes")
+            self.conn.execute(
+                """
+                CREATE TEMP TABLE compacted_changes AS
+                SELECT DISTINCT d.last_id AS changeset_id, l.meal AS meal, l.field AS field,
+                       FIRST_VALUE(l.old_value) OVER (PARTITION BY c.day, l.meal, l.field ORDER BY c.id) AS old_value,
+                       FIRST_VALUE(l.new_value) OVER (PARTITION BY c.day, l.meal, l.field ORDER BY c.id DESC) AS new_value
+                FROM compacted_days AS d
+                JOIN changesets AS c ON c.day = d.day AND c.id <= d.last_id
+                JOIN change_log AS l ON l.changeset_id = c.id
+                """
+            )
+            self.conn.execute(
+                """
+                DELETE FROM change_log WHERE changeset_id IN (
+                  SELECT c.id FROM compacted_days AS d JOIN changesets AS c ON c.day = d.day AND c.id <= d.last_id
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                DELETE FROM changesets WHERE id IN (
+                  SELECT c.id FROM compacted_days AS d JOIN changesets AS c ON c.day = d.day AND c.id < d.last_id
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                INSERT INTO change_log (changeset_id, meal, field, old_value, new_value)
+                SELECT changeset_id, meal, field, old_value, new_value
+                FROM compacted_changes
+                WHERE old_value IS NOT new_value
+                ORDER BY changeset_id, meal, field
+                """
+            )
+            self.conn.execute("UPDATE changesets SET kind = 'compacted' WHERE id IN (SELECT last_id FROM compacted_days)")
+            # Dias em que tudo voltou ao valor inicial não precisam de changeset
+            self.conn.execute(
+                """
+                DELETE FROM changesets
+                WHERE id IN (SELECT last_id FROM compacted_days)
+                  AND NOT EXISTS (SELECT 1 FROM change_log AS l WHERE l.changeset_id = changesets.id)
+                """
+            )
+            self.conn.execute("DROP TABLE temp.compacted_days")
+            self.conn.execute("DROP TABLE temp.compacted_changes")
+            counts_after = self.conn.execute(
+                "SELECT (SELECT COUNT(*) FROM changesets), (SELECT COUNT(*) FROM change_log)"
+            ).fetchone()
+        return counts_before[0] - counts_after[0], counts_before[1] - counts_after[1]
+
+    def _sync_meta(self, key: str):
+        return self.conn.execute(self._queries["sync_meta"], (key,)).fetchone()[0]
+
+    @property
+    def device_id(self) -> str:
+        return self._sync_meta("device_id")
+
+    def reset_device_id(self):
+        """Nova identidade de sincronização (um backup restaurado passa a ser outra cópia, não a original)."""
+        self.conn.execute("UPDATE sync_meta SET value = ? WHERE key = 'device_id'", (uuid.uuid4().hex,))
+        self._commit()
+
+    def fetch_sync_seq(self) -> int:
+        return self._sync_meta("seq")
+
+    def _advance_sync_counters(self, seen_version: int = 0) -> tuple[int, int]:
+        """Avança o relógio (acima de seen_version) e a sequência local; retorna (versão, seq) novas."""
+        clock = max(self._sync_meta("clock"), seen_version) + 1
+        seq = self._sync_meta("seq") + 1
+        self.conn.executemany(self._queries["update_sync_meta"], [(clock, "clock"), (seq, "seq")])
+        return clock, seq
+
+    @timed("db")
+    def mark_rows_changed(self, day: int, rows: list):
+        """Registra alterações locais nas linhas rows = [(tbl, meal, deleted)] do dia, todas com a mesma versão nova."""
+        if not rows:
+            return
+        version, seq = self._advance_sync_counters()
+        device = self.device_id
+        self.conn.executemany(
+            self._queries["upsert_sync_row"],
+            [(tbl, day, meal, version, device, int(deleted), seq) for tbl, meal, deleted in rows],
+        )
+        self._commit()
+
+    @timed("db")
+    def ensure_row_versions(self) -> int:
+        """
+        Dá versão 0 às linhas que ainda não têm (gravadas antes da
+        sincronização ou fora do serviço): entram na próxima exportação e
+        perdem para qualquer edição feita depois. Retorna quantas foram marcadas.
+        """
+        with self.transaction():
+            _, seq = self._advance_sync_counters()
+            count = self.conn.execute(
+                """
+                INSERT INTO sync_rows (tbl, day, meal, version, device, deleted, seq)
+                SELECT 'entries', e.day, e.meal, 0, :device, 0, :seq FROM entries AS e
+                WHERE NOT EXISTS (SELECT 1 FROM sync_rows AS s WHERE s.tbl = 'entries' AND s.day = e.day AND s.meal = e.meal)
+                UNION ALL
+                SELECT 'glargina', g.day, '', 0, :device, 0, :seq FROM glargina_days AS g
+                WHERE NOT EXISTS (SELECT 1 FROM sync_rows AS s WHERE s.tbl = 'glargina' AND s.day = g.day AND s.meal = '')
+                """,
+                {"device": self.device_id, "seq": seq},
+            ).rowcount
+        return count
+
+    @timed("db")
+    def fetch_sync_changes(self, since_seq: int) -> list:
+        """
+        Linhas alteradas depois de since_seq com o estado atual: (tbl, data
+        ISO, meal, version, device, deleted, carbs, glicemia, lispro, bolus,
+        observations, dose). Uma linha sem dados gravados sai como lápide.
+        """
+        rows = self.conn.execute(
+            f"""
+            SELECT s.tbl, s.day, s.meal, s.version, s.device, s.deleted OR e.day IS NULL,
+                   e.carbs, e.glicemia, e.lispro, e.bolus, e.observations, NULL
+            FROM sync_rows AS s
+            LEFT JOIN entries AS e ON e.day = s.day AND e.meal = s.meal
+            WHERE s.seq > ? AND s.tbl = 'entries'
+            UNION ALL
+            SELECT s.tbl, s.day, s.meal, s.version, s.device, s.deleted OR g.day IS NULL,
+                   NULL, NULL, NULL, NULL, NULL, g.dose
+            FROM sync_rows AS s
+            LEFT JOIN glargina_days AS g ON g.day = s.day
+            WHERE s.seq > ? AND s.tbl = 'glargina'
+            ORDER BY 2, 1, 3
+            """,
+            (since_seq, since_seq),
+        ).fetchall()
+        return [(tbl, to_iso(day), *rest) for tbl, day, *rest in rows]
+
+    @timed("db")
+    def select_sync_winners(self, rows: list) -> list:
+        """
+        Das linhas recebidas (formato de fetch_sync_changes, com day no lugar
+        da data ISO), devolve as que vencem a versão local: maior (version,
+        device), comparação que dá o mesmo resultado nos dois bancos. Avança
+        o relógio local acima de todas as versões recebidas.
+        """
+        self.conn.execute("DROP TABLE IF EXISTS temp.sync_incoming")
+        self.conn.execute(
+            """
+            CREATE TEMP TABLE sync_incoming (
+              tbl TEXT, day INTEGER, meal TEXT, version INTEGER, device TEXT, deleted INTEGER,
+              carbs REAL, glicemia REAL, lispro REAL, bolus REAL, observations TEXT, dose REAL
+            )
             """
-            SELECT date, dose
-            FROM glargina_doses
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date
+        )
+        self.conn.executemany("INSERT INTO sync_incoming VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        winners = self.conn.execute(
+            """
+            SELECT i.* FROM sync_incoming AS i
+            LEFT JOIN sync_rows AS s ON s.tbl = i.tbl AND s.day = i.day AND s.meal = i.meal
+            WHERE s.version IS NULL OR (i.version, i.device) > (s.version, s.device)
+            ORDER BY i.day, i.tbl, i.meal
+            """
+        ).fetchall()
+        max_version = self.conn.execute("SELECT COALESCE(MAX(version), 0) FROM sync_incoming").fetchone()[0]
+        self.conn.execute("DROP TABLE temp.sync_incoming")
+        clock = self._sync_meta("clock")
+        if max_version > clock:
+            self.conn.execute(self._queries["update_sync_meta"], (max_version, "clock"))
+        self._commit()
+        return winners
+
+    @timed("db")
+    def record_sync_rows(self, rows: list):
+        """Grava a versão das linhas recebidas e aplicadas, com seq novo para que sigam para os demais bancos."""
+        if not rows:
+            return
+        _, seq = self._advance_sync_counters()
+        self.conn.executemany(
+            self._queries["upsert_sync_row"],
+            [(tbl, day, meal, version, device, deleted, seq) for tbl, day, meal, version, device, deleted, *_ in rows],
+        )
+        self._commit()
+
+    def fetch_sync_peers(self) -> dict:
+        """{dispositivo: (acked_seq, received_seq, last_sync)}"""
+        return {
+            device: (acked, received, last_sync)
+            for device, acked, received, last_sync in self.conn.execute(
+                "SELECT device, acked_seq, received_seq, last_sync FROM sync_peers"
+            )
+        }
+
+    @timed("db")
+    def update_sync_peer(self, device: str, acked_seq: int | None = None, received_seq: int | None = None,
+                         last_sync: str | None = None):
+        """Atualiza o que se sabe do outro banco; os contadores só avançam."""
+        self.conn.execute(
+            """
+            INSERT INTO sync_peers (device, acked_seq, received_seq, last_sync)
+            VALUES (:device, COALESCE(:acked, 0), COALESCE(:received, 0), :last_sync)
+            ON CONFLICT(device) DO UPDATE SET
+              acked_seq = MAX(acked_seq, COALESCE(:acked, 0)),
+              received_seq = MAX(received_seq, COALESCE(:received, 0)),
+              last_sync = COALESCE(:last_sync, last_sync)
             """,
-            (start, end),
+            {"device": device, "acked": acked_seq, "received": received_seq, "last_sync": last_sync},
         )
-        return cur.fetchall()
+        self._commit()
 
     def close(self):
         self.conn.close()
\ No newline at end of file
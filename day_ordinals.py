@@ -0,0 +1,29 @@
+# day_ordinals.py
+
+import datetime as dt
+
+# As datas são gravadas e processadas como ordinais de dia (dt.date.toordinal:
+# 01/01/0001 = 1). O formato ISO só aparece na borda: UI, relatórios e exportação.
+MIN_DAY = dt.date.min.toordinal()
+MAX_DAY = dt.date.max.toordinal()
+
+# julianday('0001-01-01') - 1: no SQL, date(day + JULIAN_DAY_OFFSET) dá a data ISO do ordinal
+JULIAN_DAY_OFFSET = 1721424.5
+
+
+def to_day(date_iso: str) -> int:
+    return dt.date.fromisoformat(date_iso).toordinal()
+
+
+def to_iso(day: int) -> str:
+    return dt.date.fromordinal(day).isoformat()
+
+
+def day_to_iso_sql(expression: str) -> str:
+    """Expressão SQL que converte um ordinal de dia em data ISO."""
+    return f"date({expression} + {JULIAN_DAY_OFFSET})"
+
+
+def iso_to_day_sql(expression: str) -> str:
+    """Expressão SQL que converte uma data ISO em ordinal de dia (NULL se a data for inválida)."""
+    return f"CAST(julianday({expression}) - {JULIAN_DAY_OFFSET} AS INTEGER)"
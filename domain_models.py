@@ -0,0 +1,113 @@
+# domain_models.py
+
+from constants import FIELDS, MEALS
+from day_ordinals import to_iso
+
+# Tipos leves (com __slots__, sem __dict__ por instância) para o que o serviço
+# devolve à UI e ao relatório PDF: períodos longos viram milhares de objetos,
+# e um dicionário por refeição custava várias vezes mais memória e tempo.
+ENTRY_FIELDS = tuple(key for _, key in FIELDS)
+
+
+class MealEntry:
+    """Valores de uma refeição em um dia; campos não preenchidos ficam como None."""
+
+    __slots__ = ("meal", "carbs", "glicemia", "lispro", "bolus", "observations")
+
+    def __init__(self, meal: str, carbs: float | None = None, glicemia: float | None = None,
+                 lispro: float | None = None, bolus: float | None = None, observations: str | None = None):
+        self.meal = meal
+        self.carbs = carbs
+        self.glicemia = glicemia
+        self.lispro = lispro
+        self.bolus = bolus
+        self.observations = observations
+
+    @classmethod
+    def from_values(cls, meal: str, values: dict) -> "MealEntry":
+        """A partir de {campo: valor} (formato dos dados editados na UI)."""
+        return cls(meal, *(values.get(key) for key in ENTRY_FIELDS))
+
+    def values(self) -> tuple:
+        """(carbs, glicemia, lispro, bolus, observations), na ordem de FIELDS."""
+        return self.carbs, self.glicemia, self.lispro, self.bolus, self.observations
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.values())
+
+    def __eq__(self, other):
+        if not isinstance(other, MealEntry):
+            return NotImplemented
+        return self.meal == other.meal and self.values() == other.values()
+
+    def __repr__(self):
+        return f"MealEntry({self.meal!r}, {', '.join(repr(v) for v in self.values())})"
+
+
+class DayRecord:
+    """Um dia: dose de glargina e refeições por nome, na ordem em que foram lidas (refeição, dia)."""
+
+    __slots__ = ("day", "glargina", "meals")
+
+    def __init__(self, day: int, glargina: float | None = None, meals: dict | None = None):
+        self.day = day
+        self.glargina = glargina
+        self.meals: dict[str, MealEntry] = meals if meals is not None else {}
+
+    @classmethod
+    def from_meal_data(cls, day: int, glargina: float | None, meal_entries_data: dict) -> "DayRecord":
+        """A partir de {refeição: {campo: valor}}, como a aba de registro diário envia ao salvar."""
+        return cls(day, glargina, {meal: MealEntry.from_values(meal, values)
+                                   for meal, values in meal_entries_data.items()})
+
+    @property
+    def date_iso(self) -> str:
+        return to_iso(self.day)
+
+    def add(self, entry: MealEntry):
+        self.meals[entry.meal] = entry
+
+    def meal(self, name: str) -> MealEntry:
+        """Refeição pelo nome; uma refeição vazia se não houver registro."""
+        entry = self.meals.get(name)
+        return entry if entry is not None else MealEntry(name)
+
+    def with_fixed_meals(self) -> "DayRecord":
+        """Garante uma entrada (vazia) para cada refeição de MEALS, como a UI espera; devolve o próprio registro."""
+        for name in MEALS:
+            if name not in self.meals:
+                self.meals[name] = MealEntry(name)
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, DayRecord):
+            return NotImplemented
+        return (self.day, self.glargina, self.meals) == (other.day, other.glargina, other.meals)
+
+    def __repr__(self):
+        return f"DayRecord({self.date_iso}, glargina={self.glargina!r}, meals={list(self.meals.values())!r})"
+
+
+class DailyAggregate:
+    """Totais de um dia para os relatórios; glicemia (média) e glargina ficam None sem leituras."""
+
+    __slots__ = ("day", "carbs", "glicemia", "glargina")
+
+    def __init__(self, day: int, carbs: float, glicemia: float | None, glargina: float | None):
+        self.day = day
+        self.carbs = carbs
+        self.glicemia = glicemia
+        self.glargina = glargina
+
+    @property
+    def date_iso(self) -> str:
+        return to_iso(self.day)
+
+    def __eq__(self, other):
+        if not isinstance(other, DailyAggregate):
+            return NotImplemented
+        return ((self.day, self.carbs, self.glicemia, self.glargina)
+                == (other.day, other.carbs, other.glicemia, other.glargina))
+
+    def __repr__(self):
+        return f"DailyAggregate({self.date_iso}, carbs={self.carbs!r}, glicemia={self.glicemia!r}, glargina={self.glargina!r})"
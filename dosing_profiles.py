@@ -0,0 +1,80 @@
+# dosing_profiles.py
+#
+# Perfis de dose por período de refeição (relação carboidrato/insulina e FSI)
+# e o ajuste desses perfis a partir do histórico de entries.
+
+import numpy as np
+
+from constants import MEALS, MEAL_START_HOURS, meal_category
+
+MIN_FIT_SAMPLES = 10
+
+
+def meal_for_hour(hour: int) -> str:
+    """Refeição fixa correspondente à hora do dia (a última cujo horário de início já passou)."""
+    current = MEALS[0]
+    for meal, start_hour in sorted(MEAL_START_HOURS.items(), key=lambda item: item[1]):
+        if hour >= start_hour:
+            current = meal
+    return current
+
+
+def fit_dosing_profiles(rows, glicemia_alvo: float, min_samples: int = MIN_FIT_SAMPLES) -> dict:
+    """
+    Estima, por categoria de refeição, a relação carboidrato/insulina e o FSI
+    efetivos a partir das linhas de entries, ajustando por mínimos quadrados
+
+        lispro + bolus ≈ carbs / carb_ratio + (glicemia - glicemia_alvo) / fsi
+
+    Todas as refeições são resolvidas de uma vez: as equações normais 2×2 de
+    cada grupo são montadas com bincount e resolvidas em forma fechada.
+    Refeições com menos de min_samples linhas ou com coeficientes não
+    positivos ficam de fora do resultado.
+    """
+    meals, carbs, glicemia, dose = [], [], [], []
+    for _date, meal, c, g, lispro, bolus, _obs in rows:
+        total = (lispro or 0.0) + (bolus or 0.0)
+        if c is None or g is None or total <= 0:
+            continue
+        meals.append(meal_category(meal))
+        carbs.append(c)
+        glicemia.append(g)
+        dose.append(total)
+    if not meals:
+        return {}
+
+    names, codes = np.unique(np.array(meals), return_inverse=True)
+    n = len(names)
+    x1 = np.array(carbs, dtype=np.float64)
+    x2 = np.array(glicemia, dtype=np.float64) - glicemia_alvo
+    y = np.array(dose, dtype=np.float64)
+
+    def group_sum(values):
+        return np.bincount(codes, weights=values, minlength=n)
+
+    count = np.bincount(codes, minlength=n)
+    s11, s12, s22 = group_sum(x1 * x1), group_sum(x1 * x2), group_sum(x2 * x2)
+    s1y, s2y, syy = group_sum(x1 * y), group_sum(x2 * y), group_sum(y * y)
+
+    det = s11 * s22 - s12 * s12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_ratio = (s22 * s1y - s12 * s2y) / det
+        inv_fsi = (s11 * s2y - s12 * s1y) / det
+        sse = syy - 2 * (inv_ratio * s1y + inv_fsi * s2y) + (
+            inv_ratio * inv_ratio * s11 + 2 * inv_ratio * inv_fsi * s12 + inv_fsi * inv_fsi * s22)
+        rmse = np.sqrt(np.maximum(sse, 0.0) / count)
+
+    profiles = {}
+    for i, meal in enumerate(names.tolist()):
+        if count[i] < min_samples or not np.isfinite(det[i]) or det[i] <= 0:
+            continue
+        if not (inv_ratio[i] > 0 and inv_fsi[i] > 0):
+            continue
+        profiles[meal] = {
+            "carb_ratio": float(1.0 / inv_ratio[i]),
+            "fsi": float(1.0 / inv_fsi[i]),
+            "glicemia_alvo": float(glicemia_alvo),
+            "samples": int(count[i]),
+            "rmse": float(rmse[i]),
+        }
+    return profiles
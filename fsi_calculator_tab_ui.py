@@ -2,6 +2,7 @@
 
 from tkinter import StringVar, messagebox, ttk
 from tooltip import ToolTip
+from insulin_calculations import calculate_fsi
 
 class FSICalculatorTabUI(ttk.Frame):
     def __init__(self, master, app_instance):
@@ -38,10 +39,37 @@ class FSICalculatorTabUI(ttk.Frame):
 
         button_frame = ttk.Frame(self, style="Panel.TFrame", padding=(20, 15))
         button_frame.grid(row=3, column=0, pady=(0, 20), sticky="ew", padx=20)
-        button_frame.grid_columnconfigure((0, 1), weight=1)
+        button_frame.grid_columnconfigure((0, 1, 2), weight=1)
 
         ttk.Button(button_frame, text="Calcular FSI", command=self._calculate_fsi, style="TButton").grid(row=0, column=0, padx=8, sticky="ew")
         ttk.Button(button_frame, text="Limpar", command=self._clear_fields, style="TButton").grid(row=0, column=1, padx=8, sticky="ew")
+        fit_button = ttk.Button(button_frame, text="Estimar pelo Histórico", command=self._fit_from_history, style="TButton")
+        fit_button.grid(row=0, column=2, padx=8, sticky="ew")
+        ToolTip(fit_button, "Ajusta FSI e relação carboidrato/insulina por refeição a partir de todos os registros.")
+
+        self._prefill_total_daily_insulin()
+
+    def _prefill_total_daily_insulin(self, days: int = 30):
+        """Sugere a insulina total diária média dos últimos dias a partir do índice de janelas."""
+        _, _, totals = self.app_instance.service.get_trailing_window_totals(days)
+        if totals["glargina_count"] == 0 and totals["lispro"] == 0:
+            return
+        # Dias com glargina registrada aproximam os dias efetivamente preenchidos
+        recorded_days = totals["glargina_count"] or days
+        total_daily = (totals["lispro"] + totals["bolus"] + totals["glargina_sum"]) / recorded_days
+        if total_daily > 0:
+            self.vars["total_daily_insulin"].set(f"{total_daily:.1f}")
+
+    def _fit_from_history(self):
+        fitted = self.app_instance.service.fit_dosing_profiles_from_history()
+        if not fitted:
+            self.result_var.set("Registros insuficientes para estimar os perfis (mínimo de 10 refeições com carboidratos, glicemia e dose).")
+            return
+        lines = ["Perfis estimados pelo histórico:"]
+        for meal, profile in fitted.items():
+            lines.append(f"{meal}: FSI {profile['fsi']:.1f} mg/dL/UI, relação {profile['carb_ratio']:.1f} g/UI "
+                         f"({profile['samples']} refeições)")
+        self.result_var.set("\n".join(lines))
 
     def _validate_input(self, value_str, field_name):
         if not value_str:
@@ -62,7 +90,7 @@ class FSICalculatorTabUI(ttk.Frame):
             messagebox.showerror("Erro de Cálculo", "A Insulina Total Diária não pode ser zero.")
             return
 
-        fsi = 1800 / total_daily_insulin
+        fsi = calculate_fsi(total_daily_insulin)
 
         self.result_var.set(f"Fator de Sensibilidade à Insulina (FSI): {fsi:.1f} mg/dL/UI")
 
@@ -0,0 +1,212 @@
+# glycemic_metrics.py
+
+import math
+
+from constants import meal_category
+from domain_models import DayRecord
+
+DEFAULT_LOW_THRESHOLD = 70.0
+DEFAULT_HIGH_THRESHOLD = 180.0
+
+
+def estimated_a1c(mean_glicemia: float) -> float:
+    """HbA1c estimada (fórmula ADAG): (glicemia média + 46,7) / 28,7."""
+    return (mean_glicemia + 46.7) / 28.7
+
+
+def glucose_management_indicator(mean_glicemia: float) -> float:
+    """GMI (%) para glicemia em mg/dL: 3,31 + 0,02392 × média."""
+    return 3.31 + 0.02392 * mean_glicemia
+
+
+class GlycemicAccumulator:
+    """Somas acumuladas que permitem adicionar e remover leituras e obter as métricas em O(1)."""
+
+    __slots__ = ("count", "total", "sq_total", "below", "above")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.sq_total = 0.0
+        self.below = 0
+        self.above = 0
+
+    def add(self, value: float, low: float, high: float, sign: int = 1):
+        self.count += sign
+        self.total += sign * value
+        self.sq_total += sign * value * value
+        if value < low:
+            self.below += sign
+        elif value > high:
+            self.above += sign
+
+    def metrics(self) -> dict:
+        if self.count <= 0:
+            return {
+                "count": 0, "mean": None, "std": None, "cv": None,
+                "below_pct": None, "in_range_pct": None, "above_pct": None,
+                "estimated_a1c": None, "gmi": None,
+            }
+        mean = self.total / self.count
+        std = math.sqrt(max(self.sq_total / self.count - mean * mean, 0.0))
+        below_pct = 100.0 * self.below / self.count
+        above_pct = 100.0 * self.above / self.count
+        return {
+            "count": self.count,
+            "mean": mean,
+            "std": std,
+            "cv": 100.0 * std / mean if mean else None,
+            "below_pct": below_pct,
+            "in_range_pct": 100.0 - below_pct - above_pct,
+            "above_pct": above_pct,
+            "estimated_a1c": estimated_a1c(mean),
+            "gmi": glucose_management_indicator(mean),
+        }
+
+
+class RollingGlycemicWindow:
+    """
+    Janela [start, end] de leituras de glicemia agrupadas por dia. Alterar um
+    dia ou deslizar a janela só toca nas leituras dos dias envolvidos, e as
+    métricas saem das somas acumuladas, sem reler o período.
+
+    Sem CGM, o "tempo" acima/abaixo do alvo é aproximado pela fração das leituras.
+    """
+
+    def __init__(self, start_ordinal: int, end_ordinal: int, low: float, high: float):
+        self.start_ordinal = start_ordinal
+        self.end_ordinal = end_ordinal
+        self.low = low
+        self.high = high
+        self.day_readings: dict[int, list[tuple[str, float]]] = {}
+        self.overall = GlycemicAccumulator()
+        self.per_meal: dict[str, GlycemicAccumulator] = {}
+
+    def _apply(self, readings, sign: int):
+        for meal, value in readings:
+            self.overall.add(value, self.low, self.high, sign)
+            acc = self.per_meal.get(meal)
+            if acc is None:
+                acc = self.per_meal[meal] = GlycemicAccumulator()
+            acc.add(value, self.low, self.high, sign)
+
+    def contains(self, ordinal: int) -> bool:
+        return self.start_ordinal <= ordinal <= self.end_ordinal
+
+    def set_day(self, ordinal: int, readings: list[tuple[str, float]]):
+        """Substitui as leituras de um dia (readings: pares (categoria da refeição, glicemia))."""
+        if not self.contains(ordinal):
+            return
+        self._apply(self.day_readings.pop(ordinal, ()), -1)
+        if readings:
+            self.day_readings[ordinal] = list(readings)
+            self._apply(readings, 1)
+
+    def slide(self, new_start: int, new_end: int, load_days):
+        """
+        Move a janela para [new_start, new_end]. Remove os dias que saíram e
+        carrega (via load_days(start, end) -> {ordinal: readings}) apenas os que entraram.
+        """
+        for ordinal in [o for o in self.day_readings if o < new_start or o > new_end]:
+            self._apply(self.day_readings.pop(ordinal), -1)
+
+        entering = []
+        if new_start < self.start_ordinal:
+            entering.append((new_start, min(new_end, self.start_ordinal - 1)))
+        if new_end > self.end_ordinal:
+            entering.append((max(new_start, self.end_ordinal + 1), new_end))
+        if new_end < self.start_ordinal or new_start > self.end_ordinal:
+            entering = [(new_start, new_end)]
+
+        self.start_ordinal, self.end_ordinal = new_start, new_end
+        for start, end in entering:
+            for ordinal, readings in load_days(start, end).items():
+                self.set_day(ordinal, readings)
+
+    def set_thresholds(self, low: float, high: float):
+        """Recalcula as contagens acima/abaixo com os novos limites, a partir das leituras já em memória."""
+        self.low, self.high = low, high
+        self.overall = GlycemicAccumulator()
+        self.per_meal = {}
+        for readings in self.day_readings.values():
+            self._apply(readings, 1)
+
+    def metrics(self) -> dict:
+        result = self.overall.metrics()
+        result["low_threshold"] = self.low
+        result["high_threshold"] = self.high
+        result["per_meal"] = {
+            meal: acc.metrics() for meal, acc in self.per_meal.items() if acc.count > 0
+        }
+        return result
+
+
+class GlycemicMetricsEngine:
+    """
+    Mantém janelas de métricas glicêmicas em cache. Cada janela é montada com
+    uma varredura do banco na primeira consulta; depois disso, salvar um dia
+    atualiza as janelas que o contêm em O(leituras do dia), e pedir a mesma
+    janela deslocada (ex.: últimos 90 dias no dia seguinte) só lê os dias novos.
+    """
+
+    def __init__(self, load_range, low: float = DEFAULT_LOW_THRESHOLD, high: float = DEFAULT_HIGH_THRESHOLD,
+                 max_windows: int = 8):
+        # load_range(start_day, end_day) -> iterável de linhas de entries com o dia como ordinal (como Database.iter_days)
+        self.load_range = load_range
+        self.low = low
+        self.high = high
+        self.max_windows = max_windows
+        self.windows: dict[tuple[int, int], RollingGlycemicWindow] = {}
+
+    def _load_days(self, start_ordinal: int, end_ordinal: int) -> dict[int, list[tuple[str, float]]]:
+        by_day: dict[int, list[tuple[str, float]]] = {}
+        for ordinal, meal, _carbs, glicemia, _lispro, _bolus, _obs in self.load_range(start_ordinal, end_ordinal):
+            if glicemia is not None:
+                by_day.setdefault(ordinal, []).append((meal_category(meal), glicemia))
+        return by_day
+
+    def _get_window(self, start_ordinal: int, end_ordinal: int) -> RollingGlycemicWindow:
+        key = (start_ordinal, end_ordinal)
+        window = self.windows.pop(key, None)
+        if window is None:
+            # Reaproveita uma janela de mesmo tamanho (janela móvel) se houver sobreposição
+            length = end_ordinal - start_ordinal
+            for other_key, other in self.windows.items():
+                if other.end_ordinal - other.start_ordinal == length and \
+                        other.start_ordinal <= end_ordinal and other.end_ordinal >= start_ordinal:
+                    window = self.windows.pop(other_key)
+                    window.slide(start_ordinal, end_ordinal, self._load_days)
+                    break
+        if window is None:
+            window = RollingGlycemicWindow(start_ordinal, end_ordinal, self.low, self.high)
+            for ordinal, readings in self._load_days(start_ordinal, end_ordinal).items():
+                window.set_day(ordinal, readings)
+
+        # Reinsere no fim do dict: ordem de inserção = ordem de uso (LRU)
+        self.windows[key] = window
+        while len(self.windows) > self.max_windows:
+            self.windows.pop(next(iter(self.windows)))
+        return window
+
+    def get_metrics(self, start_ordinal: int, end_ordinal: int) -> dict:
+        return self._get_window(start_ordinal, end_ordinal).metrics()
+
+    def on_day_saved(self, record: DayRecord):
+        """Atualiza as janelas em cache com as glicemias recém-salvas de um dia."""
+        readings = [
+            (meal_category(entry.meal), entry.glicemia)
+            for entry in record.meals.values()
+            if entry.glicemia is not None
+        ]
+        for window in self.windows.values():
+            window.set_day(record.day, readings)
+
+    def set_thresholds(self, low: float, high: float):
+        if (low, high) == (self.low, self.high):
+            return
+        self.low, self.high = low, high
+        for window in self.windows.values():
+            window.set_thresholds(low, high)
+
+    def invalidate(self):
+        self.windows.clear()
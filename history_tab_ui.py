@@ -0,0 +1,302 @@
+# history_tab_ui.py
+
+import datetime as dt
+from tkinter import StringVar, ttk, messagebox
+
+from carb_tracker_service import CarbTrackerService
+from constants import MEALS
+from tooltip import ToolTip
+from instrumentation import timed
+
+HISTORY_VISIBLE_ROWS = 25
+# Linhas mantidas em memória acima e abaixo da janela visível
+HISTORY_BUFFER_ROWS = 100
+
+HISTORY_COLUMNS = [
+    ("date", "Data", 90),
+    ("meal", "Refeição", 140),
+    ("carbs", "Carbs (g)", 80),
+    ("glicemia", "Glicemia", 80),
+    ("lispro", "Lispro", 70),
+    ("bolus", "Bolus", 70),
+    ("observations", "Observações", 280),
+]
+SORTABLE_COLUMNS = ("date", "meal", "carbs", "glicemia", "lispro", "bolus")
+ALL_MEALS_OPTION = "Todas"
+
+
+class HistoryTabUI(ttk.Frame):
+    """
+    Histórico de todos os registros em uma Treeview virtualizada: a árvore
+    só contém as linhas visíveis, e um buffer de páginas em volta delas é
+    lido do banco por paginação por chave (date, meal) conforme a rolagem.
+    Filtros e ordenação são aplicados no SQL.
+    """
+
+    def __init__(self, master, service: CarbTrackerService, app_instance):
+        super().__init__(master, style="Panel.TFrame")
+        self.service = service
+        self.app_instance = app_instance
+
+        self.filters = {}
+        self.sort_column = "date"
+        self.sort_descending = True
+        self.total_rows = 0
+        self.offset = 0 # Índice da primeira linha visível
+        self.visible_rows = HISTORY_VISIBLE_ROWS
+        self._buffer = []
+        self._buffer_start = 0
+        self._visible = []
+
+        self.start_var = StringVar()
+        self.end_var = StringVar()
+        self.meal_var = StringVar(value=ALL_MEALS_OPTION)
+        self.glicemia_min_var = StringVar()
+        self.glicemia_max_var = StringVar()
+        self.text_var = StringVar()
+
+        self._build_ui()
+        # Recarrega ao voltar para a aba: os dados podem ter mudado no registro diário
+        self.bind("<Map>", lambda event: self.refresh())
+
+    def _build_ui(self):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=0)
+        self.grid_rowconfigure(1, weight=0)
+        self.grid_rowconfigure(2, weight=1)
+        self.grid_rowconfigure(3, weight=0)
+
+        ttk.Label(self, text="Histórico de Registros", style="Heading.TLabel").grid(row=0, column=0, pady=(15, 20), sticky="ew", padx=20)
+        self._create_filters_frame(self, 1)
+        self._create_table_frame(self, 2)
+
+        self.status_label = ttk.Label(self, text="", style="TLabel")
+        self.status_label.grid(row=3, column=0, sticky="w", padx=20, pady=(5, 15))
+
+    def _create_filters_frame(self, parent, row):
+        filters_frame = ttk.Frame(parent, style="DateNav.TFrame", padding=(10, 5))
+        filters_frame.grid(row=row, column=0, sticky="ew", pady=(0, 15), padx=20)
+
+        ttk.Label(filters_frame, text="Início:").grid(row=0, column=0, padx=(0, 4), sticky="w")
+        start_entry = ttk.Entry(filters_frame, textvariable=self.start_var, width=11)
+        start_entry.grid(row=0, column=1, padx=(0, 10))
+        ToolTip(start_entry, "DD/MM/AAAA (opcional)")
+
+        ttk.Label(filters_frame, text="Fim:").grid(row=0, column=2, padx=(0, 4), sticky="w")
+        end_entry = ttk.Entry(filters_frame, textvariable=self.end_var, width=11)
+        end_entry.grid(row=0, column=3, padx=(0, 10))
+        ToolTip(end_entry, "DD/MM/AAAA (opcional)")
+
+        ttk.Label(filters_frame, text="Refeição:").grid(row=0, column=4, padx=(0, 4), sticky="w")
+        ttk.Combobox(filters_frame, textvariable=self.meal_var, values=[ALL_MEALS_OPTION] + MEALS,
+                     state="readonly", width=14).grid(row=0, column=5, padx=(0, 10))
+
+        ttk.Label(filters_frame, text="Glicemia:").grid(row=0, column=6, padx=(0, 4), sticky="w")
+        ttk.Entry(filters_frame, textvariable=self.glicemia_min_var, width=6).grid(row=0, column=7)
+        ttk.Label(filters_frame, text="a").grid(row=0, column=8, padx=4)
+        ttk.Entry(filters_frame, textvariable=self.glicemia_max_var, width=6).grid(row=0, column=9, padx=(0, 10))
+
+        ttk.Button(filters_frame, text="Filtrar", command=self.apply_filters, style="TButton").grid(row=0, column=10, padx=4)
+        ttk.Button(filters_frame, text="Limpar", command=self.clear_filters, style="TButton").grid(row=0, column=11, padx=4)
+
+        ttk.Label(filters_frame, text="Buscar:").grid(row=1, column=0, padx=(0, 4), pady=(8, 0), sticky="w")
+        search_entry = ttk.Entry(filters_frame, textvariable=self.text_var)
+        search_entry.grid(row=1, column=1, columnspan=9, padx=(0, 10), pady=(8, 0), sticky="ew")
+        search_entry.bind("<Return>", lambda event: self.apply_filters())
+        ToolTip(search_entry, "Palavras nas observações (alimentos, sintomas, exercícios). Todas precisam aparecer; acentos são ignorados.")
+
+    def _create_table_frame(self, parent, row):
+        table_frame = ttk.Frame(parent, style="Panel.TFrame")
+        table_frame.grid(row=row, column=0, sticky="nsew", padx=20)
+        table_frame.grid_columnconfigure(0, weight=1)
+        table_frame.grid_rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(table_frame, columns=[c for c, _, _ in HISTORY_COLUMNS], show="headings",
+                                 height=self.visible_rows, selectmode="browse")
+        for column, heading, width in HISTORY_COLUMNS:
+            if column in SORTABLE_COLUMNS:
+                self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            else:
+                self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="w" if column in ("date", "meal", "observations") else "e",
+                             stretch=column == "observations")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        # A barra de rolagem representa o total de linhas do filtro, não os itens da árvore
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_mousewheel)
+        self.tree.bind("<Prior>", lambda event: self._scroll_to(self.offset - self.visible_rows) or "break")
+        self.tree.bind("<Next>", lambda event: self._scroll_to(self.offset + self.visible_rows) or "break")
+        self.tree.bind("<Home>", lambda event: self._scroll_to(0) or "break")
+        self.tree.bind("<End>", lambda event: self._scroll_to(self.total_rows) or "break")
+        self.tree.bind("<Double-1>", self._open_selected_day)
+        self._update_sort_headings()
+
+    # --- Filtros e ordenação ---
+
+    def _parse_filters(self) -> dict | None:
+        filters = {}
+        for var, key, label in ((self.start_var, "start", "Início"), (self.end_var, "end", "Fim")):
+            text = var.get().strip()
+            if not text:
+                continue
+            try:
+                filters[key] = dt.datetime.strptime(text, "%d/%m/%Y").date().isoformat()
+            except ValueError:
+                messagebox.showerror("Data inválida", f"Data de {label} inválida: {text}. Use DD/MM/AAAA.")
+                return None
+
+        if self.text_var.get().strip():
+            filters["text"] = self.text_var.get().strip()
+
+        if self.meal_var.get() != ALL_MEALS_OPTION:
+            filters["meal"] = self.meal_var.get()
+
+        for var, key in ((self.glicemia_min_var, "glicemia_min"), (self.glicemia_max_var, "glicemia_max")):
+            is_valid, value, error_msg = self.service.validate_numeric_input(var.get().strip(), "glicemia")
+            if not is_valid:
+                messagebox.showerror("Erro de Entrada", error_msg)
+                return None
+            if value is not None:
+                filters[key] = value
+        return filters
+
+    def apply_filters(self):
+        filters = self._parse_filters()
+        if filters is None:
+            return
+        self.filters = filters
+        self.offset = 0
+        self.refresh()
+
+    def clear_filters(self):
+        for var in (self.start_var, self.end_var, self.glicemia_min_var, self.glicemia_max_var, self.text_var):
+            var.set("")
+        self.meal_var.set(ALL_MEALS_OPTION)
+        self.filters = {}
+        self.offset = 0
+        self.refresh()
+
+    def sort_by(self, column: str):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        self._update_sort_headings()
+        self.offset = 0
+        self.refresh()
+
+    def _update_sort_headings(self):
+        for column, heading, _ in HISTORY_COLUMNS:
+            if column == self.sort_column:
+                heading += " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(column, text=heading)
+
+    # --- Janela virtual ---
+
+    @timed("ui")
+    def refresh(self):
+        """Relê o total de linhas e a janela atual (mantendo a posição de rolagem)."""
+        self._buffer = []
+        self._buffer_start = 0
+        self.total_rows = self.service.count_history_rows(self.filters)
+        self.offset = max(0, min(self.offset, self.total_rows - self.visible_rows))
+        self._render()
+
+    def _fetch(self, **kwargs) -> list:
+        return self.service.get_history_page(self.filters, self.sort_column, self.sort_descending, **kwargs)
+
+    def _ensure_window(self, offset: int):
+        """Garante que o buffer contém as linhas [offset, offset + visible_rows)."""
+        end = min(offset + self.visible_rows, self.total_rows)
+        buffer_end = self._buffer_start + len(self._buffer)
+        if self._buffer_start <= offset and end <= buffer_end:
+            return
+
+        if self._buffer and self._buffer_start <= offset <= buffer_end + HISTORY_BUFFER_ROWS:
+            # Rolagem para baixo: continua a partir da última chave do buffer
+            page = self._fetch(after_row=self._buffer[-1], limit=end - buffer_end + HISTORY_BUFFER_ROWS)
+            self._buffer.extend(page)
+        elif self._buffer and self._buffer_start - HISTORY_BUFFER_ROWS <= offset < self._buffer_start and end <= buffer_end:
+            # Rolagem para cima: lê para trás a partir da primeira chave do buffer
+            first_needed = max(0, offset - HISTORY_BUFFER_ROWS)
+            page = self._fetch(before_row=self._buffer[0], limit=self._buffer_start - first_needed)
+            self._buffer[:0] = page
+            self._buffer_start -= len(page)
+        else:
+            # Salto (barra de rolagem arrastada, Home/End): posiciona por OFFSET uma única vez
+            self._buffer_start = max(0, offset - HISTORY_BUFFER_ROWS)
+            self._buffer = self._fetch(offset=self._buffer_start, limit=self.visible_rows + 2 * HISTORY_BUFFER_ROWS)
+
+        # Descarta o que ficou longe da janela visível
+        keep_from = max(self._buffer_start, offset - HISTORY_BUFFER_ROWS)
+        keep_to = offset + self.visible_rows + HISTORY_BUFFER_ROWS
+        self._buffer = self._buffer[keep_from - self._buffer_start:keep_to - self._buffer_start]
+        self._buffer_start = keep_from
+
+    @staticmethod
+    def _format_row(row) -> tuple:
+        date_iso, meal, carbs, glicemia, lispro, bolus, observations = row
+        numbers = ["" if v is None else f"{v:.1f}" for v in (carbs, glicemia, lispro, bolus)]
+        return (dt.date.fromisoformat(date_iso).strftime("%d/%m/%Y"), meal, *numbers, observations or "")
+
+    def _render(self):
+        self._ensure_window(self.offset)
+        start = self.offset - self._buffer_start
+        self._visible = self._buffer[start:start + self.visible_rows]
+
+        # Reaproveita os itens já existentes na árvore em vez de recriá-los
+        items = self.tree.get_children()
+        for i, row in enumerate(self._visible):
+            if i < len(items):
+                self.tree.item(items[i], values=self._format_row(row))
+            else:
+                self.tree.insert("", "end", values=self._format_row(row))
+        if len(items) > len(self._visible):
+            self.tree.delete(*items[len(self._visible):])
+
+        if self.total_rows:
+            first = self.offset / self.total_rows
+            last = min(self.offset + self.visible_rows, self.total_rows) / self.total_rows
+            self.scrollbar.set(first, last)
+            self.status_label.config(
+                text=f"Linhas {self.offset + 1}–{self.offset + len(self._visible)} de {self.total_rows}")
+        else:
+            self.scrollbar.set(0.0, 1.0)
+            self.status_label.config(text="Nenhum registro encontrado.")
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, self.total_rows - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.tree.selection_remove(self.tree.selection())
+            self._render()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self.total_rows))
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self._scroll_to(self.offset + int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        if event.delta:
+            self._scroll_to(self.offset - 3 * int(event.delta / 120))
+        elif event.num == 4:
+            self._scroll_to(self.offset - 3)
+        elif event.num == 5:
+            self._scroll_to(self.offset + 3)
+        return "break" # Não deixa o bind_all da aba de registro rolar junto
+
+    def _open_selected_day(self, event=None):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        index = self.tree.index(selection[0])
+        if index < len(self._visible):
+            self.app_instance.notebook.select(self.app_instance.daily_entry_tab_instance)
+            self.app_instance.load_day_data_with_confirmation(self._visible[index][0])
@@ -0,0 +1,235 @@
+# instrumentation.py
+#
+# Instrumentação opcional dos caminhos quentes (consultas do Database,
+# métodos do serviço, callbacks da UI e fases do PDF). Desligada por padrão:
+# ative com CARB_TRACKER_INSTRUMENT=1 ou pelo painel de diagnóstico.
+# Com CARB_TRACKER_PROFILE=<arquivo.prof> a sessão inteira roda sob cProfile.
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+RING_BUFFER_SIZE = 5000
+
+_enabled = os.environ.get("CARB_TRACKER_INSTRUMENT", "") not in ("", "0")
+_records = deque(maxlen=RING_BUFFER_SIZE)
+_local = threading.local()
+_databases = weakref.WeakSet()
+_profiler = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _set_sql_trace(db, callback):
+    try:
+        db.conn.set_trace_callback(callback)
+    except Exception:
+        # Conexão já fechada (ex.: durante backup/restauração)
+        pass
+
+
+def enable():
+    global _enabled
+    _enabled = True
+    for db in list(_databases):
+        _set_sql_trace(db, _note_sql)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    for db in list(_databases):
+        _set_sql_trace(db, None)
+
+
+def clear():
+    _records.clear()
+
+
+def records() -> list[dict]:
+    return list(_records)
+
+
+def register_database(db):
+    """Registra um Database para que o texto SQL de suas consultas seja anexado às medições."""
+    _databases.add(db)
+    if _enabled:
+        _set_sql_trace(db, _note_sql)
+
+
+def _span_stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _note_sql(statement: str):
+    stack = _span_stack()
+    if stack:
+        stack[-1].setdefault("sql", []).append(" ".join(statement.split()))
+
+
+def _push(category: str, name: str, extra: dict) -> dict:
+    record = {"category": category, "name": name, "timestamp": time.time(), **extra}
+    _span_stack().append(record)
+    record["_t0"] = time.perf_counter()
+    return record
+
+
+def _remove_from_stack(record: dict):
+    stack = _span_stack()
+    # Geradores abandonados fecham fora de ordem: remove pela identidade, onde estiver
+    for i in range(len(stack) - 1, -1, -1):
+        if stack[i] is record:
+            del stack[i]
+            break
+
+
+def _pop(record: dict, elapsed_ms: float = 0.0):
+    """Encerra a medição; elapsed_ms soma trechos já medidos (geradores suspensos e retomados)."""
+    record["duration_ms"] = elapsed_ms + (time.perf_counter() - record.pop("_t0")) * 1000
+    _remove_from_stack(record)
+    _records.append(record)
+
+
+def _suspend(record: dict) -> float:
+    """Tira a medição da pilha enquanto o gerador está suspenso; retorna os ms do trecho encerrado."""
+    _remove_from_stack(record)
+    return (time.perf_counter() - record.pop("_t0")) * 1000
+
+
+def _resume(record: dict):
+    _span_stack().append(record)
+    record["_t0"] = time.perf_counter()
+
+
+@contextmanager
+def span(category: str, name: str, **extra):
+    """Mede um bloco de código; sem instrumentação ativa, não faz nada."""
+    if not _enabled:
+        yield None
+        return
+    record = _push(category, name, extra)
+    try:
+        yield record
+    finally:
+        _pop(record)
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], (list, dict)):
+        return len(result[1])
+    return None
+
+
+def timed(category: str, name: str | None = None):
+    """
+    Decorador que registra a duração de cada chamada. Para funções geradoras,
+    soma só o tempo gasto dentro do gerador, do primeiro next() ao
+    esgotamento, e conta as linhas produzidas: enquanto está suspenso, o
+    SQL e as medições de quem consome não são atribuídos a ele.
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if not _enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                record = _push(category, label, {})
+                rows = 0
+                elapsed_ms = 0.0
+                try:
+                    for item in func(*args, **kwargs):
+                        rows += 1
+                        elapsed_ms += _suspend(record)
+                        try:
+                            yield item
+                        finally:
+                            _resume(record)
+                finally:
+                    record["rows"] = rows
+                    _pop(record, elapsed_ms)
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            record = _push(category, label, {})
+            try:
+                result = func(*args, **kwargs)
+                rows = _row_count(result)
+                if rows is not None:
+                    record["rows"] = rows
+                return result
+            finally:
+                _pop(record)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def latency_summary() -> list[dict]:
+    """Contagem, p50, p95 e máximo (ms) por (categoria, nome), do mais lento (p95) para o mais rápido."""
+    durations: dict[tuple[str, str], list[float]] = {}
+    for record in list(_records):
+        durations.setdefault((record["category"], record["name"]), []).append(record["duration_ms"])
+    summary = []
+    for (category, name), values in durations.items():
+        values.sort()
+        summary.append({
+            "category": category,
+            "name": name,
+            "count": len(values),
+            "p50_ms": _percentile(values, 50),
+            "p95_ms": _percentile(values, 95),
+            "max_ms": values[-1],
+        })
+    summary.sort(key=lambda item: item["p95_ms"], reverse=True)
+    return summary
+
+
+def dump_json(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"records": records(), "summary": latency_summary()}, f, indent=2, ensure_ascii=False)
+
+
+def start_session_profile():
+    """Inicia o cProfile da sessão se CARB_TRACKER_PROFILE apontar para um arquivo de saída."""
+    global _profiler
+    if not os.environ.get("CARB_TRACKER_PROFILE") or _profiler is not None:
+        return
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+
+def stop_session_profile():
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.dump_stats(os.environ["CARB_TRACKER_PROFILE"])
+    _profiler = None
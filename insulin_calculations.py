@@ -0,0 +1,99 @@
+# insulin_calculations.py
+#
+# Cálculos de dose sem dependência de Tk: usados pelas abas de calculadora
+# e pelo serviço para recalcular doses sobre o histórico inteiro.
+
+import numpy as np
+
+FSI_RULE_CONSTANT = 1800
+
+
+def calculate_bolus(carbs: float, glicemia_atual: float, glicemia_alvo: float,
+                    carb_ratio: float, fsi: float) -> tuple[float, float, float]:
+    """
+    Retorna (insulina total, bolus de carboidratos, bolus de correção) em UI:
+    carbs / carb_ratio + (glicemia_atual - glicemia_alvo) / fsi.
+    """
+    if carb_ratio <= 0 or fsi <= 0:
+        raise ValueError("Relação Carboidrato/Insulina e FSI devem ser maiores que zero.")
+    bolus_carbs = carbs / carb_ratio
+    bolus_correcao = (glicemia_atual - glicemia_alvo) / fsi
+    return bolus_carbs + bolus_correcao, bolus_carbs, bolus_correcao
+
+
+def calculate_fsi(total_daily_insulin: float, rule_constant: float = FSI_RULE_CONSTANT) -> float:
+    """Fator de sensibilidade pela regra dos 1800: rule_constant / insulina total diária."""
+    if total_daily_insulin <= 0:
+        raise ValueError("A Insulina Total Diária deve ser maior que zero.")
+    return rule_constant / total_daily_insulin
+
+
+def calculate_bolus_batch(carbs, glicemia_atual, glicemia_alvo, carb_ratio, fsi) -> dict:
+    """
+    Versão vetorizada de calculate_bolus. Aceita escalares ou arrays
+    (com broadcasting); NaN em carbs ou glicemia zera a parcela correspondente.
+    Retorna um dict com os arrays "total", "bolus_carbs" e "bolus_correcao".
+    """
+    carbs = np.asarray(carbs, dtype=np.float64)
+    glicemia_atual = np.asarray(glicemia_atual, dtype=np.float64)
+    carb_ratio = np.asarray(carb_ratio, dtype=np.float64)
+    fsi = np.asarray(fsi, dtype=np.float64)
+    if np.any(carb_ratio <= 0) or np.any(fsi <= 0):
+        raise ValueError("Relação Carboidrato/Insulina e FSI devem ser maiores que zero.")
+
+    bolus_carbs = np.nan_to_num(carbs / carb_ratio, nan=0.0)
+    bolus_correcao = np.nan_to_num((glicemia_atual - glicemia_alvo) / fsi, nan=0.0)
+    return {
+        "total": bolus_carbs + bolus_correcao,
+        "bolus_carbs": bolus_carbs,
+        "bolus_correcao": bolus_correcao,
+    }
+
+
+def calculate_fsi_batch(total_daily_insulin, rule_constant: float = FSI_RULE_CONSTANT) -> np.ndarray:
+    """FSI para vários totais diários; dias sem insulina (<= 0 ou NaN) resultam em NaN."""
+    total_daily_insulin = np.asarray(total_daily_insulin, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total_daily_insulin > 0, rule_constant / total_daily_insulin, np.nan)
+
+
+def compare_logged_doses(rows, carb_ratio, fsi, glicemia_alvo: float, tolerance: float = 1.0) -> dict:
+    """
+    Recalcula, em uma única passada vetorizada, a dose sugerida para cada
+    linha de entries (date, meal, carbs, glicemia, lispro, bolus, observations)
+    e compara com a dose registrada (lispro + bolus).
+
+    carb_ratio e fsi podem ser escalares ou funções meal -> valor (perfis por refeição).
+    Retorna um resumo e a lista de discrepâncias acima de tolerance (UI).
+    """
+    rows = [row for row in rows if row[2] is not None or row[4] is not None or row[5] is not None]
+    if not rows:
+        return {"rows": 0, "discrepancies": [], "mean_abs_diff": None, "mean_diff": None}
+
+    dates, meals, carbs, glicemia, lispro, bolus, _obs = zip(*rows)
+    if callable(carb_ratio):
+        carb_ratio = [carb_ratio(meal) for meal in meals]
+    if callable(fsi):
+        fsi = [fsi(meal) for meal in meals]
+
+    suggested = calculate_bolus_batch(carbs, glicemia, glicemia_alvo, carb_ratio, fsi)
+    logged = np.nan_to_num(np.array(lispro, dtype=np.float64)) + np.nan_to_num(np.array(bolus, dtype=np.float64))
+    diff = logged - suggested["total"]
+
+    flagged = np.flatnonzero(np.abs(diff) > tolerance)
+    discrepancies = [
+        {
+            "date": dates[i],
+            "meal": meals[i],
+            "logged": float(logged[i]),
+            "suggested": float(suggested["total"][i]),
+            "difference": float(diff[i]),
+        }
+        for i in flagged
+    ]
+    return {
+        "rows": len(rows),
+        "discrepancies": discrepancies,
+        "mean_abs_diff": float(np.abs(diff).mean()),
+        "mean_diff": float(diff.mean()),
+    }
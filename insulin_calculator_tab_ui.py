@@ -2,6 +2,8 @@
 
 from tkinter import StringVar, messagebox, ttk
 from tooltip import ToolTip
+from insulin_calculations import calculate_bolus
+from constants import FIXED_MEALS, DYNAMIC_MEAL_PREFIX
 
 class InsulinCalculatorTabUI(ttk.Frame):
     def __init__(self, master, app_instance):
@@ -39,7 +41,14 @@ class InsulinCalculatorTabUI(ttk.Frame):
             "fsi": "Fator de Sensibilidade à Insulina (mg/dL/UI):"
         }
 
-        row_idx = 0
+        self.meal_var = StringVar()
+        ttk.Label(input_frame, text="Refeição (perfil de dose):", style="TLabel").grid(row=0, column=0, sticky="w", pady=5, padx=10)
+        meal_combobox = ttk.Combobox(input_frame, textvariable=self.meal_var, values=FIXED_MEALS + [DYNAMIC_MEAL_PREFIX], state="readonly")
+        meal_combobox.grid(row=0, column=1, sticky="ew", pady=5, padx=10)
+        meal_combobox.bind("<<ComboboxSelected>>", lambda event: self._prefill_from_profile(self.meal_var.get()))
+        ToolTip(meal_combobox, "Preenche a relação carboidrato/insulina e o FSI com o perfil salvo ou ajustado para a refeição.")
+
+        row_idx = 1
         for key, text in labels_texts.items():
             ttk.Label(input_frame, text=text, style="TLabel").grid(row=row_idx, column=0, sticky="w", pady=5, padx=10)
             entry = ttk.Entry(input_frame, textvariable=self.vars[key], width=15)
@@ -52,10 +61,47 @@ class InsulinCalculatorTabUI(ttk.Frame):
 
         button_frame = ttk.Frame(self, style="Panel.TFrame", padding=(20, 15))
         button_frame.grid(row=3, column=0, pady=(0, 20), sticky="ew", padx=20)
-        button_frame.grid_columnconfigure((0, 1), weight=1)
+        button_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
         ttk.Button(button_frame, text="Calcular", command=self._calculate_insulin, style="TButton").grid(row=0, column=0, padx=8, sticky="ew")
         ttk.Button(button_frame, text="Limpar", command=self._clear_fields, style="TButton").grid(row=0, column=1, padx=8, sticky="ew")
+        history_button = ttk.Button(button_frame, text="Comparar com Histórico", command=self._compare_with_history, style="TButton")
+        history_button.grid(row=0, column=2, padx=8, sticky="ew")
+        ToolTip(history_button, "Recalcula a dose sugerida para todas as refeições registradas e compara com as doses aplicadas.")
+        ttk.Button(button_frame, text="Salvar Perfil", command=self._save_profile, style="TButton").grid(row=0, column=3, padx=8, sticky="ew")
+
+        self._prefill_from_profile(None)
+
+    def _prefill_from_profile(self, meal):
+        """Preenche relação, FSI e alvo a partir do perfil em cache (sem meal: refeição da hora atual)."""
+        service = self.app_instance.service
+        meal, profile = service.get_dosing_profile(meal or None)
+        self.meal_var.set(meal)
+        if profile:
+            if profile["carb_ratio"]:
+                self.vars["carb_ratio"].set(f"{profile['carb_ratio']:.1f}")
+            if profile["fsi"]:
+                self.vars["fsi"].set(f"{profile['fsi']:.1f}")
+        glicemia_alvo = (profile or {}).get("glicemia_alvo") or service.get_config("glicemia_alvo")
+        if glicemia_alvo is not None and not self.vars["glicemia_alvo"].get():
+            self.vars["glicemia_alvo"].set(f"{float(glicemia_alvo):.0f}")
+
+    def _save_profile(self):
+        meal = self.meal_var.get()
+        if not meal:
+            return messagebox.showerror("Erro de Entrada", "Selecione a refeição do perfil.")
+        carb_ratio, err = self._validate_input(self.vars["carb_ratio"].get(), "Relação Carboidrato/Insulina")
+        if err: return messagebox.showerror("Erro de Entrada", err)
+        fsi, err = self._validate_input(self.vars["fsi"].get(), "Fator de Sensibilidade à Insulina")
+        if err: return messagebox.showerror("Erro de Entrada", err)
+        glicemia_alvo, err = self._validate_input(self.vars["glicemia_alvo"].get(), "Glicemia Alvo (mg/dL)")
+        if err: glicemia_alvo = None
+
+        success, message = self.app_instance.service.save_dosing_profile(meal, carb_ratio, fsi, glicemia_alvo)
+        if success:
+            messagebox.showinfo("Perfil Salvo", message)
+        else:
+            messagebox.showerror("Erro", message)
 
     def _validate_input(self, value_str, field_name):
         if not value_str:
@@ -84,15 +130,41 @@ class InsulinCalculatorTabUI(ttk.Frame):
             messagebox.showerror("Erro de Cálculo", "Relação Carboidrato/Insulina e FSI não podem ser zero.")
             return
 
-        bolus_carbs = carbs / carb_ratio
-        bolus_correcao = (glicemia_atual - glicemia_alvo) / fsi
-
-        total_insulina = bolus_carbs + bolus_correcao
+        total_insulina, bolus_carbs, bolus_correcao = calculate_bolus(carbs, glicemia_atual, glicemia_alvo, carb_ratio, fsi)
 
         self.result_var.set(f"Insulina Total Necessária: {total_insulina:.1f} UI\n"
                             f"(Bolus Carboidratos: {bolus_carbs:.1f} UI, Bolus Correção: {bolus_correcao:.1f} UI)")
 
+    def _compare_with_history(self):
+        glicemia_alvo, err = self._validate_input(self.vars["glicemia_alvo"].get(), "Glicemia Alvo (mg/dL)")
+        if err: return messagebox.showerror("Erro de Entrada", err)
+        carb_ratio, err = self._validate_input(self.vars["carb_ratio"].get(), "Relação Carboidrato/Insulina")
+        if err: return messagebox.showerror("Erro de Entrada", err)
+        fsi, err = self._validate_input(self.vars["fsi"].get(), "Fator de Sensibilidade à Insulina")
+        if err: return messagebox.showerror("Erro de Entrada", err)
+
+        result = self.app_instance.service.get_dose_discrepancies(carb_ratio, fsi, glicemia_alvo)
+        if not result["rows"]:
+            messagebox.showinfo("Comparação com Histórico", "Não há refeições registradas para comparar.")
+            return
+
+        discrepancies = result["discrepancies"]
+        msg = (
+            f"Refeições analisadas: {result['rows']}\n"
+            f"Diferença média (aplicada - sugerida): {result['mean_diff']:+.1f} UI\n"
+            f"Diferença absoluta média: {result['mean_abs_diff']:.1f} UI\n"
+            f"Refeições com diferença acima de 1 UI: {len(discrepancies)}"
+        )
+        largest = sorted(discrepancies, key=lambda d: abs(d["difference"]), reverse=True)[:5]
+        if largest:
+            msg += "\n\nMaiores diferenças:"
+            for d in largest:
+                msg += (f"\n  • {d['date']} {d['meal']}: aplicada {d['logged']:.1f} UI, "
+                        f"sugerida {d['suggested']:.1f} UI")
+        messagebox.showinfo("Comparação com Histórico", msg)
+
     def _clear_fields(self):
         for var in self.vars.values():
             var.set("")
-        self.result_var.set("")
\ No newline at end of file
+        self.result_var.set("")
+        self._prefill_from_profile(self.meal_var.get())
\ No newline at end of file
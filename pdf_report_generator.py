@@ -1,6 +1,8 @@
 # pdf_report_generator.py
 
 import datetime as dt
+from typing import Iterable
+
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import cm
@@ -12,10 +14,68 @@ from reportlab.platypus import (
     Spacer,
 )
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.graphics.shapes import Drawing, PolyLine, Rect, String, Circle
+
+from analytics_engine import AnalyticsEngine
+from charts import CHART_SERIES, ChartData, date_label, to_pixels
+from domain_models import DayRecord
+from instrumentation import span, timed
+
+PDF_CHART_WIDTH = 18 * cm
+PDF_CHART_HEIGHT = 4.5 * cm
+# Margens internas (em pontos) do gráfico: rótulos do eixo y à esquerda, datas embaixo, título em cima
+PDF_CHART_PADDING = (34, 14, 6, 14)
 
 class PdfReportGenerator:
     @staticmethod
-    def generate_report(filename: str, start_br: str, end_br: str, rows: list, glargina_by_date: dict):
+    def _chart_drawing(chart_data: ChartData, key: str, title: str, color: str,
+                       width: float = PDF_CHART_WIDTH, height: float = PDF_CHART_HEIGHT) -> Drawing | None:
+        """Gráfico vetorial de uma série diária, a partir da mesma série reduzida usada na aba Gráficos."""
+        y_range = chart_data.y_range(key)
+        if y_range is None:
+            return None
+        pad_left, pad_bottom, pad_right, pad_top = PDF_CHART_PADDING
+        box = (pad_left, pad_bottom, width - pad_left - pad_right, height - pad_bottom - pad_top)
+        x_range = chart_data.x_range()
+
+        drawing = Drawing(width, height)
+        drawing.add(String(pad_left, height - 10, title, fontName="Helvetica-Bold", fontSize=8))
+        if key == "glicemia" and chart_data.target_range:
+            low = max(chart_data.target_range[0], y_range[0])
+            high = min(chart_data.target_range[1], y_range[1])
+            band = to_pixels([x_range[0], x_range[1]], [low, high], x_range, y_range, box, flip_y=False)
+            drawing.add(Rect(band[0], band[1], band[2] - band[0], band[3] - band[1],
+                             fillColor=colors.HexColor("#E8F5E9"), strokeColor=None))
+        drawing.add(Rect(box[0], box[1], box[2], box[3], fillColor=None, strokeColor=colors.grey, strokeWidth=0.5))
+        for value, y in ((y_range[0], box[1]), (y_range[1], box[1] + box[3])):
+            drawing.add(String(pad_left - 3, y - 3, f"{value:g}", fontSize=7, textAnchor="end"))
+        drawing.add(String(box[0], 3, date_label(x_range[0]), fontSize=7))
+        drawing.add(String(box[0] + box[2], 3, date_label(x_range[1]), fontSize=7, textAnchor="end"))
+
+        stroke = colors.HexColor(color)
+        # O PDF é ampliável: reduz para o dobro da largura em pontos
+        for seg_x, seg_y in chart_data.plot_segments(key, 2 * box[2]):
+            points = to_pixels(seg_x, seg_y, x_range, y_range, box, flip_y=False)
+            if len(points) == 2:
+                drawing.add(Circle(points[0], points[1], 1.0, fillColor=stroke, strokeColor=None))
+            else:
+                drawing.add(PolyLine(points, strokeColor=stroke, strokeWidth=0.7))
+        return drawing
+
+    @staticmethod
+    @timed("pdf")
+    def generate_report(filename: str, start_br: str, end_br: str, days: Iterable[DayRecord],
+                        analytics: AnalyticsEngine | None = None, glycemic_metrics: dict | None = None,
+                        include_charts: bool = True):
+        # Os totais diários e do período vêm do motor colunar; se não for fornecido, é montado a partir dos dias.
+        # Com o motor fornecido, days é percorrido uma única vez e pode ser um iterador (CarbTrackerService.iter_report_days).
+        with span("pdf", "aggregate"):
+            if analytics is None:
+                days = list(days)
+                analytics = AnalyticsEngine.from_day_records(days)
+            daily = analytics.per_day()
+            period = analytics.period_totals()
+
         doc = SimpleDocTemplate(filename, pagesize=A4, leftMargin=1.5 * cm, rightMargin=1.5 * cm)
         styles = getSampleStyleSheet()
         story = []
@@ -24,18 +84,17 @@ class PdfReportGenerator:
         story.append(Paragraph(title, styles["Heading1"]))
         story.append(Spacer(1, 12))
 
-        data_by_date_iso = {}
-        for date_iso, meal, carbs, glicemia, lispro, bolus, observations in rows:
-            data_by_date_iso.setdefault(date_iso, []).append(
-                [meal,
-                 f"{carbs:.1f}" if carbs is not None else "",
-                 f"{glicemia:.1f}" if glicemia is not None else "",
-                 f"{lispro:.1f}" if lispro is not None else "",
-                 f"{bolus:.1f}" if bolus is not None else "",
-                 observations if observations is not None else ""]
-            )
-
-        all_dates_iso = sorted(list(set(list(data_by_date_iso.keys()) + list(glargina_by_date.keys()))))
+        if include_charts and analytics.n_days > 1:
+            with span("pdf", "charts"):
+                target_range = None
+                if glycemic_metrics:
+                    target_range = (glycemic_metrics["low_threshold"], glycemic_metrics["high_threshold"])
+                chart_data = ChartData.from_analytics(analytics, target_range)
+                for key, chart_title, color in CHART_SERIES:
+                    drawing = PdfReportGenerator._chart_drawing(chart_data, key, chart_title, color)
+                    if drawing is not None:
+                        story.append(drawing)
+                        story.append(Spacer(1, 8))
 
         head = ["Refeição", "Carbs (g)", "Glicemia", "Lispro (UI)", "Bolus (UI)", "Observações"]
         tbl_style = TableStyle(
@@ -49,15 +108,21 @@ class PdfReportGenerator:
             ]
         )
 
-        grand_totals = {"carbs": 0.0, "glicemia_sum": 0.0, "glicemia_count": 0, "lispro": 0.0, "bolus": 0.0, "glargina_sum": 0.0, "glargina_count": 0}
-
-        for date_iso in all_dates_iso:
-            date_br = dt.date.fromisoformat(date_iso).strftime("%d/%m/%Y")
+        for record in days:
+            date_br = dt.date.fromordinal(record.day).strftime("%d/%m/%Y")
             story.append(Paragraph(f"<b>Data: {date_br}</b>", styles["Heading3"]))
             story.append(Spacer(1, 5))
 
-            if date_iso in data_by_date_iso:
-                tbl_data = [head] + data_by_date_iso[date_iso]
+            if record.meals:
+                tbl_data = [head] + [
+                    [entry.meal,
+                     f"{entry.carbs:.1f}" if entry.carbs is not None else "",
+                     f"{entry.glicemia:.1f}" if entry.glicemia is not None else "",
+                     f"{entry.lispro:.1f}" if entry.lispro is not None else "",
+                     f"{entry.bolus:.1f}" if entry.bolus is not None else "",
+                     entry.observations if entry.observations is not None else ""]
+                    for entry in record.meals.values()
+                ]
                 col_widths = [2.0*cm, 2.0*cm, 2.0*cm, 2.0*cm, 2.0*cm, 6.0*cm]
                 story.append(Table(tbl_data, colWidths=col_widths, style=tbl_style))
                 story.append(Spacer(1, 8))
@@ -65,73 +130,86 @@ class PdfReportGenerator:
                 story.append(Paragraph("<i>Nenhuma refeição registrada para este dia.</i>", styles["Normal"]))
                 story.append(Spacer(1, 8))
 
-            glargina_dose_day = glargina_by_date.get(date_iso, None)
-            if glargina_dose_day is not None:
-                story.append(Paragraph(f"<b>Insulina Glargina: {glargina_dose_day:.1f} UI</b>", styles["Normal"]))
-                if glargina_dose_day > 0:
-                    grand_totals["glargina_sum"] += glargina_dose_day
-                    grand_totals["glargina_count"] += 1
+            if record.glargina is not None:
+                story.append(Paragraph(f"<b>Insulina Glargina: {record.glargina:.1f} UI</b>", styles["Normal"]))
             else:
                 story.append(Paragraph("<i>Insulina Glargina: N/A</i>", styles["Normal"]))
 
-            d_tot = {"carbs": 0.0, "glicemia_sum": 0.0, "glicemia_count": 0, "lispro": 0.0, "bolus": 0.0}
-            if date_iso in data_by_date_iso:
-                for _meal, carbs_str, glic_str, lispro_str, bolus_str, _obs_str in data_by_date_iso[date_iso]:
-                    d_tot["carbs"] += float(carbs_str) if carbs_str else 0
-                    if glic_str:
-                        d_tot["glicemia_sum"] += float(glic_str)
-                        d_tot["glicemia_count"] += 1
-                    d_tot["lispro"] += float(lispro_str) if lispro_str else 0
-                    d_tot["bolus"] += float(bolus_str) if bolus_str else 0
-
-            daily_avg_glicemia = (
-                d_tot["glicemia_sum"] / d_tot["glicemia_count"]
-                if d_tot["glicemia_count"] > 0
-                else 0.0
-            )
+            day_idx = record.day - analytics.start_ordinal
+            daily_avg_glicemia = daily["glicemia"][day_idx] if daily["glicemia_count"][day_idx] > 0 else 0.0
 
             story.append(
                 Paragraph(
                     (
                         f"Totais do dia:<br/>"  # Adiciona quebra de linha aqui
-                        f"  <b>Carbs</b>: {d_tot['carbs']:.1f} g<br/>"  # Adiciona quebra de linha aqui
+                        f"  <b>Carbs</b>: {daily['carbs'][day_idx]:.1f} g<br/>"  # Adiciona quebra de linha aqui
                         f"  <b>Glicemia Média</b>: {daily_avg_glicemia:.1f} mg/dL<br/>"  # Adiciona quebra de linha aqui
-                        f"  <b>Lispro</b>: {d_tot['lispro']:.1f} UI<br/>"  # Adiciona quebra de linha aqui
-                        f"  <b>Bolus</b>: {d_tot['bolus']:.1f} UI"
+                        f"  <b>Lispro</b>: {daily['lispro'][day_idx]:.1f} UI<br/>"  # Adiciona quebra de linha aqui
+                        f"  <b>Bolus</b>: {daily['bolus'][day_idx]:.1f} UI"
                     ),
                     styles["Normal"],
                 )
             )
             story.append(Spacer(1, 12))
 
-            for k in ["carbs", "lispro", "bolus"]:
-                grand_totals[k] += d_tot[k]
-            grand_totals["glicemia_sum"] += d_tot["glicemia_sum"]
-            grand_totals["glicemia_count"] += d_tot["glicemia_count"]
-
-        period_avg_glicemia = (
-            grand_totals["glicemia_sum"] / grand_totals["glicemia_count"]
-            if grand_totals["glicemia_count"] > 0
-            else 0.0
-        )
-        period_avg_glargina = (
-            grand_totals["glargina_sum"] / grand_totals["glargina_count"]
-            if grand_totals["glargina_count"] > 0
-            else 0.0
-        )
-
         story.append(Paragraph("<b>Totais do período</b>", styles["Heading2"]))
         story.append(
             Paragraph(
                 (
-                    f"<b>Carboidratos</b>: {grand_totals['carbs']:.1f} g<br/>" # Adiciona <br/>
-                    f"<b>Glicemia Média</b>: {period_avg_glicemia:.1f} mg/dL<br/>" # Adiciona <br/>
-                    f"<b>Insulina Lispro total</b>: {grand_totals['lispro']:.1f} UI<br/>" # Adiciona <br/>
-                    f"<b>Bolus correção total</b>: {grand_totals['bolus']:.1f} UI<br/>" # Adiciona <br/>
-                    f"<b>Glargina média diária</b>: {period_avg_glargina:.1f} UI"
+                    f"<b>Carboidratos</b>: {period['carbs']:.1f} g<br/>" # Adiciona <br/>
+                    f"<b>Glicemia Média</b>: {period['avg_glicemia']:.1f} mg/dL<br/>" # Adiciona <br/>
+                    f"<b>Desvio padrão da glicemia</b>: {period['glicemia_std']:.1f} mg/dL<br/>"
+                    f"<b>Insulina Lispro total</b>: {period['lispro']:.1f} UI<br/>" # Adiciona <br/>
+                    f"<b>Bolus correção total</b>: {period['bolus']:.1f} UI<br/>" # Adiciona <br/>
+                    f"<b>Glargina média diária</b>: {period['avg_glargina']:.1f} UI"
                 ),
                 styles["Normal"],
             )
         )
 
-        doc.build(story)
\ No newline at end of file
+        if glycemic_metrics and glycemic_metrics["count"]:
+            story.append(Spacer(1, 12))
+            story.append(Paragraph("<b>Variabilidade glicêmica e tempo no alvo</b>", styles["Heading3"]))
+            story.append(
+                Paragraph(
+                    (
+                        f"<b>Alvo</b>: {glycemic_metrics['low_threshold']:.0f}–{glycemic_metrics['high_threshold']:.0f} mg/dL "
+                        f"({glycemic_metrics['count']} leituras)<br/>"
+                        f"<b>No alvo</b>: {glycemic_metrics['in_range_pct']:.1f}% | "
+                        f"<b>Acima</b>: {glycemic_metrics['above_pct']:.1f}% | "
+                        f"<b>Abaixo</b>: {glycemic_metrics['below_pct']:.1f}%<br/>"
+                        f"<b>Coeficiente de variação</b>: {glycemic_metrics['cv']:.1f}%<br/>"
+                        f"<b>HbA1c estimada</b>: {glycemic_metrics['estimated_a1c']:.1f}% | "
+                        f"<b>GMI</b>: {glycemic_metrics['gmi']:.1f}%"
+                    ),
+                    styles["Normal"],
+                )
+            )
+            tir_head = ["Refeição", "Leituras", "Média", "CV (%)", "No alvo (%)", "Acima (%)", "Abaixo (%)"]
+            tir_rows = [
+                [meal, str(m["count"]), f"{m['mean']:.1f}", f"{m['cv']:.1f}" if m["cv"] is not None else "",
+                 f"{m['in_range_pct']:.1f}", f"{m['above_pct']:.1f}", f"{m['below_pct']:.1f}"]
+                for meal, m in glycemic_metrics["per_meal"].items()
+            ]
+            if tir_rows:
+                story.append(Spacer(1, 6))
+                story.append(Table([tir_head] + tir_rows, style=tbl_style))
+
+        per_meal = analytics.per_meal()
+        if per_meal:
+            story.append(Spacer(1, 12))
+            story.append(Paragraph("<b>Resumo por refeição</b>", styles["Heading3"]))
+            meal_head = ["Refeição", "Registros", "Carbs médios (g)", "Glicemia média", "Desvio glicemia", "Lispro total (UI)"]
+            meal_rows = [
+                [meal,
+                 str(stats["entries"]),
+                 f"{stats['avg_carbs']:.1f}" if stats["avg_carbs"] is not None else "",
+                 f"{stats['avg_glicemia']:.1f}" if stats["avg_glicemia"] is not None else "",
+                 f"{stats['glicemia_std']:.1f}" if stats["glicemia_std"] is not None else "",
+                 f"{stats['lispro']:.1f}"]
+                for meal, stats in per_meal.items()
+            ]
+            story.append(Table([meal_head] + meal_rows, style=tbl_style))
+
+        with span("pdf", "build", flowables=len(story)):
+            doc.build(story)
@@ -0,0 +1,113 @@
+# report_cache.py
+
+import threading
+from collections import OrderedDict
+
+from instrumentation import timed
+
+# Limites do cache: número de resultados e tamanho aproximado somado (arrays
+# do motor colunar, bytes de PDF). Ao passar de qualquer um, saem os usados há mais tempo.
+REPORT_CACHE_MAX_ENTRIES = 64
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Tamanho estimado de um resultado pequeno (dicionário de totais) por item
+SMALL_RESULT_ITEM_BYTES = 256
+
+
+class ReportCache:
+    """
+    Resultados de relatórios (totais, agregados diários, bytes de PDF e
+    motores colunares carregados) com chave (tipo, dia inicial, dia final,
+    versão dos dados, ...) e descarte LRU. Quando a versão muda, tudo o que
+    era da versão anterior sai de uma vez: essas chaves nunca mais seriam
+    encontradas. Um período contido em outro já carregado (um mês dentro de
+    um trimestre) é atendido recortando o motor existente, sem ler o banco.
+    """
+
+    def __init__(self, max_entries: int = REPORT_CACHE_MAX_ENTRIES, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # chave -> (valor, tamanho)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: tuple, version):
+        """Valor guardado para key na versão indicada, ou None."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, version, value, size: int):
+        with self._lock:
+            if self._version is None:
+                self._version = version
+            # Resultado calculado sobre dados que já mudaram: não serve para ninguém
+            if version != self._version or size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def cached(self, key: tuple, version, compute, size_of=None):
+        """Devolve o valor de key, calculando com compute() e guardando se ainda não houver."""
+        value = self.get(key, version)
+        if value is None:
+            value = compute()
+            self.put(key, version, value, size_of(value) if size_of else SMALL_RESULT_ITEM_BYTES * max(len(value), 1))
+        return value
+
+    @timed("service", "ReportCache.analytics")
+    def analytics(self, version, start_day: int, end_day: int, load):
+        """
+        Motor colunar do período: o já carregado para exatamente esse
+        período, um recorte do menor período carregado que o contém, ou
+        load() como último recurso.
+        """
+        key = ("analytics", start_day, end_day)
+        engine = self.get(key, version)
+        if engine is not None:
+            return engine
+        with self._lock:
+            covering = [
+                value for (kind, start, end, *_), (value, _) in self._entries.items()
+                if kind == "analytics" and start <= start_day and end >= end_day
+            ]
+        if covering:
+            # Recorte: fatias (views) dos arrays do motor maior, sem cópia
+            engine = min(covering, key=lambda e: e.n_days).subrange(start_day, end_day)
+        else:
+            engine = load()
+        self.put(key, version, engine, engine.nbytes)
+        return engine
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = None
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
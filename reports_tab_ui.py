@@ -1,15 +1,19 @@
 # reports_tab_ui.py
 
 import datetime as dt
+import threading
 from tkinter import Tk, Label, Entry, Button, StringVar, ttk, messagebox, filedialog, Toplevel, Canvas, Text, Scrollbar
 import tkinter.font as tkFont
 
 from tkcalendar import DateEntry
 
 from carb_tracker_service import CarbTrackerService
-from pdf_report_generator import PdfReportGenerator
-from constants import MEALS, FIELDS, FIELD_NAMES_MAP, DB_FILE, CONFIG_FILE, APP_VERSION, LAST_UPDATED_DATE, FIXED_MEALS, DYNAMIC_MEAL_PREFIX
+from constants import MEALS, FIELDS, FIELD_NAMES_MAP, DB_FILE, CONFIG_FILE, APP_VERSION, LAST_UPDATED_DATE, FIXED_MEALS, DYNAMIC_MEAL_PREFIX, TRAILING_WINDOWS
 from tooltip import ToolTip
+from instrumentation import timed
+
+# Intervalo (ms) entre as verificações do PDF sendo gerado em segundo plano
+PDF_POLL_INTERVAL_MS = 100
 
 class ReportsTabUI(ttk.Frame):
     def __init__(self, master, service: CarbTrackerService, app_instance):
@@ -18,21 +22,26 @@ class ReportsTabUI(ttk.Frame):
         self.app_instance = app_instance
 
         self.total_label = None
+        self.date_format = self.service.get_config("report_date_format", "%d/%m/%Y")
+        self._last_totals_view = None # Última exibição de totais, refeita se o formato de data mudar
 
         self._build_ui()
+        self.service.subscribe_config(self._on_date_format_changed, keys=("report_date_format",))
 
     def _build_ui(self):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=0)
         self.grid_rowconfigure(1, weight=0)
         self.grid_rowconfigure(2, weight=0)
-        self.grid_rowconfigure(3, weight=1)
+        self.grid_rowconfigure(3, weight=0)
+        self.grid_rowconfigure(4, weight=1)
 
         ttk.Label(self, text="Relatórios e Totais", style="Heading.TLabel").grid(row=0, column=0, pady=(15, 20), sticky="ew", padx=20)
 
         self._create_report_filters_frame(self, 1)
         self._create_report_buttons_frame(self, 2)
-        self._create_totals_display_frame(self, 3)
+        self._create_trailing_windows_frame(self, 3)
+        self._create_totals_display_frame(self, 4)
 
     def _create_report_filters_frame(self, parent, row):
         filter_date_frame = ttk.Frame(parent, style="DateNav.TFrame")
@@ -71,9 +80,24 @@ class ReportsTabUI(ttk.Frame):
         report_button_frame.grid(row=row, column=0, pady=(15, 20), sticky="ew", padx=20)
         report_button_frame.grid_columnconfigure(0, weight=1)
         report_button_frame.grid_columnconfigure(1, weight=1)
+        report_button_frame.grid_columnconfigure(2, weight=1)
 
         ttk.Button(report_button_frame, text="Calcular Totais", command=self.calculate_totals, style="TButton").grid(row=0, column=0, padx=8, sticky="ew")
-        ttk.Button(report_button_frame, text="Gerar PDF", command=self.generate_pdf, style="TButton").grid(row=0, column=1, padx=8, sticky="ew")
+        self.pdf_button = ttk.Button(report_button_frame, text="Gerar PDF", command=self.generate_pdf, style="TButton")
+        self.pdf_button.grid(row=0, column=1, padx=8, sticky="ew")
+        export_button = ttk.Button(report_button_frame, text="Exportar Dados", command=self.export_data, style="TButton")
+        export_button.grid(row=0, column=2, padx=8, sticky="ew")
+        ToolTip(export_button, "Exporta os registros do período em CSV, NumPy (.npz) ou Parquet.")
+
+    def _create_trailing_windows_frame(self, parent, row):
+        windows_frame = ttk.Frame(parent, style="Panel.TFrame", padding=(15, 0))
+        windows_frame.grid(row=row, column=0, pady=(0, 10), sticky="ew", padx=20)
+
+        ttk.Label(windows_frame, text="Últimos:").grid(row=0, column=0, padx=(8, 4), sticky="w")
+        for col_idx, days in enumerate(TRAILING_WINDOWS, start=1):
+            windows_frame.grid_columnconfigure(col_idx, weight=1)
+            ttk.Button(windows_frame, text=f"{days} dias", style="ReportDateNav.TButton",
+                       command=lambda d=days: self.show_trailing_window(d)).grid(row=0, column=col_idx, padx=4, sticky="ew")
 
     def _create_totals_display_frame(self, parent, row):
         totals_display_frame = ttk.Frame(parent, style="Panel.TFrame")
@@ -84,6 +108,7 @@ class ReportsTabUI(ttk.Frame):
         self.total_label = ttk.Label(totals_display_frame, text="", justify="left", style="Totals.TLabel")
         self.total_label.pack(fill="both", expand=True)
 
+    @timed("ui")
     def calculate_totals(self):
         start_date_obj = self.start_date_entry.get_date()
         end_date_obj = self.end_date_entry.get_date()
@@ -91,23 +116,79 @@ class ReportsTabUI(ttk.Frame):
         start_iso = start_date_obj.isoformat()
         end_iso = end_date_obj.isoformat()
 
+        self._last_totals_view = self.calculate_totals
         totals = self.service.calculate_period_totals(start_iso, end_iso)
 
         if not any(totals[k] > 0 for k in ["carbs", "glicemia_sum", "lispro", "bolus", "glargina_sum"]):
             self.total_label.config(text="Não há registros para o período informado.")
             return
 
-        date_format = self.service.get_config("report_date_format", "%d/%m/%Y")
+        msg = self._format_totals_message(start_date_obj, end_date_obj, totals)
+
+        percentiles = totals["glicemia_percentiles"]
+        if percentiles.get(50) is not None:
+            msg += (
+                f"\n  • Glicemia P25/P50/P75: {percentiles[25]:.1f} / {percentiles[50]:.1f} / {percentiles[75]:.1f} mg/dL"
+            )
+
+        metrics = self.service.get_glycemic_metrics(start_iso, end_iso)
+        if metrics["count"]:
+            msg += (
+                f"\n\nVariabilidade glicêmica ({metrics['count']} leituras, alvo "
+                f"{metrics['low_threshold']:.0f}–{metrics['high_threshold']:.0f} mg/dL):\n"
+                f"  • No alvo: {metrics['in_range_pct']:.1f}%   Acima: {metrics['above_pct']:.1f}%   "
+                f"Abaixo: {metrics['below_pct']:.1f}%\n"
+                f"  • Coeficiente de variação: {metrics['cv']:.1f}%\n"
+                f"  • HbA1c estimada: {metrics['estimated_a1c']:.1f}%   GMI: {metrics['gmi']:.1f}%"
+            )
+
+        per_meal = self.service.get_range_analytics(start_iso, end_iso).per_meal()
+        if per_meal:
+            msg += "\n\nPor refeição (glicemia média / carbs médios / no alvo):"
+            for meal, stats in per_meal.items():
+                glicemia_text = f"{stats['avg_glicemia']:.1f} mg/dL" if stats["avg_glicemia"] is not None else "—"
+                carbs_text = f"{stats['avg_carbs']:.1f} g" if stats["avg_carbs"] is not None else "—"
+                meal_metrics = metrics["per_meal"].get(meal)
+                in_range_text = f"{meal_metrics['in_range_pct']:.0f}%" if meal_metrics else "—"
+                msg += f"\n  • {meal}: {glicemia_text} / {carbs_text} / {in_range_text}"
+        self.total_label.config(text=msg)
+
+    def _on_date_format_changed(self, changes: dict):
+        self.date_format = changes["report_date_format"]
+        if self._last_totals_view is not None:
+            self._last_totals_view()
+
+    def _format_totals_message(self, start_date_obj, end_date_obj, totals: dict) -> str:
         msg = (
-            f"Período {start_date_obj.strftime(date_format)} a {end_date_obj.strftime(date_format)}:\n"
+            f"Período {start_date_obj.strftime(self.date_format)} a {end_date_obj.strftime(self.date_format)}:\n"
             f"  • Carboidratos totais: {totals['carbs']:.1f} g\n"
             f"  • Glicemia média: {totals['avg_glicemia']:.1f} mg/dL\n"
+        )
+        if "glicemia_std" in totals:
+            msg += f"  • Desvio padrão da glicemia: {totals['glicemia_std']:.1f} mg/dL\n"
+        msg += (
             f"  • Insulina Lispro total: {totals['lispro']:.1f} UI\n"
             f"  • Insulina Glargina média diária: {totals['avg_glargina']:.1f} UI\n"
             f"  • Bolus correção total: {totals['bolus']:.1f} UI"
         )
-        self.total_label.config(text=msg)
+        return msg
+
+    @timed("ui")
+    def show_trailing_window(self, days: int):
+        """Mostra os totais da janela móvel usando o índice de somas de prefixo."""
+        self._last_totals_view = lambda: self.show_trailing_window(days)
+        start_iso, end_iso, totals = self.service.get_trailing_window_totals(days)
+        start_date_obj = dt.date.fromisoformat(start_iso)
+        end_date_obj = dt.date.fromisoformat(end_iso)
+        self.start_date_entry.set_date(start_date_obj)
+        self.end_date_entry.set_date(end_date_obj)
+
+        if not any(totals[k] > 0 for k in ["carbs", "glicemia_sum", "lispro", "bolus", "glargina_sum"]):
+            self.total_label.config(text=f"Não há registros nos últimos {days} dias.")
+            return
+        self.total_label.config(text=self._format_totals_message(start_date_obj, end_date_obj, totals))
 
+    @timed("ui")
     def generate_pdf(self):
         start_date_obj = self.start_date_entry.get_date()
         end_date_obj = self.end_date_entry.get_date()
@@ -115,9 +196,10 @@ class ReportsTabUI(ttk.Frame):
         start_iso = start_date_obj.isoformat()
         end_iso = end_date_obj.isoformat()
 
-        rows, glargina_by_date = self.service.get_report_data_for_pdf(start_iso, end_iso)
+        data_version = self.service.data_version
+        analytics = self.service.get_range_analytics(start_iso, end_iso)
 
-        if not rows and not glargina_by_date:
+        if not analytics.has_data:
             messagebox.showwarning("Sem dados", "Não há registros para o período informado.")
             return
 
@@ -127,15 +209,82 @@ class ReportsTabUI(ttk.Frame):
         if not path:
             return
 
-        date_format = self.service.get_config("report_date_format", "%d/%m/%Y")
-        PdfReportGenerator.generate_report(
+        # Mesmo período e mesmos dados de um PDF já gerado: só grava os bytes guardados
+        cached_pdf = self.service.get_cached_pdf(start_iso, end_iso, self.date_format)
+        if cached_pdf is not None:
+            try:
+                with open(path, "wb") as f:
+                    f.write(cached_pdf)
+            except OSError as e:
+                messagebox.showerror("Erro ao gerar PDF", f"Não foi possível gravar o relatório: {e}")
+                return
+            messagebox.showinfo("PDF gerado", f"Relatório salvo em:\n{path}")
+            return
+
+        # ReportLab só é carregado quando um PDF é de fato gerado
+        from pdf_report_generator import PdfReportGenerator
+
+        # Os dados saem todos da mesma cópia do banco (service.report_db); a
+        # montagem do PDF, a parte demorada, roda em segundo plano e o
+        # registro diário continua disponível enquanto isso.
+        report_args = (
             path,
-            start_date_obj.strftime(date_format),
-            end_date_obj.strftime(date_format),
-            rows,
-            glargina_by_date,
+            start_date_obj.strftime(self.date_format),
+            end_date_obj.strftime(self.date_format),
+            # Os dias são lidos um a um pela thread do PDF
+            self.service.iter_report_days(start_iso, end_iso),
         )
-        messagebox.showinfo("PDF gerado", f"Relatório salvo em:\n{path}")
+        report_kwargs = {
+            "analytics": analytics,
+            "glycemic_metrics": self.service.get_glycemic_metrics(start_iso, end_iso),
+        }
+        cache_args = (start_iso, end_iso, self.date_format, data_version)
+        outcome = {}
+
+        def render():
+            try:
+                PdfReportGenerator.generate_report(*report_args, **report_kwargs)
+            except Exception as e:
+                outcome["error"] = e
+
+        self.pdf_button.state(["disabled"])
+        self.pdf_button.config(text="Gerando PDF...")
+        worker = threading.Thread(target=render, name="pdf-report", daemon=True)
+        worker.start()
+        self.after(PDF_POLL_INTERVAL_MS, lambda: self._finish_pdf(worker, outcome, path, cache_args))
+
+    def _finish_pdf(self, worker: threading.Thread, outcome: dict, path: str, cache_args: tuple):
+        if worker.is_alive():
+            self.after(PDF_POLL_INTERVAL_MS, lambda: self._finish_pdf(worker, outcome, path, cache_args))
+            return
+        self.pdf_button.config(text="Gerar PDF")
+        self.pdf_button.state(["!disabled"])
+        if "error" in outcome:
+            messagebox.showerror("Erro ao gerar PDF", f"Não foi possível gerar o relatório: {outcome['error']}")
+        else:
+            self.service.cache_pdf(*cache_args, path)
+            messagebox.showinfo("PDF gerado", f"Relatório salvo em:\n{path}")
+
+    @timed("ui")
+    def export_data(self):
+        start_iso = self.start_date_entry.get_date().isoformat()
+        end_iso = self.end_date_entry.get_date().isoformat()
+
+        from data_exporter import DataExporter
+
+        filetypes = [("CSV", "*.csv"), ("NumPy colunar", "*.npz")]
+        if "parquet" in DataExporter.available_formats():
+            filetypes.append(("Parquet", "*.parquet"))
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=filetypes)
+        if not path:
+            return
+
+        fmt = path.rsplit(".", 1)[-1].lower()
+        success, message = self.service.export_data(fmt, path, start_iso, end_iso)
+        if success:
+            messagebox.showinfo("Exportação concluída", message)
+        else:
+            messagebox.showerror("Erro na Exportação", message)
 
     def _set_default_report_dates(self):
         today = dt.date.today()
@@ -1,8 +1,8 @@
 # settings_tab_ui.py
 
-from tkinter import Tk, Label, Entry, Button, StringVar, ttk, messagebox, filedialog, Toplevel, Canvas, Text, Scrollbar
-from datetime import datetime
+from tkinter import Tk, Label, Entry, Button, StringVar, BooleanVar, ttk, messagebox, filedialog, Toplevel, Canvas, Text, Scrollbar
 from tooltip import ToolTip # Certifique-se de que ToolTip está disponível
+import instrumentation
 
 class SettingsTabUI(ttk.Frame):
     def __init__(self, master, service, app_instance):
@@ -12,10 +12,15 @@ class SettingsTabUI(ttk.Frame):
 
         self.report_date_format_var = StringVar()
         self.glicemia_alert_threshold_var = StringVar()
+        self.glicemia_low_threshold_var = StringVar()
         self.selected_theme_var = StringVar() # Variável para o tema
+        self.instrumentation_enabled_var = BooleanVar(value=instrumentation.is_enabled())
+
+        self.diagnostics_frame = None
 
         self._build_ui()
         self._load_current_settings()
+        self.service.subscribe_config(self._on_config_changed)
 
     def _build_ui(self):
         self.grid_columnconfigure(0, weight=1)
@@ -46,6 +51,13 @@ class SettingsTabUI(ttk.Frame):
         ToolTip(entry_glicemia_alert, "Valor de glicemia a partir do qual um alerta pode ser exibido.")
         row_idx += 1
 
+        # Limite inferior de glicemia (hipoglicemia)
+        ttk.Label(settings_frame, text="Limite Inferior de Glicemia (mg/dL):").grid(row=row_idx, column=0, sticky="w", pady=5, padx=10)
+        entry_glicemia_low = ttk.Entry(settings_frame, textvariable=self.glicemia_low_threshold_var)
+        entry_glicemia_low.grid(row=row_idx, column=1, sticky="ew", pady=5, padx=10)
+        ToolTip(entry_glicemia_low, "Leituras abaixo deste valor contam como abaixo do alvo nas métricas de tempo no alvo.")
+        row_idx += 1
+
         # Seleção de Tema
         ttk.Label(settings_frame, text="Tema da Interface:").grid(row=row_idx, column=0, sticky="w", pady=5, padx=10)
         theme_combobox = ttk.Combobox(settings_frame, textvariable=self.selected_theme_var,
@@ -64,62 +76,119 @@ class SettingsTabUI(ttk.Frame):
         ttk.Button(button_frame, text="Salvar Configurações", command=self.save_settings, style="TButton").grid(row=0, column=0, padx=8, sticky="ew")
         ttk.Button(button_frame, text="Redefinir Padrões", command=self.reset_to_defaults, style="TButton").grid(row=0, column=1, padx=8, sticky="ew")
 
-    def _load_current_settings(self):
-        self.report_date_format_var.set(self.service.get_config("report_date_format", "%d/%m/%Y"))
-        self.glicemia_alert_threshold_var.set(str(self.service.get_config("glicemia_alert_threshold", 180)))
-        self.selected_theme_var.set(self.service.get_config("app_theme", "clam")) # Carrega o tema atual
+    def _build_diagnostics_panel(self):
+        frame = ttk.LabelFrame(self, text="Diagnóstico de desempenho", padding=(15, 10))
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(1, weight=1)
+
+        controls = ttk.Frame(frame, style="Panel.TFrame")
+        controls.grid(row=0, column=0, sticky="ew", pady=(0, 8))
+        controls.grid_columnconfigure((1, 2, 3), weight=1)
+        ttk.Checkbutton(controls, text="Instrumentação ativa", variable=self.instrumentation_enabled_var,
+                        command=self._on_instrumentation_toggled).grid(row=0, column=0, padx=5, sticky="w")
+        ttk.Button(controls, text="Atualizar", command=self._refresh_diagnostics, style="TButton").grid(row=0, column=1, padx=5, sticky="ew")
+        ttk.Button(controls, text="Exportar JSON", command=self._export_diagnostics, style="TButton").grid(row=0, column=2, padx=5, sticky="ew")
+        ttk.Button(controls, text="Limpar", command=self._clear_diagnostics, style="TButton").grid(row=0, column=3, padx=5, sticky="ew")
+
+        columns = ("category", "name", "count", "p50", "p95", "max")
+        headings = ("Categoria", "Operação", "Chamadas", "p50 (ms)", "p95 (ms)", "Máx (ms)")
+        self.diagnostics_tree = ttk.Treeview(frame, columns=columns, show="headings", height=8)
+        for column, heading in zip(columns, headings):
+            self.diagnostics_tree.heading(column, text=heading)
+            self.diagnostics_tree.column(column, width=260 if column == "name" else 80, anchor="w" if column in ("category", "name") else "e")
+        self.diagnostics_tree.grid(row=1, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.diagnostics_tree.yview)
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.diagnostics_tree.configure(yscrollcommand=scrollbar.set)
+        return frame
+
+    def toggle_diagnostics_panel(self, show: bool | None = None):
+        """Mostra/oculta o painel de diagnóstico (Ctrl+Shift+D, ligado em CarbTrackerApp); show força o estado."""
+        if self.diagnostics_frame is None:
+            self.diagnostics_frame = self._build_diagnostics_panel()
+        if show is None:
+            show = not self.diagnostics_frame.winfo_manager()
+        if not show:
+            self.diagnostics_frame.grid_remove()
+        else:
+            self.diagnostics_frame.grid(row=3, column=0, sticky="nsew", padx=20, pady=(0, 20))
+            self._refresh_diagnostics()
+
+    def _on_instrumentation_toggled(self):
+        if self.instrumentation_enabled_var.get():
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+
+    def _refresh_diagnostics(self):
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for item in instrumentation.latency_summary():
+            self.diagnostics_tree.insert("", "end", values=(
+                item["category"], item["name"], item["count"],
+                f"{item['p50_ms']:.2f}", f"{item['p95_ms']:.2f}", f"{item['max_ms']:.2f}",
+            ))
+
+    def _export_diagnostics(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile="carb_tracker_diagnostico.json")
+        if not path:
+            return
+        try:
+            instrumentation.dump_json(path)
+            messagebox.showinfo("Diagnóstico Exportado", f"Medições salvas em:\n{path}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao exportar diagnóstico: {e}")
+
+    def _clear_diagnostics(self):
+        instrumentation.clear()
+        self._refresh_diagnostics()
+
+    def _load_current_settings(self, keys=None):
+        """Preenche os campos com a configuração atual (só as chaves indicadas, se keys for dado)."""
+        setters = {
+            "report_date_format": lambda value: self.report_date_format_var.set(value or ""),
+            "glicemia_alert_threshold": lambda value: self.glicemia_alert_threshold_var.set(_format_number(value)),
+            "glicemia_low_threshold": lambda value: self.glicemia_low_threshold_var.set(_format_number(value)),
+            "app_theme": lambda value: self.selected_theme_var.set(value or ""),
+        }
+        for key, setter in setters.items():
+            if keys is None or key in keys:
+                setter(self.service.get_config(key))
+
+    def _on_config_changed(self, changes: dict):
+        # Alterações feitas fora desta aba (ou por Redefinir Padrões) aparecem nos campos
+        self._load_current_settings(changes)
 
     def _on_theme_selected(self, event):
-        selected_theme = self.selected_theme_var.get()
-        self.app_instance.apply_theme(selected_theme) # Aplica o tema imediatamente
-        # A configuração será salva quando o botão "Salvar Configurações" for clicado
+        # Aplicado na hora pelo observador do aplicativo; o arquivo é gravado em seguida, com atraso
+        success, message = self.service.set_config("app_theme", self.selected_theme_var.get())
+        if not success:
+            messagebox.showerror("Erro", message)
 
     def save_settings(self):
-        new_format = self.report_date_format_var.get().strip()
-        new_glicemia_alert_str = self.glicemia_alert_threshold_var.get().strip()
-        new_theme = self.selected_theme_var.get().strip()
-
-        # Validação do formato de data
-        if new_format:
-            try:
-                datetime.now().strftime(new_format)
-            except Exception:
-                messagebox.showerror("Erro de Formato", "Formato de data inválido. Use um formato válido como %d/%m/%Y.")
-                return
-
-        # Validação do limite de glicemia
-        if new_glicemia_alert_str:
-            try:
-                new_glicemia_alert = float(new_glicemia_alert_str)
-                if new_glicemia_alert < 0:
-                    messagebox.showerror("Erro de Entrada", "O limite de alerta de glicemia deve ser um número não negativo.")
-                    return
-            except ValueError:
-                messagebox.showerror("Erro de Entrada", "O limite de alerta de glicemia deve ser um número válido.")
-                return
-        else:
-            new_glicemia_alert = None # Ou um valor padrão se preferir
-
-        # Salvar as configurações
+        # Tipos, limites e o formato de data são validados pelo esquema de configuração
         config_to_save = {
-            "report_date_format": new_format,
-            "glicemia_alert_threshold": new_glicemia_alert,
-            "app_theme": new_theme # Salva o tema selecionado
+            "report_date_format": self.report_date_format_var.get().strip(),
+            "glicemia_alert_threshold": self.glicemia_alert_threshold_var.get().strip(),
+            "glicemia_low_threshold": self.glicemia_low_threshold_var.get().strip(),
+            "app_theme": self.selected_theme_var.get().strip(),
         }
         success, message = self.service.save_config(config_to_save)
         if success:
             messagebox.showinfo("Configurações Salvas", message)
         else:
-            messagebox.showerror("Erro", message)
+            messagebox.showerror("Erro de Entrada", message)
 
     def reset_to_defaults(self):
         response = messagebox.askyesno("Redefinir Configurações", "Tem certeza que deseja redefinir todas as configurações para os valores padrão?")
         if response:
-            default_config = self.service._default_config()
-            success, message = self.service.save_config(default_config)
+            # Os campos e o tema são atualizados pelos observadores de configuração
+            success, message = self.service.reset_config()
             if success:
                 messagebox.showinfo("Configurações Redefinidas", message)
-                self._load_current_settings() # Recarrega as configurações padrão na UI
-                self.app_instance.load_theme_from_config() # Aplica o tema padrão imediatamente
             else:
-                messagebox.showerror("Erro", message)
\ No newline at end of file
+                messagebox.showerror("Erro", message)
+
+
+def _format_number(value) -> str:
+    return "" if value is None else f"{value:g}"
@@ -0,0 +1,77 @@
+# sync_engine.py
+
+import datetime as dt
+import json
+
+from config_store import write_json_atomic
+from day_ordinals import to_day
+
+# Formato dos arquivos de alterações trocados entre cópias do banco (casa,
+# clínica...). Cada arquivo leva as linhas alteradas desde a última troca com
+# o estado atual e a versão de cada uma; importar o mesmo arquivo duas vezes,
+# ou arquivos fora de ordem, dá o mesmo resultado.
+SYNC_FORMAT = "carb-tracker-sync"
+SYNC_FORMAT_VERSION = 1
+SYNC_COLUMNS = (
+    "tbl", "date", "meal", "version", "device", "deleted",
+    "carbs", "glicemia", "lispro", "bolus", "observations", "dose",
+)
+SYNC_TABLES = ("entries", "glargina")
+
+
+class SyncError(ValueError):
+    """Arquivo de alterações inválido ou incompatível; a mensagem é exibida ao usuário."""
+
+
+def build_changeset(device: str, seq: int, since: int, acks: dict, rows: list) -> dict:
+    """
+    Monta o conteúdo do arquivo: rows no formato de Database.fetch_sync_changes,
+    seq = sequência local no momento da exportação (o destino a devolve em
+    acks na próxima troca), since = seq a partir da qual as linhas foram incluídas.
+    """
+    return {
+        "format": SYNC_FORMAT,
+        "format_version": SYNC_FORMAT_VERSION,
+        "device": device,
+        "seq": seq,
+        "since": since,
+        "acks": acks,
+        "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "columns": list(SYNC_COLUMNS),
+        "rows": [list(row) for row in rows],
+    }
+
+
+def write_changeset(path: str, changeset: dict):
+    write_json_atomic(path, changeset, indent=None)
+
+
+def read_changeset(path: str) -> dict:
+    """Lê e valida um arquivo de alterações; as datas das linhas voltam como ordinais de dia. Levanta SyncError."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            changeset = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SyncError(f"Não foi possível ler o arquivo de alterações: {e}")
+    if not isinstance(changeset, dict) or changeset.get("format") != SYNC_FORMAT:
+        raise SyncError("O arquivo não é um arquivo de alterações do Carb Tracker.")
+    if changeset.get("format_version") != SYNC_FORMAT_VERSION:
+        raise SyncError("O arquivo de alterações foi gerado por uma versão incompatível do aplicativo.")
+    if changeset.get("columns") != list(SYNC_COLUMNS):
+        raise SyncError("As colunas do arquivo de alterações não são as esperadas.")
+
+    rows = []
+    try:
+        for tbl, date_iso, meal, version, device, deleted, *values in changeset["rows"]:
+            if tbl not in SYNC_TABLES or len(values) != len(SYNC_COLUMNS) - 6:
+                raise SyncError(f"Linha inválida no arquivo de alterações: {tbl} {date_iso} {meal}")
+            rows.append((tbl, to_day(date_iso), meal, int(version), str(device), int(bool(deleted)), *values))
+        changeset["seq"], changeset["since"] = int(changeset["seq"]), int(changeset["since"])
+        changeset["acks"] = {str(device): int(seq) for device, seq in changeset["acks"].items()}
+        changeset["device"] = str(changeset["device"])
+    except SyncError:
+        raise
+    except (KeyError, TypeError, ValueError) as e:
+        raise SyncError(f"Arquivo de alterações corrompido: {e}")
+    changeset["rows"] = rows
+    return changeset
@@ -0,0 +1,28 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Os módulos do aplicativo ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from carb_tracker_service import CarbTrackerService
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    """Cria serviços sobre bancos em tmp_path (make_service("casa")); fecha todos ao final."""
+    services = []
+
+    def make(name: str = "carb_tracker", compact: bool = False) -> CarbTrackerService:
+        service = CarbTrackerService(str(tmp_path / f"{name}.db"), str(tmp_path / f"{name}.json"))
+        if compact:
+            service.db.migrate_to_compact()
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close_db()
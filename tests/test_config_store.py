@@ -0,0 +1,48 @@
+# tests/test_config_store.py
+
+import json
+
+import pytest
+
+from config_store import ConfigError, ConfigStore
+
+
+def test_update_now_writes_and_notifies(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    received = []
+    store.subscribe(received.append)
+    assert store.update({"app_theme": "alt"}, persist="now") == {"app_theme": "alt"}
+    assert json.loads((tmp_path / "config.json").read_text(encoding="utf-8"))["app_theme"] == "alt"
+    assert received == [{"app_theme": "alt"}]
+
+
+def test_update_now_failed_write_changes_nothing(tmp_path):
+    # Diretório inexistente: a gravação atômica falha com OSError
+    store = ConfigStore(str(tmp_path / "sem-diretorio" / "config.json"))
+    received = []
+    store.subscribe(received.append)
+    before = store.as_dict()
+    with pytest.raises(OSError):
+        store.update({"app_theme": "alt", "glicemia_alert_threshold": 200}, persist="now")
+    assert store.as_dict() == before
+    assert store.get("app_theme") == "clam"
+    assert received == []
+    # Nada pendente para uma gravação posterior (ex.: ao fechar)
+    store.flush()
+    assert not (tmp_path / "sem-diretorio").exists()
+
+
+def test_save_config_reports_failed_write_without_applying(make_service, tmp_path):
+    service = make_service()
+    service.config_store.path = str(tmp_path / "sem-diretorio" / "config.json")
+    ok, msg = service.save_config({"glicemia_alert_threshold": 250})
+    assert not ok and msg.startswith("Erro ao salvar configurações")
+    assert service.get_config("glicemia_alert_threshold") == 180.0
+
+
+def test_invalid_value_changes_nothing(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    with pytest.raises(ConfigError):
+        store.update({"app_theme": "alt", "glicemia_alvo": -1}, persist="now")
+    assert store.get("app_theme") == "clam"
+    assert not (tmp_path / "config.json").exists()
@@ -0,0 +1,136 @@
+# tests/test_daily_stats.py
+#
+# Índice de somas de prefixo (daily_stats): fetch_window_stats contra a soma
+# ingênua sobre entries/glargina_days, nos dois formatos de armazenamento.
+
+import datetime as dt
+
+import pytest
+
+from database import DAILY_STATS_COLUMNS
+from day_ordinals import MAX_DAY, MIN_DAY, to_day
+
+FIRST_DATE = dt.date(2024, 3, 1)
+N_DAYS = 20
+
+
+def meal(carbs=None, glicemia=None, lispro=None, bolus=None, observations=None) -> dict:
+    return {"carbs": carbs, "glicemia": glicemia, "lispro": lispro, "bolus": bolus, "observations": observations}
+
+
+def date_iso(offset: int) -> str:
+    return (FIRST_DATE + dt.timedelta(days=offset)).isoformat()
+
+
+def naive_window(db, start_day: int, end_day: int) -> dict:
+    totals = dict.fromkeys(DAILY_STATS_COLUMNS, 0.0)
+    for _day, _meal, carbs, glicemia, lispro, bolus, _obs in db.fetch_days(start_day, end_day):
+        totals["carbs"] += carbs or 0
+        totals["lispro"] += lispro or 0
+        totals["bolus"] += bolus or 0
+        if glicemia is not None:
+            totals["glicemia_sum"] += glicemia
+            totals["glicemia_count"] += 1
+    for _day, dose in db.iter_glargina_days(start_day, end_day):
+        if dose is not None and dose > 0:
+            totals["glargina_sum"] += dose
+            totals["glargina_count"] += 1
+    return totals
+
+
+def assert_windows_match(db):
+    """Todas as janelas [início, fim] do período, com margem de dias sem dados nas duas pontas."""
+    days = [to_day(date_iso(offset)) for offset in range(-2, N_DAYS + 2)]
+    for i, start_day in enumerate(days):
+        for end_day in days[i:]:
+            expected = naive_window(db, start_day, end_day)
+            assert db.fetch_window_stats(start_day, end_day) == pytest.approx(expected), (start_day, end_day)
+
+
+def index_rows(db) -> list:
+    return db.conn.execute("SELECT * FROM daily_stats ORDER BY day").fetchall()
+
+
+def populate(service):
+    for offset in range(N_DAYS):
+        meals = {
+            "Café da manhã": meal(carbs=40.0 + offset, glicemia=110.0, lispro=3.5),
+            "Almoço": meal(carbs=70.5, glicemia=None if offset % 3 else 190.0, lispro=6.0,
+                           bolus=1.5 if offset % 2 else None),
+            "Lanche Extra 1": meal(carbs=15.0, observations="fruta"),
+        }
+        if offset % 4 == 0:
+            meals["Jantar"] = meal(glicemia=95.0 + offset)
+        # Alguns dias sem glargina (0) para conferir que a contagem só considera doses > 0
+        glargina = 0.0 if offset % 5 == 0 else 18.0 + offset / 10
+        ok, msg = service.save_daily_data(date_iso(offset), glargina, meals)
+        assert ok, msg
+
+
+@pytest.fixture(params=[False, True], ids=["original", "compacto"])
+def service(request, make_service):
+    service = make_service(compact=request.param)
+    assert service.db.compact is request.param
+    populate(service)
+    return service
+
+
+def test_windows_after_save(service):
+    assert_windows_match(service.db)
+
+
+def test_windows_after_resaving_days(service):
+    # Regravar dias no meio do período propaga a diferença aos acumulados seguintes
+    ok, msg = service.save_daily_data(date_iso(3), 30.0, {"Almoço": meal(carbs=200.0, glicemia=250.0, bolus=3.0)})
+    assert ok, msg
+    ok, msg = service.save_daily_changes(date_iso(10), None, {"Jantar": {"lispro": 4.0}})
+    assert ok, msg
+    assert_windows_match(service.db)
+
+
+def test_windows_after_deleting_day_meals(service):
+    # Dia inteiro esvaziado: a linha sai do índice
+    ok, msg = service.save_daily_data(date_iso(7), 0.0, {})
+    assert ok, msg
+    assert service.db.fetch_days(to_day(date_iso(7)), to_day(date_iso(7))) == []
+    assert to_day(date_iso(7)) not in [row[0] for row in index_rows(service.db)]
+    # Lanche extra removido e campos apagados em outro dia
+    ok, msg = service.save_daily_changes(date_iso(12), None, {"Almoço": meal()}, removed_meals=["Lanche Extra 1"])
+    assert ok, msg
+    day = to_day(date_iso(12))
+    assert [row[1] for row in service.db.fetch_days(day, day)] == ["Café da manhã", "Jantar"]
+    assert_windows_match(service.db)
+
+
+def test_rebuild_matches_incremental_index(service):
+    service.save_daily_data(date_iso(5), 12.0, {"Jejum": meal(glicemia=88.0)})
+    service.save_daily_data(date_iso(15), 0.0, {})
+    incremental = index_rows(service.db)
+    service.db.rebuild_daily_stats()
+    rebuilt = index_rows(service.db)
+    assert [row[0] for row in rebuilt] == [row[0] for row in incremental]
+    for a, b in zip(incremental, rebuilt):
+        assert a == pytest.approx(b)
+    assert_windows_match(service.db)
+
+
+def test_migration_to_compact_keeps_windows(make_service):
+    service = make_service()
+    populate(service)
+    service.db.migrate_to_compact()
+    service.db.rebuild_daily_stats()
+    assert_windows_match(service.db)
+    assert service.db.fetch_window_stats(MIN_DAY, MAX_DAY) == pytest.approx(naive_window(service.db, MIN_DAY, MAX_DAY))
+
+
+def test_window_totals_read_the_index_without_a_snapshot(service):
+    # Leituras de uma janela não refazem a cópia em memória dos relatórios
+    service.close_report_snapshot()
+    start_day, end_day = to_day(date_iso(2)), to_day(date_iso(9))
+    totals = service.get_window_totals(date_iso(2), date_iso(9))
+    _, _, trailing = service.get_trailing_window_totals(8, date_iso(9))
+    assert service._report_snapshot is None
+    expected = naive_window(service.db, start_day, end_day)
+    for key in DAILY_STATS_COLUMNS:
+        assert totals[key] == pytest.approx(expected[key]) and trailing[key] == pytest.approx(expected[key])
+    assert totals["avg_glicemia"] == pytest.approx(expected["glicemia_sum"] / expected["glicemia_count"])
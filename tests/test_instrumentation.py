@@ -0,0 +1,66 @@
+# tests/test_instrumentation.py
+
+import time
+
+import pytest
+
+import instrumentation
+from instrumentation import span, timed
+
+
+@pytest.fixture
+def enabled():
+    was_enabled = instrumentation.is_enabled()
+    instrumentation.clear()
+    instrumentation.enable()
+    yield
+    if not was_enabled:
+        instrumentation.disable()
+    instrumentation.clear()
+
+
+@timed("test", "produce")
+def produce(n: int, work_s: float):
+    for i in range(n):
+        time.sleep(work_s)
+        yield i
+
+
+def by_name(name: str) -> list:
+    return [record for record in instrumentation.records() if record["name"] == name]
+
+
+def test_generator_span_excludes_consumer_time(enabled):
+    for _ in produce(3, 0.002):
+        with span("test", "consume"):
+            time.sleep(0.02)
+    (record,) = by_name("produce")
+    assert record["rows"] == 3
+    assert 6 <= record["duration_ms"] < 30
+    assert len(by_name("consume")) == 3
+
+
+def test_generator_span_excludes_consumer_sql(enabled, make_service):
+    service = make_service()
+    ok, msg = service.save_daily_data("2024-01-01", 20.0, {"Almoço": {"carbs": 50.0}})
+    assert ok, msg
+    ok, msg = service.save_daily_data("2024-01-02", 21.0, {"Almoço": {"carbs": 60.0}})
+    assert ok, msg
+    instrumentation.clear()
+    # SQL de quem consome, fora de qualquer medição própria
+    for _ in service.db.iter_days(0, 10**6, batch_size=1):
+        service.db.conn.execute("SELECT COUNT(*) FROM glargina_days").fetchone()
+    (record,) = by_name("Database.iter_days")
+    assert record["rows"] == 2
+    assert record["sql"] and all("glargina_days" not in sql for sql in record["sql"])
+
+
+def test_abandoned_generator_is_recorded_once(enabled):
+    gen = produce(5, 0)
+    next(gen)
+    with span("test", "after"):
+        pass
+    gen.close()
+    (record,) = by_name("produce")
+    assert record["rows"] == 1
+    assert instrumentation._span_stack() == []
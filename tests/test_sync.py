@@ -0,0 +1,201 @@
+# tests/test_sync.py
+#
+# Sincronização entre dois arquivos de banco (casa e clínica): convergência,
+# regra de conflito, lápides de remoção, reimportação idempotente e arquivos
+# de alterações inválidos.
+
+import json
+
+import pytest
+
+from day_ordinals import MAX_DAY, MIN_DAY, to_day
+from sync_engine import SyncError, read_changeset
+
+DATES = ["2024-05-01", "2024-05-02", "2024-05-03", "2024-05-04"]
+
+
+def meal(carbs=None, glicemia=None, lispro=None, bolus=None, observations=None) -> dict:
+    return {"carbs": carbs, "glicemia": glicemia, "lispro": lispro, "bolus": bolus, "observations": observations}
+
+
+def state(service) -> tuple:
+    db = service.db
+    return (
+        db.fetch_days(MIN_DAY, MAX_DAY),
+        list(db.iter_glargina_days(MIN_DAY, MAX_DAY)),
+        # As somas acumuladas dependem da ordem das gravações: compara arredondadas
+        [tuple(round(v, 6) for v in row) for row in db.conn.execute("SELECT * FROM daily_stats ORDER BY day")],
+    )
+
+
+def row_version(service, date_iso: str, meal_name: str) -> tuple:
+    return service.db.conn.execute(
+        "SELECT version, device, deleted FROM sync_rows WHERE tbl = 'entries' AND day = ? AND meal = ?",
+        (to_day(date_iso), meal_name),
+    ).fetchone()
+
+
+def exchange(tmp_path, source, target, name: str) -> str:
+    file_path = str(tmp_path / name)
+    ok, msg = source.export_sync_changes(file_path)
+    assert ok, msg
+    ok, msg = target.import_sync_changes(file_path)
+    assert ok, msg
+    return file_path
+
+
+@pytest.fixture
+def pair(tmp_path, make_service):
+    """Casa com alguns dias gravados e a clínica como cópia restaurada de um backup da casa, já sincronizadas."""
+    home = make_service("casa")
+    for i, date_iso in enumerate(DATES):
+        ok, msg = home.save_daily_data(date_iso, 20.0 + i, {
+            "Café da manhã": meal(carbs=45.0, glicemia=120.0 + i, lispro=4.0),
+            "Almoço": meal(carbs=70.0, lispro=6.0, observations="casa"),
+            "Lanche Extra 1": meal(carbs=15.0),
+        })
+        assert ok, msg
+    clinic = make_service("clinica")
+    ok, msg = clinic.restore_backup(home.db_path, clinic.db_path)
+    assert ok, msg
+    assert home.db.device_id != clinic.db.device_id
+    exchange(tmp_path, home, clinic, "inicial.json")
+    exchange(tmp_path, clinic, home, "inicial-retorno.json")
+    assert state(home) == state(clinic)
+    return home, clinic
+
+
+def test_edits_on_both_sides_converge(tmp_path, pair):
+    home, clinic = pair
+    ok, msg = home.save_daily_changes(DATES[0], 25.0, {"Jantar": {"carbs": 60.0, "glicemia": 140.0}})
+    assert ok, msg
+    ok, msg = clinic.save_daily_changes(DATES[2], None, {"Café da manhã": {"bolus": 1.5}})
+    assert ok, msg
+    ok, msg = clinic.save_daily_data("2024-05-10", 19.0, {"Jejum": meal(glicemia=90.0)})
+    assert ok, msg
+
+    exchange(tmp_path, home, clinic, "casa.json")
+    exchange(tmp_path, clinic, home, "clinica.json")
+    assert state(home) == state(clinic)
+    assert home.db.fetch_entry(to_day(DATES[2]), "Café da manhã")[3] == 1.5
+    assert clinic.db.fetch_glargina_dose(to_day(DATES[0])) == 25.0
+    assert home.db.fetch_glargina_dose(to_day("2024-05-10")) == 19.0
+
+    # As linhas recebidas seguem adiante até o outro lado confirmar; depois das confirmações, nada a enviar
+    exchange(tmp_path, home, clinic, "retorno-casa.json")
+    exchange(tmp_path, clinic, home, "retorno-clinica.json")
+    file_path = exchange(tmp_path, home, clinic, "vazio.json")
+    with open(file_path, encoding="utf-8") as f:
+        assert json.load(f)["rows"] == []
+
+
+def test_conflict_won_by_larger_version_and_device(tmp_path, pair):
+    home, clinic = pair
+    # Os dois lados editam a mesma refeição antes de trocar os arquivos
+    ok, msg = home.save_daily_changes(DATES[1], None, {"Almoço": {"observations": "casa editou"}})
+    assert ok, msg
+    ok, msg = clinic.save_daily_changes(DATES[1], None, {"Almoço": {"observations": "clínica editou"}})
+    assert ok, msg
+    ok, msg = clinic.save_daily_changes(DATES[3], None, {"Almoço": {"observations": "clínica editou"}})
+    assert ok, msg
+    ok, msg = home.save_daily_changes(DATES[3], None, {"Almoço": {"observations": "casa editou"}})
+    assert ok, msg
+    expected = {}
+    for date_iso in (DATES[1], DATES[3]):
+        home_version, clinic_version = row_version(home, date_iso, "Almoço"), row_version(clinic, date_iso, "Almoço")
+        expected[date_iso] = "casa editou" if home_version[:2] > clinic_version[:2] else "clínica editou"
+
+    ok, msg = home.export_sync_changes(str(tmp_path / "casa.json"))
+    assert ok, msg
+    ok, msg = clinic.export_sync_changes(str(tmp_path / "clinica.json"))
+    assert ok, msg
+    ok, msg = clinic.import_sync_changes(str(tmp_path / "casa.json"))
+    assert ok, msg
+    ok, msg = home.import_sync_changes(str(tmp_path / "clinica.json"))
+    assert ok, msg
+
+    assert state(home) == state(clinic)
+    for date_iso, observations in expected.items():
+        for service in (home, clinic):
+            assert service.db.fetch_entry(to_day(date_iso), "Almoço")[-1] == observations
+        assert row_version(home, date_iso, "Almoço") == row_version(clinic, date_iso, "Almoço")
+
+
+def test_deletions_travel_as_tombstones(tmp_path, pair):
+    home, clinic = pair
+    ok, msg = home.save_daily_changes(DATES[2], None, {}, removed_meals=["Lanche Extra 1"])
+    assert ok, msg
+    ok, msg = home.save_daily_data(DATES[3], 0.0, {})
+    assert ok, msg
+
+    file_path = exchange(tmp_path, home, clinic, "casa.json")
+    changeset = read_changeset(file_path)
+    tombstones = {(tbl, day, meal_name) for tbl, day, meal_name, _v, _d, deleted, *_ in changeset["rows"] if deleted}
+    assert ("entries", to_day(DATES[2]), "Lanche Extra 1") in tombstones
+    assert ("entries", to_day(DATES[3]), "Almoço") in tombstones
+
+    assert state(home) == state(clinic)
+    assert "Lanche Extra 1" not in [row[1] for row in clinic.db.fetch_days(to_day(DATES[2]), to_day(DATES[2]))]
+    assert clinic.db.fetch_days(to_day(DATES[3]), to_day(DATES[3])) == []
+    assert row_version(clinic, DATES[2], "Lanche Extra 1")[2] == 1
+
+    # Uma edição antiga da clínica não ressuscita a refeição apagada
+    exchange(tmp_path, clinic, home, "clinica.json")
+    assert state(home) == state(clinic)
+
+
+def test_reimporting_the_same_file_changes_nothing(tmp_path, pair):
+    home, clinic = pair
+    ok, msg = home.save_daily_changes(DATES[0], 22.5, {"Almoço": {"carbs": 80.0}})
+    assert ok, msg
+    file_path = exchange(tmp_path, home, clinic, "casa.json")
+    before = state(clinic)
+    ok, msg = clinic.import_sync_changes(file_path)
+    assert ok and msg.startswith("0 registros"), msg
+    assert state(clinic) == before
+
+
+def test_import_of_own_file_is_rejected(tmp_path, pair):
+    home, _clinic = pair
+    ok, msg = home.export_sync_changes(str(tmp_path / "casa.json"))
+    assert ok, msg
+    ok, msg = home.import_sync_changes(str(tmp_path / "casa.json"))
+    assert not ok
+
+
+def valid_changeset(tmp_path, service) -> dict:
+    ok, msg = service.export_sync_changes(str(tmp_path / "valido.json"))
+    assert ok, msg
+    with open(tmp_path / "valido.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda c: "{ isto não é json",
+    lambda c: json.dumps([1, 2, 3]),
+    lambda c: json.dumps({**c, "format": "outro-aplicativo"}),
+    lambda c: json.dumps({**c, "format_version": 99}),
+    lambda c: json.dumps({**c, "columns": c["columns"][:-1]}),
+    lambda c: json.dumps({**c, "rows": [["outra_tabela", "2024-05-01", "", 1, "x", 0] + [None] * 6]}),
+    lambda c: json.dumps({**c, "rows": [["entries", "2024-05-01", "Almoço", 1, "x", 0, 1.0]]}),
+    lambda c: json.dumps({**c, "rows": [["entries", "não é data", "Almoço", 1, "x", 0] + [None] * 6]}),
+    lambda c: json.dumps({k: v for k, v in c.items() if k != "seq"}),
+], ids=["json", "não-objeto", "formato", "versão", "colunas", "tabela", "linha-curta", "data", "sem-seq"])
+def test_malformed_file_raises_sync_error(tmp_path, pair, corrupt):
+    home, clinic = pair
+    ok, msg = home.save_daily_changes(DATES[0], None, {"Almoço": {"carbs": 99.0}})
+    assert ok, msg
+    file_path = tmp_path / "corrompido.json"
+    file_path.write_text(corrupt(valid_changeset(tmp_path, home)), encoding="utf-8")
+
+    with pytest.raises(SyncError):
+        read_changeset(str(file_path))
+    before = state(clinic)
+    ok, msg = clinic.import_sync_changes(str(file_path))
+    assert not ok and msg
+    assert state(clinic) == before
+
+
+def test_missing_file_raises_sync_error(tmp_path):
+    with pytest.raises(SyncError):
+        read_changeset(str(tmp_path / "nao-existe.json"))